@@ -0,0 +1,96 @@
+"""
+ANN index benchmark: recall@k against brute force, p50/p99 latency and memory.
+
+Builds each index type from ``src.rag.index_factory`` over synthetic clustered
+vectors (embedding-like: normalized, many topics) and sweeps its search
+parameter (nprobe for IVF, efSearch for HNSW).
+
+Example: python -m benchmarks.bench_ann --vectors 200000 --dim 1536 --types flat ivf_flat hnsw ivf_pq
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from src.rag.index_factory import INDEX_TYPES, apply_search_params, build_faiss_index, default_index_config
+
+
+def _synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _measure(index: faiss.Index, queries: np.ndarray, k: int):
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    latencies = np.asarray(latencies) * 1000
+    return found, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def _report(label: str, recall: float, p50: float, p99: float, memory_mb: float, build_seconds: float) -> None:
+    print(f"{label:<28} recall={recall:6.3f}  p50={p50:7.3f}ms  p99={p99:7.3f}ms  "
+          f"mem={memory_mb:9.1f}MB  build={build_seconds:7.1f}s")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark FAISS index types on synthetic embeddings.")
+    argparser.add_argument("--vectors", "-n", type=int, default=100_000, help="Corpus size.")
+    argparser.add_argument("--dim", type=int, default=256, help="Embedding dimension (1536 for text-embedding-ada-002).")
+    argparser.add_argument("--clusters", type=int, default=500, help="Number of synthetic topics.")
+    argparser.add_argument("--queries", "-q", type=int, default=500, help="Number of queries.")
+    argparser.add_argument("--k", type=int, default=10, help="Neighbours per query (recall@k).")
+    argparser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES), help="Index types to test.")
+    argparser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64], help="IVF nprobe values to sweep.")
+    argparser.add_argument("--ef_search", type=int, nargs="+", default=[16, 64, 256], help="HNSW efSearch values to sweep.")
+    argparser.add_argument("--pq_m", type=int, default=16, help="PQ sub-quantizers.")
+    argparser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (1 = per-request latency).")
+    argparser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = argparser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    corpus = _synthetic_vectors(args.vectors, args.dim, args.clusters, args.seed)
+    queries = _synthetic_vectors(args.queries, args.dim, args.clusters, args.seed + 1)
+
+    # Ground truth: exact search
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}, threads={args.threads}")
+    for index_type in args.types:
+        start = time.perf_counter()
+        config = default_index_config(index_type, pq_m=args.pq_m)
+        index, config = build_faiss_index(corpus, config, seed=args.seed)
+        index.add(corpus)
+        build_seconds = time.perf_counter() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        if config["type"] in ("ivf_flat", "ivf_pq"):
+            sweep = [("nprobe", v) for v in args.nprobe if v <= config["nlist"]]
+        elif config["type"] == "hnsw":
+            sweep = [("efSearch", v) for v in args.ef_search]
+        else:
+            sweep = [(None, None)]
+
+        for param, value in sweep:
+            if param == "nprobe":
+                apply_search_params(index, config, nprobe=value)
+            elif param == "efSearch":
+                apply_search_params(index, config, ef_search=value)
+            found, p50, p99 = _measure(index, queries, args.k)
+            label = config["type"] + (f" {param}={value}" if param else "")
+            _report(label, _recall(found, truth), p50, p99, memory_mb, build_seconds)
@@ -0,0 +1,310 @@
+"""
+End-to-end latency and throughput benchmark, fully offline.
+
+Runs ``classify_query``, ``execute_sql_query``, ``execute_rag_query`` and
+``execute_hybrid_query`` (or their async versions) at several concurrency
+levels against a seeded SQLite database (or a local PostgreSQL), a synthetic
+policy-document index, and fake chat and embedding models with configurable
+latency (see ``benchmarks.fixtures``). Model latency is simulated, so what
+moves between runs is the project's own overhead: routing, retrieval, SQL,
+caches, locks and pools.
+
+Each run is compared with a stored baseline; a regression beyond the
+tolerance (latency or throughput, LLM or embedding calls per request,
+errors) makes the script exit with status 1, so it can gate CI.
+
+Example: python -m benchmarks.bench_e2e --concurrency 1 4 16 --requests 32
+         python -m benchmarks.bench_e2e --async --baseline benchmarks/baseline_async.json --save_baseline
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.fixtures import (
+    QUESTIONS,
+    build_corpus_index,
+    configure_environment,
+    install_fakes,
+    scripted_reply,
+    seed_database,
+)
+
+
+TARGETS = ("classify", "sql", "rag", "hybrid")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Higher is worse for these; throughput is the other way round
+_LOWER_IS_BETTER = ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "llm_calls_per_request", "embedding_calls_per_request")
+# Latency changes below this are noise, whatever their ratio
+_MIN_LATENCY_DELTA_MS = 5.0
+
+Outcome = Tuple[float, bool]  # (seconds, failed)
+
+
+def _failed(result: Any) -> bool:
+    if isinstance(result, str):  # classify_query
+        return result not in ("sql", "rag", "hybrid")
+    return "error" in result or any("error" in (result.get(key) or {}) for key in ("sql_result", "rag_result"))
+
+
+def _targets(index_path: str, log_file: str, use_answer_cache: bool) -> Dict[str, Tuple[Callable, Callable, List[str]]]:
+    """Each target's sync and async entry point, and the questions it is asked."""
+    from src.agents.hybrid_agent import aclassify_query, aexecute_hybrid_query, classify_query, execute_hybrid_query
+    from src.agents.rag_agent import aexecute_rag_query, execute_rag_query
+    from src.agents.sql_agent import aexecute_sql_query, execute_sql_query
+
+    questions = {route: [q for q, r, _, _ in QUESTIONS if r == route] for route in ("sql", "rag", "hybrid")}
+    every_question = [question for question, _, _, _ in QUESTIONS]
+    return {
+        "classify": (classify_query, aclassify_query, every_question),
+        "sql": (
+            lambda q: execute_sql_query(q, log_file),
+            lambda q: aexecute_sql_query(q, log_file),
+            questions["sql"],
+        ),
+        "rag": (
+            lambda q: execute_rag_query(q, index_path, log_file),
+            lambda q: aexecute_rag_query(q, index_path, log_file),
+            questions["rag"],
+        ),
+        "hybrid": (
+            lambda q: execute_hybrid_query(q, log_file, use_cache=use_answer_cache, index_path=index_path),
+            lambda q: aexecute_hybrid_query(q, log_file, use_cache=use_answer_cache, index_path=index_path),
+            every_question,
+        ),
+    }
+
+
+def _timed(fn: Callable[[str], Any], question: str) -> Outcome:
+    start = time.perf_counter()
+    try:
+        failed = _failed(fn(question))
+    except Exception:
+        failed = True
+    return time.perf_counter() - start, failed
+
+
+def _run_threads(fn: Callable[[str], Any], questions: List[str], requests: int, concurrency: int) -> Tuple[List[Outcome], float]:
+    """``requests`` calls (cycling through the questions), ``concurrency`` at a time on a thread pool."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        outcomes = list(pool.map(lambda i: _timed(fn, questions[i % len(questions)]), range(requests)))
+        elapsed = time.perf_counter() - start
+    return outcomes, elapsed
+
+
+async def _run_tasks(
+    afn: Callable[[str], Awaitable[Any]],
+    questions: List[str],
+    requests: int,
+    concurrency: int
+) -> Tuple[List[Outcome], float]:
+    """Async counterpart of ``_run_threads``: tasks on one event loop, ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question: str) -> Outcome:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                failed = _failed(await afn(question))
+            except Exception:
+                failed = True
+            return time.perf_counter() - start, failed
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(questions[i % len(questions)]) for i in range(requests)))
+    return list(outcomes), time.perf_counter() - start
+
+
+def _summarize(outcomes: List[Outcome], elapsed: float, llm_calls: int, embedding_calls: int) -> Dict[str, float]:
+    latencies = np.asarray([seconds for seconds, _ in outcomes]) * 1000
+    n = len(outcomes)
+    return {
+        "requests": n,
+        "errors": sum(failed for _, failed in outcomes),
+        "throughput_rps": round(n / elapsed, 3),
+        "mean_ms": round(float(latencies.mean()), 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        "llm_calls_per_request": round(llm_calls / n, 3),
+        "embedding_calls_per_request": round(embedding_calls / n, 3),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions of a run against a baseline run.
+
+    Args:
+        results: This run (``{"config": ..., "results": {target: {concurrency: metrics}}}``)
+        baseline: The stored run
+        tolerance: Allowed relative change (0.25 = 25%)
+
+    Returns:
+        One line per regressed metric (empty when the configs differ: the runs are not comparable)
+    """
+    if results["config"] != baseline.get("config"):
+        changed = sorted(
+            key for key in set(results["config"]) | set(baseline.get("config", {}))
+            if results["config"].get(key) != baseline.get("config", {}).get(key)
+        )
+        print(f"Baseline was recorded with different settings ({', '.join(changed)}); not comparing")
+        return []
+
+    regressions = []
+    for target, levels in results["results"].items():
+        for concurrency, metrics in levels.items():
+            base = baseline["results"].get(target, {}).get(concurrency)
+            if base is None:
+                continue
+            label = f"{target} concurrency={concurrency}"
+            for name in _LOWER_IS_BETTER:
+                limit = base[name] * (1 + tolerance)
+                if name.endswith("_ms"):
+                    limit = max(limit, base[name] + _MIN_LATENCY_DELTA_MS)
+                if metrics[name] > limit:
+                    regressions.append(f"{label}: {name} {base[name]} -> {metrics[name]}")
+            if metrics["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{label}: throughput_rps {base['throughput_rps']} -> {metrics['throughput_rps']}")
+            if metrics["errors"] > base["errors"]:
+                regressions.append(f"{label}: errors {base['errors']} -> {metrics['errors']}")
+    return regressions
+
+
+def _report(target: str, concurrency: int, metrics: Dict[str, float]) -> None:
+    print(f"{target:<9} c={concurrency:<3} {metrics['requests']:4d} req {metrics['errors']:3d} err "
+          f"{metrics['throughput_rps']:8.2f} req/s  mean={metrics['mean_ms']:8.1f}ms  p50={metrics['p50_ms']:8.1f}ms  "
+          f"p95={metrics['p95_ms']:8.1f}ms  p99={metrics['p99_ms']:8.1f}ms  "
+          f"llm/req={metrics['llm_calls_per_request']:.2f}  emb/req={metrics['embedding_calls_per_request']:.2f}")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark the agents end to end with fake models and a seeded database.")
+    argparser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS), help="Entry points to benchmark.")
+    argparser.add_argument("--concurrency", "-c", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to try.")
+    argparser.add_argument("--requests", "-n", type=int, default=32, help="Requests per target and concurrency level.")
+    argparser.add_argument("--async", dest="use_async", action="store_true", help="Benchmark the async entry points on one event loop.")
+    argparser.add_argument("--llm_latency", type=float, default=0.2, help="Simulated seconds per LLM call (time to first token).")
+    argparser.add_argument("--token_latency", type=float, default=0.0, help="Simulated seconds per generated word.")
+    argparser.add_argument("--embedding_latency", type=float, default=0.02, help="Simulated seconds per embedding request.")
+    argparser.add_argument("--dimensions", type=int, default=256, help="Fake embedding dimension.")
+    argparser.add_argument("--chunks", type=int, default=2000, help="Chunks in the synthetic document index.")
+    argparser.add_argument("--customers", type=int, default=2000, help="Customers seeded into the database.")
+    argparser.add_argument("--transactions", type=int, default=50_000, help="Transactions seeded into the database.")
+    argparser.add_argument("--answer_cache", action="store_true", help="Let the hybrid route use the answer cache.")
+    argparser.add_argument("--database_url", type=str, default=None, help="Local database to seed and use (default: SQLite in the work directory).")
+    argparser.add_argument("--workdir", type=str, default=None, help="Directory for the database, caches, index and logs (default: temporary, removed afterwards).")
+    argparser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="Baseline results (JSON) to compare with.")
+    argparser.add_argument("--save_baseline", action="store_true", help="Store this run as the baseline instead of comparing.")
+    argparser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression before failing.")
+    argparser.add_argument("--output", "-o", type=str, default=None, help="Also write this run's results (JSON) here.")
+    argparser.add_argument("--verbose", "-v", action="store_true", help="Show the agents' console output.")
+    args = argparser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="copilot-bench-")
+    configure_environment(workdir, args.database_url)
+
+    # Only now: settings and the database URL are read when src is imported
+    from src.db.connection import get_engine
+    from src.db.rollups import get_rollup_manager, refresh_rollups
+    from src.log_writer import flush_logs
+    from src.rag.index_registry import get_index_registry
+
+    llm = FakeChatModel(respond=scripted_reply, latency=args.llm_latency, per_token_latency=args.token_latency)
+    embeddings = FakeEmbeddings(dimensions=args.dimensions, request_latency=args.embedding_latency, per_text_latency=0)
+    install_fakes(llm, embeddings)
+
+    engine = get_engine(read_only=False)
+    if seed_database(engine, customers=args.customers, transactions=args.transactions):
+        print(f"Seeded {engine.url.render_as_string(hide_password=True)}")
+    index_path = os.path.join(workdir, "index")
+    if not os.path.exists(index_path):
+        build_corpus_index(index_path, chunks=args.chunks, dimensions=args.dimensions)
+    if get_rollup_manager() is not None:
+        refresh_rollups()
+
+    with engine.connect() as conn:
+        # Actual sizes: an existing database (--database_url, a reused --workdir) is not reseeded
+        rows = {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in ("customers", "employees", "transactions")}
+
+    targets = _targets(index_path, os.path.join(workdir, "logs", "executions.jsonl"), args.answer_cache)
+    loop = asyncio.new_event_loop() if args.use_async else None
+
+    def run(target: str, requests: int, concurrency: int) -> Tuple[List[Outcome], float]:
+        fn, afn, questions = targets[target]
+        with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+            if loop is not None:
+                return loop.run_until_complete(_run_tasks(afn, questions, requests, concurrency))
+            return _run_threads(fn, questions, requests, concurrency)
+
+    results: Dict[str, Any] = {
+        "config": {
+            "mode": "async" if args.use_async else "threads",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "token_latency": args.token_latency,
+            "embedding_latency": args.embedding_latency,
+            "dimensions": args.dimensions,
+            "chunks": args.chunks,
+            "database": engine.dialect.name,
+            "customers": rows["customers"],
+            "employees": rows["employees"],
+            "transactions": rows["transactions"],
+            "answer_cache": args.answer_cache,
+        },
+        "results": {},
+    }
+    try:
+        for target in args.targets:
+            # Warm up: one call per question fills the schema, router, index and embedding caches
+            run(target, len(targets[target][2]), 1)
+            results["results"][target] = {}
+            for concurrency in args.concurrency:
+                llm_calls, embedding_calls = llm.calls, embeddings.calls
+                outcomes, elapsed = run(target, args.requests, concurrency)
+                metrics = _summarize(outcomes, elapsed, llm.calls - llm_calls, embeddings.calls - embedding_calls)
+                results["results"][target][str(concurrency)] = metrics
+                _report(target, concurrency, metrics)
+    finally:
+        if loop is not None:
+            loop.close()
+        flush_logs()
+        get_index_registry().stop()
+        if get_rollup_manager() is not None:
+            get_rollup_manager().stop()
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    else:
+        print(f"No baseline at {args.baseline}; store one with --save_baseline")
@@ -0,0 +1,55 @@
+"""
+Embedding throughput benchmark against a fake local backend.
+
+Compares the old one-request-per-chunk loop with the batched, concurrent
+``BatchEmbedder`` at several concurrency levels.
+
+Example: python -m benchmarks.bench_embeddings --texts 2000 --latency 0.05
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakeEmbeddings
+from src.rag.batch_embed import BatchEmbedder
+
+
+def _synthetic_texts(n: int, words: int) -> list:
+    return [" ".join(f"word{(i * 7 + j) % 997}" for j in range(words)) + f" chunk {i}" for i in range(n)]
+
+
+def _report(label: str, n: int, elapsed: float, calls: int) -> None:
+    print(f"{label:<28} {elapsed:8.2f}s {n / elapsed:10.1f} texts/s {calls:6d} requests")
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark embedding throughput with a fake backend.")
+    argparser.add_argument("--texts", "-n", type=int, default=2000, help="Number of chunks to embed.")
+    argparser.add_argument("--words", type=int, default=150, help="Words per chunk.")
+    argparser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request.")
+    argparser.add_argument("--batch_tokens", type=int, default=8000, help="Max tokens per batch.")
+    argparser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrency levels to try.")
+    argparser.add_argument("--serial_sample", type=int, default=200, help="Chunks used to time the serial baseline.")
+    args = argparser.parse_args()
+
+    texts = _synthetic_texts(args.texts, args.words)
+
+    # Serial baseline: one embed_query per chunk, timed on a sample and extrapolated
+    backend = FakeEmbeddings(request_latency=args.latency)
+    sample = texts[:args.serial_sample]
+    start = time.perf_counter()
+    for text in sample:
+        backend.embed_query(text)
+    elapsed = (time.perf_counter() - start) * len(texts) / len(sample)
+    _report("serial embed_query (est.)", len(texts), elapsed, len(texts))
+
+    for concurrency in args.concurrency:
+        backend = FakeEmbeddings(request_latency=args.latency)
+        embedder = BatchEmbedder(
+            backend,
+            max_batch_tokens=args.batch_tokens,
+            max_concurrency=concurrency,
+            show_progress=False,
+        )
+        start = time.perf_counter()
+        embedder.embed(texts)
+        _report(f"batched, concurrency={concurrency}", len(texts), time.perf_counter() - start, backend.calls)
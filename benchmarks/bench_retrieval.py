@@ -0,0 +1,91 @@
+"""
+Retrieval quality benchmark: vector vs BM25 vs fused retrieval (with and without
+MMR re-ranking and token-budgeted packing) on a labeled question set.
+
+The question file is JSONL, one question per line, with the chunks that answer it
+given by docstore id and/or by a text snippet they contain:
+
+    {"question": "What is policy POL-2024-07 about?", "relevant_ids": ["3f2a..."], "relevant_text": "POL-2024-07"}
+
+Reports recall@k, precision@k and MRR for each retriever, plus the mean
+context tokens the top-k chunks would add to the prompt.
+
+Example: python -m benchmarks.bench_retrieval --index_path data/embeddings/faiss-index/ --questions data/eval/questions.jsonl -k 3
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from langchain_core.documents import Document
+
+from src.config.settings import load_vector_store, RAG_FUSION_FETCH_K
+from src.rag.bm25 import load_bm25_index
+from src.rag.fusion_retriever import FusionRetriever
+from src.utils import count_tokens
+
+
+def _is_relevant(doc: Document, example: Dict) -> bool:
+    if doc.id and doc.id in example.get("relevant_ids", []):
+        return True
+    snippet = example.get("relevant_text")
+    return bool(snippet) and snippet.lower() in doc.page_content.lower()
+
+
+def _evaluate(retrieve: Callable[[str], List[Document]], examples: List[Dict], k: int) -> Dict[str, float]:
+    recall = precision = mrr = tokens = seconds = 0.0
+    for example in examples:
+        start = time.perf_counter()
+        docs = retrieve(example["question"])[:k]
+        seconds += time.perf_counter() - start
+
+        relevant = [_is_relevant(doc, example) for doc in docs]
+        expected = max(len(example.get("relevant_ids", [])), 1)
+        recall += min(sum(relevant) / expected, 1.0)
+        precision += sum(relevant) / k
+        mrr += next((1.0 / rank for rank, hit in enumerate(relevant, start=1) if hit), 0.0)
+        tokens += sum(count_tokens(doc.page_content) for doc in docs)
+
+    n = len(examples)
+    return {
+        f"recall@{k}": recall / n,
+        f"precision@{k}": precision / n,
+        "mrr": mrr / n,
+        "context_tokens": tokens / n,
+        "ms_per_query": 1000 * seconds / n,
+    }
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark vector, BM25 and fused retrieval on labeled questions.")
+    argparser.add_argument("--index_path", "-i", type=str, required=True, help="FAISS index directory (built by build_index).")
+    argparser.add_argument("--questions", "-q", type=str, required=True, help="Labeled questions (JSONL).")
+    argparser.add_argument("--k", "-k", type=int, default=3, help="Chunks passed to the LLM.")
+    argparser.add_argument("--fetch_k", type=int, default=RAG_FUSION_FETCH_K, help="Candidates per retriever before fusion.")
+    args = argparser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+
+    vector_store = load_vector_store(args.index_path)
+    bm25 = load_bm25_index(args.index_path)
+    if bm25 is None:
+        raise SystemExit(f"No BM25 index in {args.index_path}; rebuild it with build_index.py")
+
+    def lexical(question: str) -> List[Document]:
+        docs = (vector_store.docstore.search(doc_id) for doc_id, _ in bm25.search(question, args.k))
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    fusion = FusionRetriever(vector_store=vector_store, bm25=bm25, k=args.k, fetch_k=args.fetch_k, rerank=False)
+    packed = FusionRetriever(vector_store=vector_store, bm25=bm25, k=args.k, fetch_k=args.fetch_k, rerank=True)
+    retrievers = {
+        "vector": lambda question: vector_store.similarity_search(question, k=args.k),
+        "bm25": lexical,
+        "fusion (rrf)": fusion.invoke,
+        "fusion + mmr": packed.invoke,
+    }
+
+    print(f"{len(examples)} questions, k={args.k}, fetch_k={args.fetch_k}")
+    for name, retrieve in retrievers.items():
+        metrics = _evaluate(retrieve, examples, args.k)
+        print(f"{name:<14} " + "  ".join(f"{key}={value:.3f}" for key, value in metrics.items()))
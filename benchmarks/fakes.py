@@ -0,0 +1,184 @@
+"""Deterministic, offline stand-ins for the Azure OpenAI clients."""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+_WORD = re.compile(r"\w+")
+_MAX_CACHED_WORDS = 50_000
+
+
+def _seeded_vector(key: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Embeddings backend that simulates network latency and returns stable vectors.
+
+    Each request costs ``request_latency`` seconds plus ``per_text_latency`` per
+    input, which mimics the round-trip dominated profile of the real endpoint.
+    A text embeds as the normalized sum of one fixed random vector per word,
+    so equal texts embed equally and texts sharing words are close (retrieval,
+    routing and the similarity cache behave as they would on real vectors).
+    """
+
+    def __init__(self, dimensions: int = 1536, request_latency: float = 0.05, per_text_latency: float = 0.0005):
+        self.dimensions = dimensions
+        self.request_latency = request_latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self._words: Dict[str, np.ndarray] = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            vector = _seeded_vector(word, self.dimensions)
+            if len(self._words) < _MAX_CACHED_WORDS:
+                self._words[word] = vector
+        return vector
+
+    def _vector(self, text: str) -> List[float]:
+        words = _WORD.findall(text.lower())
+        if words:
+            vector = np.sum([self._word_vector(word) for word in words], axis=0)
+        else:
+            vector = _seeded_vector(text, self.dimensions)
+        vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.request_latency + self.per_text_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.request_latency + self.per_text_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n\n".join(message.content if isinstance(message.content, str) else str(message.content) for message in messages)
+
+
+def _cut_at_stop(reply: str, stop: Optional[List[str]]) -> str:
+    for sequence in stop or []:
+        reply = reply.split(sequence, 1)[0]
+    return reply
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with ``respond(prompt)`` after a simulated delay.
+
+    A call costs ``latency`` seconds (time to first token) plus
+    ``per_token_latency`` per generated word; streaming yields the reply word
+    by word at that pace. Token usage (words, as a cheap proxy) is reported
+    the way the Azure client reports it, so token metrics are exercised too.
+    Async calls sleep on the event loop, like a real network client.
+    """
+
+    respond: Callable[[str], str]
+    latency: float = 0.5
+    per_token_latency: float = 0.0
+    model_name: str = "fake-chat"
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _reply(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> tuple:
+        with self._lock:
+            self._calls += 1
+        prompt = _prompt_text(messages)
+        reply = _cut_at_stop(self.respond(prompt), stop)
+        return prompt, reply, self.latency + self.per_token_latency * len(reply.split())
+
+    def _result(self, prompt: str, reply: str) -> ChatResult:
+        usage = {"input_tokens": len(prompt.split()), "output_tokens": len(reply.split())}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message = AIMessage(content=reply, usage_metadata=usage)
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name},
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt, reply, seconds = self._reply(messages, stop)
+        time.sleep(seconds)
+        return self._result(prompt, reply)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt, reply, seconds = self._reply(messages, stop)
+        await asyncio.sleep(seconds)
+        return self._result(prompt, reply)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        _, reply, _ = self._reply(messages, stop)
+        time.sleep(self.latency)
+        for word in re.findall(r"\S+\s*", reply):
+            time.sleep(self.per_token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        _, reply, _ = self._reply(messages, stop)
+        await asyncio.sleep(self.latency)
+        for word in re.findall(r"\S+\s*", reply):
+            await asyncio.sleep(self.per_token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
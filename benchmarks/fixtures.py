@@ -0,0 +1,337 @@
+"""
+Offline fixtures for the end-to-end benchmarks: database, document corpus and scripted model replies.
+
+``configure_environment`` must run before anything under ``src`` is imported
+(settings and the database URL are read at import time); the functions
+below that need ``src`` import it lazily for that reason.
+"""
+import os
+import random
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+
+
+# The schema described in the classification prompt (portable between SQLite and PostgreSQL)
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS employees (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    hire_date DATE,
+    region VARCHAR(50),
+    performance_rating NUMERIC(3, 1)
+)""",
+    """CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    email VARCHAR(255),
+    address VARCHAR(255),
+    registration_date DATE,
+    customer_type VARCHAR(20),
+    loyalty_score INTEGER
+)""",
+    """CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER REFERENCES customers(id),
+    employee_id INTEGER REFERENCES employees(id),
+    amount NUMERIC(12, 2) NOT NULL,
+    transaction_date TIMESTAMP NOT NULL,
+    type VARCHAR(20),
+    status VARCHAR(20),
+    payment_method VARCHAR(20),
+    currency VARCHAR(3)
+)""",
+]
+
+REGIONS = ["North", "South", "East", "West", "Central"]
+_INSERT_BATCH = 5000
+
+# (question, route, SQL the fake model writes for it, single-value answer template)
+QUESTIONS: List[Tuple[str, str, Optional[str], str]] = [
+    ("How many customers do we have?", "sql",
+     "SELECT COUNT(*) FROM customers", "We have {value} customers."),
+    ("What is the total revenue from completed purchases?", "sql",
+     "SELECT SUM(amount) FROM transactions WHERE type = 'purchase' AND status = 'completed'",
+     "Completed purchases brought in {value} in total."),
+    ("Who are the 10 most loyal customers?", "sql",
+     "SELECT name, loyalty_score FROM customers ORDER BY loyalty_score DESC, id LIMIT 10", ""),
+    ("Show total sales per region", "sql",
+     "SELECT e.region, SUM(t.amount) AS sales FROM transactions t JOIN employees e ON e.id = t.employee_id "
+     "WHERE t.type = 'purchase' AND t.status = 'completed' GROUP BY e.region ORDER BY sales DESC", ""),
+    ("How many refunds were paid by credit card?", "sql",
+     "SELECT COUNT(*) FROM transactions WHERE type = 'refund' AND payment_method = 'credit_card'",
+     "{value} refunds were paid by credit card."),
+    ("What is the average transaction amount per currency?", "sql",
+     "SELECT currency, AVG(amount) AS average_amount FROM transactions GROUP BY currency ORDER BY currency", ""),
+    ("What is the refund policy?", "rag", None, ""),
+    ("How are loyalty points earned and redeemed?", "rag", None, ""),
+    ("What are the guidelines for expense reimbursement?", "rag", None, ""),
+    ("Summarize the employee performance review process", "rag", None, ""),
+    ("How long is customer data retained?", "rag", None, ""),
+    ("List the top 5 corporate customers and explain the benefits they get", "hybrid",
+     "SELECT name, loyalty_score FROM customers WHERE customer_type = 'corporate' "
+     "ORDER BY loyalty_score DESC, id LIMIT 5", ""),
+    ("How many refunds did we process and what does the refund policy say about them?", "hybrid",
+     "SELECT COUNT(*) FROM transactions WHERE type = 'refund'", "We processed {value} refunds."),
+    ("Which region has the best rated employees and what do the performance guidelines require?", "hybrid",
+     "SELECT region, AVG(performance_rating) AS rating FROM employees GROUP BY region ORDER BY rating DESC LIMIT 1",
+     ""),
+]
+
+_TOPICS = {
+    "refund-policy": (
+        "Refund policy",
+        [
+            "Purchases can be refunded within 30 days of the transaction date.",
+            "Refunds are paid with the original payment method; cash refunds need a store receipt.",
+            "Corporate customers may request refunds up to 60 days after delivery.",
+            "Refunds above 5,000 EUR require approval from a regional manager.",
+            "Cancelled transactions are never refunded because no payment was captured.",
+            "Partial refunds are allowed when only some items of an order are returned.",
+        ],
+    ),
+    "loyalty-program": (
+        "Loyalty program",
+        [
+            "Customers earn one loyalty point per euro spent on completed purchases.",
+            "Points are redeemed at checkout, 100 points for a 5 EUR discount.",
+            "A loyalty score above 80 grants free shipping and priority support.",
+            "Corporate customers receive a dedicated account manager and volume discounts.",
+            "Points expire 24 months after they were earned.",
+            "Refunded purchases remove the points they earned.",
+        ],
+    ),
+    "expense-reimbursement": (
+        "Expense reimbursement guidelines",
+        [
+            "Employees submit expense reports within 30 days, with itemized receipts.",
+            "Travel is booked through the corporate portal; economy class is the default.",
+            "Meals are reimbursed up to 50 EUR per day while travelling.",
+            "Managers approve expenses within five business days.",
+            "Reimbursements are paid by transfer with the next payroll run.",
+        ],
+    ),
+    "performance-review": (
+        "Employee performance reviews",
+        [
+            "Performance reviews take place twice a year, in June and December.",
+            "Employees are rated from 1 to 5; a rating of 4 or more qualifies for a bonus.",
+            "Sales targets, customer feedback and teamwork weigh equally in the rating.",
+            "Employees rated below 2 agree on an improvement plan with their manager.",
+            "Regional managers calibrate ratings across their region before they are final.",
+        ],
+    ),
+    "data-retention": (
+        "Customer data retention",
+        [
+            "Customer records are retained for seven years after the last transaction.",
+            "Email addresses are deleted on request within 30 days.",
+            "Transaction data is archived after three years and kept for audits.",
+            "Access to customer data is logged and reviewed every quarter.",
+        ],
+    ),
+    "payment-methods": (
+        "Payment methods",
+        [
+            "We accept credit cards, cash and bank transfers.",
+            "Transfers must arrive within 14 days, otherwise the order is cancelled.",
+            "Credit card payments are captured when the order ships.",
+            "Prices are charged in EUR, USD or GBP depending on the customer's country.",
+        ],
+    ),
+}
+
+_FILLER = [
+    "This section applies to all regions unless stated otherwise.",
+    "Contact the support team for cases this document does not cover.",
+    "The policy was last reviewed by the compliance team this year.",
+    "Exceptions must be documented in the customer record.",
+    "Local regulations take precedence where they are stricter.",
+]
+
+
+def configure_environment(workdir: str, database_url: Optional[str] = None) -> str:
+    """
+    Point the application at benchmark-only state: its database, caches and logs live in ``workdir``.
+
+    Args:
+        workdir: Directory for the database, caches, index and logs
+        database_url: Database to use instead of a SQLite file in ``workdir`` (e.g. a local PostgreSQL)
+
+    Returns:
+        The database URL
+    """
+    os.makedirs(workdir, exist_ok=True)
+    database_url = database_url or f"sqlite:///{os.path.join(workdir, 'copilot.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    os.environ["CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(workdir, "cache", "embeddings")
+    os.environ["ANSWER_CACHE_PATH"] = os.path.join(workdir, "cache", "answers.sqlite")
+    os.environ["SCHEMA_CACHE_PATH"] = os.path.join(workdir, "cache", "schema.json")
+    os.environ["ROUTER_CACHE_PATH"] = os.path.join(workdir, "cache", "router_centroids.json")
+    os.environ["ROUTER_LOG_FILES"] = os.path.join(workdir, "logs", "router_examples.jsonl")  # Train on the prompt examples only
+    return database_url
+
+
+def _random_date(rng: random.Random, start: date, days: int) -> date:
+    return start + timedelta(days=rng.randrange(days))
+
+
+def _insert(engine: Engine, table: str, rows: List[Dict[str, Any]]) -> None:
+    columns = list(rows[0])
+    statement = text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})")
+    for i in range(0, len(rows), _INSERT_BATCH):
+        with engine.begin() as conn:
+            conn.execute(statement, rows[i:i + _INSERT_BATCH])
+
+
+def seed_database(
+    engine: Engine,
+    customers: int = 2000,
+    employees: int = 50,
+    transactions: int = 50_000,
+    seed: int = 0
+) -> bool:
+    """
+    Create the copilot schema and fill it with deterministic synthetic rows.
+
+    Tables are created if missing and never dropped; a database whose
+    ``transactions`` table already has rows is left as it is.
+
+    Args:
+        engine: Writable engine
+        customers: Customers to create
+        employees: Employees to create
+        transactions: Transactions to create (2023-2024)
+        seed: Random seed
+
+    Returns:
+        Whether rows were inserted
+    """
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        if conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar():
+            return False
+
+    rng = random.Random(seed)
+    _insert(engine, "employees", [{
+        "id": i,
+        "name": f"Employee {i}",
+        "hire_date": _random_date(rng, date(2015, 1, 1), 3000).isoformat(),
+        "region": rng.choice(REGIONS),
+        "performance_rating": round(rng.uniform(1, 5), 1),
+    } for i in range(1, employees + 1)])
+    _insert(engine, "customers", [{
+        "id": i,
+        "name": f"Customer {i}",
+        "email": f"customer{i}@example.com",
+        "address": f"{rng.randint(1, 200)} Main Street, City {rng.randint(1, 50)}",
+        "registration_date": _random_date(rng, date(2020, 1, 1), 1800).isoformat(),
+        "customer_type": "corporate" if rng.random() < 0.2 else "individual",
+        "loyalty_score": rng.randint(0, 100),
+    } for i in range(1, customers + 1)])
+    start = datetime(2023, 1, 1)
+    _insert(engine, "transactions", [{
+        "id": i,
+        "customer_id": rng.randint(1, customers),
+        "employee_id": rng.randint(1, employees),
+        "amount": round(rng.lognormvariate(4, 1), 2),
+        "transaction_date": (start + timedelta(seconds=rng.randrange(730 * 86400))).isoformat(sep=" "),
+        "type": "refund" if rng.random() < 0.08 else "purchase",
+        "status": rng.choices(["completed", "pending", "cancelled"], [85, 10, 5])[0],
+        "payment_method": rng.choice(["credit_card", "cash", "transfer"]),
+        "currency": rng.choices(["EUR", "USD", "GBP"], [60, 30, 10])[0],
+    } for i in range(1, transactions + 1)])
+    return True
+
+
+def synthetic_corpus(chunks: int = 2000, seed: int = 0) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Policy-document chunks over the topics the RAG questions ask about.
+
+    Args:
+        chunks: Number of chunks
+        seed: Random seed
+
+    Returns:
+        (texts, metadata) as read from a chunk JSONL file
+    """
+    rng = random.Random(seed)
+    topics = sorted(_TOPICS)
+    texts, metadata = [], []
+    for i in range(chunks):
+        slug = topics[i % len(topics)]
+        title, sentences = _TOPICS[slug]
+        section = i // len(topics) + 1
+        body = rng.sample(sentences, k=min(len(sentences), rng.randint(3, 5))) + rng.sample(_FILLER, k=2)
+        rng.shuffle(body)
+        texts.append(f"{title}, section {section}. " + " ".join(body))
+        metadata.append({"source": f"{slug}.md", "section": section})
+    return texts, metadata
+
+
+def build_corpus_index(index_path: str, chunks: int = 2000, dimensions: int = 256, seed: int = 0) -> None:
+    """Build a FAISS + BM25 index of the synthetic corpus with ``build_index`` (embedded without latency)."""
+    from src.rag.build_index import create_faiss_index
+
+    texts, metadata = synthetic_corpus(chunks, seed)
+    embeddings = FakeEmbeddings(dimensions=dimensions, request_latency=0, per_text_latency=0).embed_documents(texts)
+    create_faiss_index(texts, embeddings, metadata, index_path)
+
+
+_ROUTES = {question: route for question, route, _, _ in QUESTIONS}
+_SQL = {question: (sql, template) for question, _, sql, template in QUESTIONS if sql}
+_CLASSIFY_QUERY = re.compile(r'Query: "(.*)"')
+
+
+def _answer(seed_text: str, words: int = 60) -> str:
+    rng = random.Random(seed_text)
+    sentences = [sentence for _, topic_sentences in _TOPICS.values() for sentence in topic_sentences]
+    answer = []
+    while sum(len(sentence.split()) for sentence in answer) < words:
+        answer.append(rng.choice(sentences))
+    return " ".join(answer)
+
+
+def scripted_reply(prompt: str) -> str:
+    """
+    What the fake model answers to each of the application's prompts, for the benchmark questions.
+
+    Classification returns the question's route, direct SQL mode gets the
+    question's query (and answer template), the ReAct agent gets a final
+    answer; everything else (answers over SQL results, RAG, synthesis) gets
+    a deterministic paragraph.
+    """
+    if "Return only one word: sql, rag, or hybrid" in prompt:
+        query = _CLASSIFY_QUERY.findall(prompt)[-1]
+        if query in _ROUTES:
+            return _ROUTES[query]
+        return "rag" if re.search(r"polic|guideline|procedure|manual", query, re.IGNORECASE) else "sql"
+    if "Reply in exactly this format" in prompt:
+        question = prompt.rsplit("Question:", 1)[-1].strip()
+        sql, template = _SQL.get(question, ("SELECT COUNT(*) FROM customers", "There are {value} customers."))
+        return f"SQL: {sql}\nANSWER: {template}"
+    if "Final Answer" in prompt and "Thought:" in prompt:
+        return f"Thought: I now know the final answer\nFinal Answer: {_answer(prompt[-200:], 30)}"
+    return _answer(prompt[-200:])
+
+
+def install_fakes(llm: FakeChatModel, embeddings: FakeEmbeddings) -> None:
+    """Make ``get_llm`` and ``get_embedding_model`` return the fakes (the embeddings behind the embedding cache, as in production)."""
+    from src.config import settings
+    from src.tracing import tracing_callbacks
+
+    if llm.callbacks is None:
+        llm.callbacks = tracing_callbacks()
+    settings._llm_instance = llm
+    if settings.EMBEDDING_CACHE_ENABLED:
+        from src.cache.embedding_cache import CachedEmbeddings
+        embeddings = CachedEmbeddings(embeddings, model_name=f"fake-embeddings-{embeddings.dimensions}")
+    settings._embedding_instance = embeddings
@@ -1,37 +1,56 @@
 """Hybrid Agent - Routes queries to SQL, RAG, or both."""
-from typing import Dict, Any, Optional
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Iterator, List, Optional, Tuple
 from langchain.prompts import ChatPromptTemplate
 
-from src.config.settings import get_llm
-from src.utils import load_prompt
+from src.config.settings import (
+    get_llm,
+    get_embedding_model,
+    ANSWER_CACHE_ENABLED,
+    DEFAULT_FAISS_INDEX_PATH,
+    HYBRID_BRANCH_WORKERS,
+    HYBRID_MAX_ABANDONED_BRANCHES,
+    RAG_BRANCH_TIMEOUT_SECONDS,
+    ROUTER_CONFIDENCE_THRESHOLD,
+    ROUTER_ENABLED,
+    SQL_BRANCH_TIMEOUT_SECONDS,
+)
+from src.utils import load_prompt, normalize_question
 from src.utils import log_agent_execution as write_log
-from src.agents.sql_agent import execute_sql_query
-from src.agents.rag_agent import execute_rag_query
+from src.agents.sql_agent import execute_sql_query, aexecute_sql_query
+from src.agents.rag_agent import execute_rag_query, aexecute_rag_query, astream_rag_query
+from src.agents.router import get_router
+from src.cache.answer_cache import get_answer_cache
+from src.cache.single_flight import get_single_flight
+from src.rag.index_store import index_version
+from src.tracing import ABANDONED_BRANCHES, current_trace, record, span, start_trace
 
 
+# Shared pool running the SQL and RAG branches of hybrid queries side by side
+_branch_executor = ThreadPoolExecutor(max_workers=HYBRID_BRANCH_WORKERS, thread_name_prefix="hybrid-branch")
 
+# Timed-out branches still holding a pool thread, per branch
+_abandoned = {"sql": 0, "rag": 0}
+_abandoned_lock = threading.Lock()
 
-def classify_query(query: str) -> str:
-    """
-    Classify query as 'sql', 'rag', or 'hybrid'.
-    
-    Args:
-        query: User's natural language question
-        
-    Returns:
-        Classification: 'sql', 'rag', or 'hybrid'
-    """
-    llm = get_llm(temperature=0)
+
+def _classification_messages(query: str):
     prompt_message = load_prompt("classify_query")
-    
+
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", prompt_message),
         ("user", "{query}")
     ])
-    
-    response = llm.invoke(prompt_template.format_messages(query=query))
-    category = response.content.strip().lower()
-    
+    return prompt_template.format_messages(query=query)
+
+
+def _normalize_category(content: str) -> str:
+    category = content.strip().lower()
+
     # Normalize
     if category in ["sql", "rag", "hybrid"]:
         return category
@@ -43,73 +62,685 @@ def classify_query(query: str) -> str:
         return "hybrid"
 
 
+def _classify_with_llm(query: str) -> str:
+    """Classify query as 'sql', 'rag', or 'hybrid' with a chat completion."""
+    llm = get_llm(temperature=0)
+    response = llm.invoke(_classification_messages(query))
+    return _normalize_category(response.content)
+
+
+async def _aclassify_with_llm(query: str) -> str:
+    llm = get_llm(temperature=0)
+    response = await llm.ainvoke(_classification_messages(query))
+    return _normalize_category(response.content)
+
+
+def _local_decision(router, query_embedding: List[float]) -> Dict[str, Any]:
+    """Apply the local router; 'route' stays None when it is not confident enough."""
+    decision = {"route": None, "source": "llm", "confidence": None}
+    local_route, confidence, _ = router.predict(query_embedding)
+    decision.update(local_route=local_route, local_confidence=round(confidence, 4))
+    if confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+        decision.update(route=local_route, source="local", confidence=round(confidence, 4))
+    return decision
+
+
+def route_query(query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Pick a route with the local router, falling back to the LLM when unsure.
+
+    Args:
+        query: User's natural language question
+        query_embedding: Optional precomputed embedding of the question
+
+    Returns:
+        Dict with 'route', 'source' ('local' or 'llm'), 'confidence' and the
+        local router's 'local_route'/'local_confidence' when it ran
+    """
+    decision = {"route": None, "source": "llm", "confidence": None}
+    router = get_router() if ROUTER_ENABLED else None
+    if router is not None:
+        try:
+            if query_embedding is None:
+                query_embedding = get_embedding_model().embed_query(query)
+            decision = _local_decision(router, query_embedding)
+        except Exception as e:
+            print(f"Local router failed, using the LLM classifier: {e}")
+
+    if decision["route"] is None:
+        decision["route"] = _classify_with_llm(query)
+    return decision
+
+
+async def aroute_query(query: str, query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Async version of ``route_query``."""
+    decision = {"route": None, "source": "llm", "confidence": None}
+    # The first call trains the router (embedding the examples); keep it off the loop
+    router = await asyncio.to_thread(get_router) if ROUTER_ENABLED else None
+    if router is not None:
+        try:
+            if query_embedding is None:
+                query_embedding = await get_embedding_model().aembed_query(query)
+            decision = _local_decision(router, query_embedding)
+        except Exception as e:
+            print(f"Local router failed, using the LLM classifier: {e}")
+
+    if decision["route"] is None:
+        decision["route"] = await _aclassify_with_llm(query)
+    return decision
+
+
+def classify_query(query: str) -> str:
+    """
+    Classify query as 'sql', 'rag', or 'hybrid'.
+
+    Args:
+        query: User's natural language question
+
+    Returns:
+        Classification: 'sql', 'rag', or 'hybrid'
+    """
+    return route_query(query)["route"]
+
+
+async def aclassify_query(query: str) -> str:
+    """Async version of ``classify_query``."""
+    return (await aroute_query(query))["route"]
+
+
+def _embed_for_cache(query: str) -> Optional[List[float]]:
+    """Embed the question for the similarity tier; the cache still works without it."""
+    try:
+        return get_embedding_model().embed_query(query)
+    except Exception as e:
+        print(f"Answer cache: embedding failed, exact tier only ({e})")
+        return None
+
+
+async def _aembed_for_cache(query: str) -> Optional[List[float]]:
+    try:
+        return await get_embedding_model().aembed_query(query)
+    except Exception as e:
+        print(f"Answer cache: embedding failed, exact tier only ({e})")
+        return None
+
+
+def _is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only answers produced without agent errors are worth replaying."""
+    return not any(
+        "error" in result.get(key, {}) for key in ("sql_result", "rag_result")
+    )
+
+
+def _log_cache_hit(query: str, cached: Dict[str, Any], log_file: Optional[str]) -> None:
+    write_log({
+        "agent_type": "cache",
+        "query": query,
+        "route": cached["route"],
+        "cache_tier": cached["cache"]["tier"]
+    }, log_file=log_file, log_type="cache")
+
+
+def _coalescing_key(query: str, index_path: str, use_cache: bool) -> Tuple[str, str, bool]:
+    return normalize_question(query), index_path, use_cache
+
+
 def execute_hybrid_query(
     query: str,
-    log_file: Optional[str] = None
+    log_file: Optional[str] = None,
+    use_cache: bool = True,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH,
+    coalesce: bool = True
 ) -> Dict[str, Any]:
     """
     Execute a hybrid query by routing to appropriate agent(s).
-    
+
+    Answers are served from the answer cache when the same (or a semantically
+    near-identical) question was answered recently against the same data.
+    Identical questions arriving while one is already being answered wait for
+    that execution instead of starting their own.
+
     Args:
         query: User's question
         log_file: Optional log file path
-        
+        use_cache: Whether to consult and fill the answer cache
+        index_path: Path to the FAISS index used by the RAG agent
+        coalesce: Whether to share the execution of identical in-flight questions
+
     Returns:
-        Dict with 'answer', 'route', and metadata
+        Dict with 'answer', 'route', 'cache', and metadata
     """
-    # Classify
-    route = classify_query(query)
-    print(f"Route: {route}")
-    
-    # Log classification
+    with start_trace():
+        if not coalesce:
+            return _cached_hybrid_query(query, log_file, use_cache, index_path)
+        return get_single_flight().do(
+            _coalescing_key(query, index_path, use_cache),
+            lambda: _cached_hybrid_query(query, log_file, use_cache, index_path),
+        )
+
+
+def _cached_hybrid_query(
+    query: str,
+    log_file: Optional[str],
+    use_cache: bool,
+    index_path: str
+) -> Dict[str, Any]:
+    if not (use_cache and ANSWER_CACHE_ENABLED):
+        return _run_hybrid_query(query, log_file, index_path=index_path)
+
+    cache = get_answer_cache()
+    version = index_version(index_path)
+    embedding = None
+
+    def embed() -> Optional[List[float]]:
+        nonlocal embedding
+        embedding = _embed_for_cache(query)
+        return embedding
+
+    with span("answer_cache"):
+        cached = cache.get(query, index_version=version, embed_fn=embed, index_path=index_path)
+    if cached is not None:
+        _log_cache_hit(query, cached, log_file)
+        return cached
+
+    result = _run_hybrid_query(query, log_file, query_embedding=embedding, index_path=index_path)
+    if _is_cacheable(result):
+        cache.put(query, result, index_version=version, embedding=embedding, index_path=index_path)
+    result["cache"] = {"hit": False}
+    return result
+
+
+async def aexecute_hybrid_query(
+    query: str,
+    log_file: Optional[str] = None,
+    use_cache: bool = True,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH,
+    coalesce: bool = True
+) -> Dict[str, Any]:
+    """
+    Async version of ``execute_hybrid_query``.
+
+    LLM and embedding calls are awaited, so one event loop can serve many
+    in-flight questions without holding a thread per request.
+
+    Args:
+        query: User's question
+        log_file: Optional log file path
+        use_cache: Whether to consult and fill the answer cache
+        index_path: Path to the FAISS index used by the RAG agent
+        coalesce: Whether to share the execution of identical in-flight questions
+
+    Returns:
+        Dict with 'answer', 'route', 'cache', and metadata
+    """
+    with start_trace():
+        if not coalesce:
+            return await _acached_hybrid_query(query, log_file, use_cache, index_path)
+        return await get_single_flight().ado(
+            _coalescing_key(query, index_path, use_cache),
+            lambda: _acached_hybrid_query(query, log_file, use_cache, index_path),
+        )
+
+
+async def _acached_hybrid_query(
+    query: str,
+    log_file: Optional[str],
+    use_cache: bool,
+    index_path: str
+) -> Dict[str, Any]:
+    if not (use_cache and ANSWER_CACHE_ENABLED):
+        return await _arun_hybrid_query(query, log_file, index_path=index_path)
+
+    cache = get_answer_cache()
+    version = index_version(index_path)
+    embedding = None
+
+    async def aembed() -> Optional[List[float]]:
+        nonlocal embedding
+        embedding = await _aembed_for_cache(query)
+        return embedding
+
+    with span("answer_cache"):
+        cached = await cache.aget(query, index_version=version, aembed_fn=aembed, index_path=index_path)
+    if cached is not None:
+        _log_cache_hit(query, cached, log_file)
+        return cached
+
+    result = await _arun_hybrid_query(query, log_file, query_embedding=embedding, index_path=index_path)
+    if _is_cacheable(result):
+        await cache.aput(query, result, index_version=version, embedding=embedding, index_path=index_path)
+    result["cache"] = {"hit": False}
+    return result
+
+
+def _timed_branch(fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Tuple[Dict[str, Any], float]:
+    """Run one agent branch, returning its result and wall time in seconds."""
+    start = time.perf_counter()
+    return fn(*args, **kwargs), time.perf_counter() - start
+
+
+def _branch_timeout(name: str, timeout: float, seconds: float) -> Dict[str, Any]:
+    result = {"answer": f"Error: {name} agent timed out after {timeout:.0f}s", "error": "timeout"}
+    return {"result": result, "status": "timeout", "seconds": round(seconds, 3)}
+
+
+def _branch_failure(e: Exception, seconds: float) -> Dict[str, Any]:
+    result = {"answer": f"Error: {str(e)}", "error": str(e)}
+    return {"result": result, "status": "error", "seconds": round(seconds, 3)}
+
+
+def _branch_success(result: Dict[str, Any], seconds: float) -> Dict[str, Any]:
+    status = "error" if "error" in result else "ok"
+    return {"result": result, "status": status, "seconds": round(seconds, 3)}
+
+
+def abandoned_branches() -> Dict[str, int]:
+    """Timed-out branches whose worker thread is still running, per branch."""
+    with _abandoned_lock:
+        return dict(_abandoned)
+
+
+def _track_abandoned(name: str, delta: int) -> None:
+    with _abandoned_lock:
+        _abandoned[name] += delta
+        ABANDONED_BRANCHES.set(_abandoned[name], branch=name)
+
+
+def _abandon(name: str, future) -> None:
+    """Count a timed-out branch until its thread finishes (at once if it never started)."""
+    _track_abandoned(name, 1)
+    future.add_done_callback(lambda _: _track_abandoned(name, -1))
+
+
+def _branch_unavailable(name: str, running: int) -> Dict[str, Any]:
+    result = {
+        "answer": f"Error: {name} agent unavailable, {running} timed-out calls are still running",
+        "error": "overloaded"
+    }
+    return {"result": result, "status": "error", "seconds": 0.0}
+
+
+def _run_branches(
+    query: str,
+    log_file: Optional[str] = None,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the SQL and RAG agents concurrently, each bounded by its own deadline.
+
+    A branch that fails or misses its deadline is replaced by an error result so
+    the other branch's answer can still be used. A timed-out branch keeps running
+    in the background (threads cannot be interrupted) but is no longer awaited;
+    it is counted in ``abandoned_branches()`` until it finishes. While a branch
+    has ``HYBRID_MAX_ABANDONED_BRANCHES`` such calls, it is not started again, so
+    a hung backend cannot take every thread of the shared pool.
+
+    Returns:
+        Dict keyed by 'sql'/'rag' with 'result', 'status' and 'seconds'
+    """
+    start = time.perf_counter()
+    calls = {
+        "sql": (execute_sql_query, (query, log_file), SQL_BRANCH_TIMEOUT_SECONDS),
+        "rag": (execute_rag_query, (query, index_path, log_file), RAG_BRANCH_TIMEOUT_SECONDS),
+    }
+    running = abandoned_branches()
+
+    outcomes, futures = {}, {}
+    for name, (fn, args, timeout) in calls.items():
+        if running[name] >= HYBRID_MAX_ABANDONED_BRANCHES:
+            outcomes[name] = _branch_unavailable(name, running[name])
+            continue
+        # Each branch runs in a copy of this context, to stay in the request's trace
+        futures[name] = _branch_executor.submit(contextvars.copy_context().run, _timed_branch, fn, *args)
+
+    for name, future in futures.items():
+        timeout = calls[name][2]
+        remaining = max(0.0, start + timeout - time.perf_counter())
+        try:
+            outcomes[name] = _branch_success(*future.result(timeout=remaining))
+        except FutureTimeoutError:
+            if not future.cancel():
+                _abandon(name, future)
+            outcomes[name] = _branch_timeout(name, timeout, time.perf_counter() - start)
+        except Exception as e:
+            outcomes[name] = _branch_failure(e, time.perf_counter() - start)
+    return {name: outcomes[name] for name in calls}
+
+
+async def _arun_branch(name: str, branch: Awaitable[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(branch, timeout=timeout)
+        return _branch_success(result, time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        return _branch_timeout(name, timeout, time.perf_counter() - start)
+    except Exception as e:
+        return _branch_failure(e, time.perf_counter() - start)
+
+
+async def _arun_branches(
+    query: str,
+    log_file: Optional[str] = None,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> Dict[str, Dict[str, Any]]:
+    """Async version of ``_run_branches``; timed-out branches are cancelled."""
+    sql_outcome, rag_outcome = await asyncio.gather(
+        _arun_branch("sql", aexecute_sql_query(query, log_file), SQL_BRANCH_TIMEOUT_SECONDS),
+        _arun_branch("rag", aexecute_rag_query(query, index_path, log_file), RAG_BRANCH_TIMEOUT_SECONDS),
+    )
+    return {"sql": sql_outcome, "rag": rag_outcome}
+
+
+def _synthesis_messages(branches: Dict[str, Dict[str, Any]]):
+    summarization_prompt = load_prompt("hybrid_summarization_prompt")
+
+    template = ChatPromptTemplate.from_messages([
+        ("system", summarization_prompt),
+        ("user", "{sql_answer}\n\n{rag_answer}")
+    ])
+
+    sql, rag = branches["sql"], branches["rag"]
+    return template.format_messages(
+        sql_answer=sql["result"]["answer"] if sql["status"] == "ok" else "No structured data available.",
+        rag_answer=rag["result"]["answer"] if rag["status"] == "ok" else "No document context available."
+    )
+
+
+def _log_classification(query: str, routing: Dict[str, Any], log_file: Optional[str]) -> None:
     write_log({
         "agent_type": "classifier",
         "query": query,
-        "classification": route
+        "classification": routing["route"],
+        "routing_source": routing["source"],
+        "confidence": routing["confidence"],
+        "local_route": routing.get("local_route"),
+        "local_confidence": routing.get("local_confidence")
     }, log_file=log_file, log_type="classification")
-    
+
+
+def _single_route_result(route: str, routing: Dict[str, Any], agent_result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "answer": agent_result["answer"],
+        "route": route,
+        "routing": routing,
+        f"{route}_result": agent_result
+    }
+
+
+def _hybrid_result(
+    answer: str,
+    routing: Dict[str, Any],
+    branches: Dict[str, Dict[str, Any]],
+    timings: Dict[str, float]
+) -> Dict[str, Any]:
+    timings.update(
+        sql_seconds=branches["sql"]["seconds"],
+        rag_seconds=branches["rag"]["seconds"],
+    )
+    return {
+        "answer": answer,
+        "route": "hybrid",
+        "routing": routing,
+        "branches": {name: branch["status"] for name, branch in branches.items()},
+        "sql_result": branches["sql"]["result"],
+        "rag_result": branches["rag"]["result"]
+    }
+
+
+def _any_branch_ok(branches: Dict[str, Dict[str, Any]]) -> bool:
+    return any(branch["status"] == "ok" for branch in branches.values())
+
+
+def _failed_branches_answer(branches: Dict[str, Dict[str, Any]]) -> str:
+    return f"{branches['sql']['result']['answer']}\n{branches['rag']['result']['answer']}"
+
+
+def _finish(
+    query: str,
+    result: Dict[str, Any],
+    routing: Dict[str, Any],
+    timings: Dict[str, float],
+    start: float,
+    log_file: Optional[str]
+) -> Dict[str, Any]:
+    timings["total_seconds"] = round(time.perf_counter() - start, 3)
+    result["timings"] = timings
+    record(f"route:{routing['route']}", timings["total_seconds"])
+    trace = current_trace()
+    write_log({
+        "agent_type": "hybrid",
+        "query": query,
+        "route": routing["route"],
+        "routing_source": routing["source"],
+        "branches": result.get("branches"),
+        "timings": timings,
+        "stages": trace.stage_totals() if trace is not None else None,
+        "duration_seconds": timings["total_seconds"]
+    }, log_file=log_file, log_type="hybrid")
+    return result
+
+
+def _run_hybrid_query(
+    query: str,
+    log_file: Optional[str] = None,
+    query_embedding: Optional[List[float]] = None,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> Dict[str, Any]:
+    """Classify the query and run the matching agent(s), without caching."""
+    start = time.perf_counter()
+
+    # Classify
+    with span("classification"):
+        routing = route_query(query, query_embedding)
+    route = routing["route"]
+    timings = {"classification_seconds": round(time.perf_counter() - start, 3)}
+    print(f"Route: {route} ({routing['source']}, confidence={routing['confidence']})")
+    _log_classification(query, routing, log_file)
+
     # Execute based on route
     if route == "sql":
-        sql_result = execute_sql_query(query, log_file)
-        return {
-            "answer": sql_result["answer"],
-            "route": "sql",
-            "sql_result": sql_result
-        }
-    
+        result = _single_route_result("sql", routing, execute_sql_query(query, log_file))
+
+    elif route == "rag":
+        result = _single_route_result("rag", routing, execute_rag_query(query, index_path, log_file))
+
+    else:  # hybrid
+        # Get both results concurrently
+        branches = _run_branches(query, log_file, index_path)
+
+        # Synthesize with whatever branches succeeded
+        if _any_branch_ok(branches):
+            synthesis_start = time.perf_counter()
+            with span("synthesis"):
+                answer = get_llm(temperature=0).invoke(_synthesis_messages(branches)).content
+            timings["synthesis_seconds"] = round(time.perf_counter() - synthesis_start, 3)
+        else:
+            answer = _failed_branches_answer(branches)
+        result = _hybrid_result(answer, routing, branches, timings)
+
+    return _finish(query, result, routing, timings, start, log_file)
+
+
+async def _arun_hybrid_query(
+    query: str,
+    log_file: Optional[str] = None,
+    query_embedding: Optional[List[float]] = None,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> Dict[str, Any]:
+    """Async version of ``_run_hybrid_query``."""
+    start = time.perf_counter()
+
+    # Classify
+    with span("classification"):
+        routing = await aroute_query(query, query_embedding)
+    route = routing["route"]
+    timings = {"classification_seconds": round(time.perf_counter() - start, 3)}
+    print(f"Route: {route} ({routing['source']}, confidence={routing['confidence']})")
+    _log_classification(query, routing, log_file)
+
+    # Execute based on route
+    if route == "sql":
+        result = _single_route_result("sql", routing, await aexecute_sql_query(query, log_file))
+
+    elif route == "rag":
+        result = _single_route_result("rag", routing, await aexecute_rag_query(query, index_path, log_file))
+
+    else:  # hybrid
+        branches = await _arun_branches(query, log_file, index_path)
+
+        if _any_branch_ok(branches):
+            synthesis_start = time.perf_counter()
+            with span("synthesis"):
+                answer = (await get_llm(temperature=0).ainvoke(_synthesis_messages(branches))).content
+            timings["synthesis_seconds"] = round(time.perf_counter() - synthesis_start, 3)
+        else:
+            answer = _failed_branches_answer(branches)
+        result = _hybrid_result(answer, routing, branches, timings)
+
+    return _finish(query, result, routing, timings, start, log_file)
+
+async def astream_hybrid_query(
+    query: str,
+    log_file: Optional[str] = None,
+    use_cache: bool = True,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a hybrid answer as events, for server-sent events and streaming UIs.
+
+    The routing decision is sent first, then the RAG sources as soon as they are
+    retrieved, then the tokens of the final generation (the RAG "stuff" chain or
+    the hybrid synthesis). The SQL agent's answer is sent as one token event.
+
+    Args:
+        query: User's question
+        log_file: Optional log file path
+        use_cache: Whether to consult and fill the answer cache
+        index_path: Path to the FAISS index used by the RAG agent
+
+    Yields:
+        Event dicts {"event": "route" | "sources" | "token" | "error" | "done", "data": ...};
+        the final "done" event carries the same result dict as ``aexecute_hybrid_query``
+    """
+    cache = get_answer_cache() if use_cache and ANSWER_CACHE_ENABLED else None
+    version = index_version(index_path)
+    embedding = None
+
+    async def aembed() -> Optional[List[float]]:
+        nonlocal embedding
+        embedding = await _aembed_for_cache(query)
+        return embedding
+
+    with span("answer_cache"):
+        cached = None
+        if cache:
+            cached = await cache.aget(query, index_version=version, aembed_fn=aembed, index_path=index_path)
+    if cached is not None:
+        _log_cache_hit(query, cached, log_file)
+        yield {"event": "route", "data": cached.get("routing") or {"route": cached["route"]}}
+        if cached.get("rag_result"):
+            yield {"event": "sources", "data": cached["rag_result"].get("source_documents", [])}
+        yield {"event": "token", "data": cached["answer"]}
+        yield {"event": "done", "data": cached}
+        return
+
+    start = time.perf_counter()
+    with span("classification"):
+        routing = await aroute_query(query, embedding)
+    route = routing["route"]
+    timings = {"classification_seconds": round(time.perf_counter() - start, 3)}
+    _log_classification(query, routing, log_file)
+    yield {"event": "route", "data": routing}
+
+    if route == "sql":
+        sql_result = await aexecute_sql_query(query, log_file)
+        if "error" in sql_result:
+            yield {"event": "error", "data": sql_result["answer"]}
+        yield {"event": "token", "data": sql_result["answer"]}
+        result = _single_route_result("sql", routing, sql_result)
+
     elif route == "rag":
-        rag_result = execute_rag_query(query, log_file=log_file)
-        return {
-            "answer": rag_result["answer"],
-            "route": "rag",
-            "rag_result": rag_result
-        }
-    
+        rag_result = None
+        async for event in astream_rag_query(query, index_path, log_file):
+            if event["event"] == "done":
+                rag_result = event["data"]
+            else:
+                yield event
+        result = _single_route_result("rag", routing, rag_result)
+
     else:  # hybrid
-        # Get both results
-        sql_result = execute_sql_query(query, log_file)
-        rag_result = execute_rag_query(query, log_file=log_file)
-        
-        # Synthesize
-        llm = get_llm(temperature=0)
-        summarization_prompt = load_prompt("hybrid_summarization_prompt")
-        
-        template = ChatPromptTemplate.from_messages([
-            ("system", summarization_prompt),
-            ("user", "{sql_answer}\n\n{rag_answer}")
-        ])
-        
-        final_response = llm.invoke(template.format_messages(
-            sql_answer=sql_result["answer"],
-            rag_answer=rag_result["answer"]
-        ))
-        
-        return {
-            "answer": final_response.content,
-            "route": "hybrid",
-            "sql_result": sql_result,
-            "rag_result": rag_result
-        }
+        # Tasks rather than gather: the sources go out while the SQL branch is still running
+        sql_task = asyncio.ensure_future(
+            _arun_branch("sql", aexecute_sql_query(query, log_file), SQL_BRANCH_TIMEOUT_SECONDS)
+        )
+        rag_task = asyncio.ensure_future(
+            _arun_branch("rag", aexecute_rag_query(query, index_path, log_file), RAG_BRANCH_TIMEOUT_SECONDS)
+        )
+        try:
+            rag_outcome = await rag_task
+            if rag_outcome["result"].get("source_documents"):
+                yield {"event": "sources", "data": rag_outcome["result"]["source_documents"]}
+            branches = {"sql": await sql_task, "rag": rag_outcome}
+        finally:
+            # The client went away mid-stream: stop the branches too
+            sql_task.cancel()
+            rag_task.cancel()
+
+        if _any_branch_ok(branches):
+            synthesis_start = time.perf_counter()
+            tokens = []
+            async for chunk in get_llm(temperature=0).astream(_synthesis_messages(branches)):
+                if chunk.content:
+                    tokens.append(chunk.content)
+                    yield {"event": "token", "data": chunk.content}
+            answer = "".join(tokens)
+            timings["synthesis_seconds"] = round(time.perf_counter() - synthesis_start, 3)
+            record("synthesis", timings["synthesis_seconds"])
+        else:
+            answer = _failed_branches_answer(branches)
+            yield {"event": "error", "data": answer}
+            yield {"event": "token", "data": answer}
+        result = _hybrid_result(answer, routing, branches, timings)
+
+    result = _finish(query, result, routing, timings, start, log_file)
+    if cache and _is_cacheable(result):
+        await cache.aput(query, result, index_version=version, embedding=embedding, index_path=index_path)
+    result["cache"] = {"hit": False}
+    yield {"event": "done", "data": result}
+
+
+# Background event loop that lets synchronous callers (e.g. Streamlit) consume
+# the async stream; async clients keep their connection pools on one loop.
+_bridge_loop: Optional[asyncio.AbstractEventLoop] = None
+_bridge_lock = threading.Lock()
+
+
+def _get_bridge_loop() -> asyncio.AbstractEventLoop:
+    global _bridge_loop
+    with _bridge_lock:
+        if _bridge_loop is None:
+            _bridge_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bridge_loop.run_forever, name="stream-bridge", daemon=True).start()
+        return _bridge_loop
+
+
+def stream_hybrid_query(
+    query: str,
+    log_file: Optional[str] = None,
+    use_cache: bool = True,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH
+) -> Iterator[Dict[str, Any]]:
+    """Synchronous iterator over the events of ``astream_hybrid_query``."""
+    loop = _get_bridge_loop()
+    events = astream_hybrid_query(query, log_file, use_cache, index_path)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(events.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(events.aclose(), loop).result()
 
 if __name__ == "__main__":
     import argparse
@@ -118,6 +749,6 @@ if __name__ == "__main__":
     parser.add_argument("--query", "-q", required=True, help="Question to ask")
     parser.add_argument("--log_file", "-l", help="Log file path")
     args = parser.parse_args()
-    
+
     result = execute_hybrid_query(args.query, args.log_file)
-    print("Answer:", result["answer"])
\ No newline at end of file
+    print("Answer:", result["answer"])
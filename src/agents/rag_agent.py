@@ -1,49 +1,119 @@
 """RAG Agent - Retrieval-Augmented Generation from documents."""
 
 
-from typing import Dict, Any, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from langchain.chains import RetrievalQA
-from src.config.settings import get_llm, load_vector_store, DEFAULT_FAISS_INDEX_PATH
+from langchain_core.documents import Document
+from langchain_core.prompts import format_document
+from langchain_community.vectorstores import FAISS
+from src.config.settings import get_llm, DEFAULT_FAISS_INDEX_PATH, RAG_HYBRID_RETRIEVAL
+from src.rag.bm25 import BM25Index, load_bm25_index
+from src.rag.fusion_retriever import FusionRetriever
+from src.rag.index_registry import get_index_registry
+from src.tracing import record, tracing_callbacks
 from src.utils import log_agent_execution
+import asyncio
 import json
 
 
-# Module-level Cache
-_qa_chain = None
-_current_index_path = None
+def _build_qa_chain(vector_store: FAISS, bm25: Optional[BM25Index] = None) -> RetrievalQA:
+    return RetrievalQA.from_chain_type(
+        llm=get_llm(temperature=0),
+        chain_type="stuff",
+        retriever=FusionRetriever(vector_store=vector_store, bm25=bm25),
+        return_source_documents=True,
+    )
+
 
 def _get_qa_chain(index_path: str = DEFAULT_FAISS_INDEX_PATH) -> RetrievalQA:
     """
-    Get or create the RAG QA chain (cached per index path).
-    
+    Get or create the RAG QA chain of an index.
+
+    Its retriever fuses vector and BM25 results (when the index has a BM25
+    file and RAG_HYBRID_RETRIEVAL is on).
+
+    Chains live in the index registry next to their index, so several
+    collections can be served side by side and a rebuilt index is picked up
+    without a restart.
+
     Args:
         index_path: Path to FAISS index directory
         
     Returns:
         RetrievalQA chain instance
     """
-    global _qa_chain, _current_index_path
+    def build(vector_store: FAISS) -> RetrievalQA:
+        bm25 = load_bm25_index(index_path) if RAG_HYBRID_RETRIEVAL else None
+        return _build_qa_chain(vector_store, bm25)
+
+    return get_index_registry().get_derived(index_path, "qa_chain", build)
+
+
+def _new_log_entry(question: str) -> Dict[str, Any]:
+    return {
+        "agent_type": "rag",
+        "question": question,
+        "answer": "",
+        "source_documents": [],
+        "duration_seconds": 0,
+        "num_sources": 0
+    }
+
+
+def _parse_chain_result(result: Dict[str, Any], log_entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a RetrievalQA result into the response, recording it in the log entry."""
+    source_docs = [
+        {
+            "content": doc.page_content[:200],  # Truncate for logs
+            "metadata": doc.metadata
+        }
+        for doc in result["source_documents"]
+    ]
     
-    # Reload if path changed
-    if _qa_chain is None or _current_index_path != index_path:
-        llm = get_llm(temperature=0)
-        vector_store = load_vector_store(index_path)
-        
-        _qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3}
-            ),
-            return_source_documents=True,
-        )
-        _current_index_path = index_path
+    log_entry["answer"] = result["result"]
+    log_entry["source_documents"] = source_docs
+    log_entry["num_sources"] = len(source_docs)
+    
+    return {
+        "answer": result["result"],
+        "source_documents": [
+            {
+                "content": doc.page_content,
+                "metadata": doc.metadata
+            }
+            for doc in result["source_documents"]
+        ],
+    }
+
+
+def _error_response(e: Exception, log_entry: Dict[str, Any]) -> Dict[str, Any]:
+    error_msg = f"Error: {str(e)}"
+    log_entry["error"] = str(e)
+    log_entry["answer"] = error_msg
     
-    return _qa_chain
+    return {
+        "answer": error_msg,
+        "error": str(e),
+        "source_documents": [],
+    }
 
 
+def _finalize(
+    response: Dict[str, Any],
+    log_entry: Dict[str, Any],
+    start_time: datetime,
+    log_file: Optional[str]
+) -> Dict[str, Any]:
+    # Duration
+    log_entry["duration_seconds"] = (datetime.now() - start_time).total_seconds()
+    response["duration_seconds"] = log_entry["duration_seconds"]
+    record("rag_agent", log_entry["duration_seconds"], error="error" in log_entry)
+    
+    # Log
+    log_agent_execution(log_entry, log_file=log_file, log_type="rag")
+    
+    return response
 
 
 def execute_rag_query(
@@ -64,61 +134,103 @@ def execute_rag_query(
     """
     qa_chain = _get_qa_chain(index_path)
     start_time = datetime.now()
-    
-    log_entry = {
-        "agent_type": "rag",
-        "question": question,
-        "answer": "",
-        "source_documents": [],
-        "duration_seconds": 0,
-        "num_sources": 0
-    }
+    log_entry = _new_log_entry(question)
     
     try:
-        result = qa_chain.invoke({"query": question})
-        
-        source_docs = [
-            {
-                "content": doc.page_content[:200],  # Truncate for logs
-                "metadata": doc.metadata
-            }
-            for doc in result["source_documents"]
-        ]
+        result = qa_chain.invoke({"query": question}, config={"callbacks": tracing_callbacks()})
+        response = _parse_chain_result(result, log_entry)
+    except Exception as e:
+        response = _error_response(e, log_entry)
+    
+    return _finalize(response, log_entry, start_time, log_file)
+
+
+async def aexecute_rag_query(
+    question: str,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH,
+    log_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Async version of ``execute_rag_query`` built on ``ainvoke``.
+    
+    Args:
+        question: Natural language question
+        index_path: Path to FAISS index
+        log_file: Optional path to log file
         
-        log_entry["answer"] = result["result"]
-        log_entry["source_documents"] = source_docs
-        log_entry["num_sources"] = len(source_docs)
+    Returns:
+        Dict with 'answer', 'source_documents', and 'duration_seconds'
+    """
+    # Loading an index reads it from disk; keep that off the event loop
+    qa_chain = await asyncio.to_thread(_get_qa_chain, index_path)
+    start_time = datetime.now()
+    log_entry = _new_log_entry(question)
+    
+    try:
+        result = await qa_chain.ainvoke({"query": question}, config={"callbacks": tracing_callbacks()})
+        response = _parse_chain_result(result, log_entry)
+    except Exception as e:
+        response = _error_response(e, log_entry)
+    
+    return _finalize(response, log_entry, start_time, log_file)
+
+
+
+def _stuff_messages(qa_chain: RetrievalQA, question: str, docs: List[Document]):
+    """Build the exact prompt the chain's "stuff" step would send for these documents."""
+    combine = qa_chain.combine_documents_chain
+    context = combine.document_separator.join(
+        format_document(doc, combine.document_prompt) for doc in docs
+    )
+    return combine.llm_chain.prompt.format_prompt(
+        **{combine.document_variable_name: context, "question": question}
+    ).to_messages()
+
+
+async def astream_rag_query(
+    question: str,
+    index_path: str = DEFAULT_FAISS_INDEX_PATH,
+    log_file: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream a RAG answer: sources first, then answer tokens as the LLM emits them.
+
+    Uses the same retriever and "stuff" prompt as ``execute_rag_query``.
+    
+    Args:
+        question: Natural language question
+        index_path: Path to FAISS index
+        log_file: Optional path to log file
         
-        response = {
-            "answer": result["result"],
-            "source_documents": [
-                {
-                    "content": doc.page_content,
-                    "metadata": doc.metadata
-                }
-                for doc in result["source_documents"]
-            ],
+    Yields:
+        Event dicts: {"event": "sources", "data": [...]}, {"event": "token", "data": str},
+        then {"event": "done", "data": response} (or an "error" event)
+    """
+    qa_chain = await asyncio.to_thread(_get_qa_chain, index_path)
+    start_time = datetime.now()
+    log_entry = _new_log_entry(question)
+    tokens = []
+    
+    try:
+        docs = await qa_chain.retriever.ainvoke(question, config={"callbacks": tracing_callbacks()})
+        yield {
+            "event": "sources",
+            "data": [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs],
         }
         
-    except Exception as e:
-        error_msg = f"Error: {str(e)}"
-        log_entry["error"] = str(e)
-        log_entry["answer"] = error_msg
+        llm = qa_chain.combine_documents_chain.llm_chain.llm
+        async for chunk in llm.astream(_stuff_messages(qa_chain, question, docs)):
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield {"event": "token", "data": chunk.content}
         
-        response = {
-            "answer": error_msg,
-            "error": str(e),
-            "source_documents": [],
-        }
-    
-    # Duration
-    log_entry["duration_seconds"] = (datetime.now() - start_time).total_seconds()
-    response["duration_seconds"] = log_entry["duration_seconds"]
-    
-    # Log
-    log_agent_execution(log_entry, log_file=log_file, log_type="rag")
+        response = _parse_chain_result({"result": "".join(tokens), "source_documents": docs}, log_entry)
+    except Exception as e:
+        response = _error_response(e, log_entry)
+        yield {"event": "error", "data": response["answer"]}
+        yield {"event": "token", "data": response["answer"]}
     
-    return response
+    yield {"event": "done", "data": _finalize(response, log_entry, start_time, log_file)}
 
 
 
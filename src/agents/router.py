@@ -0,0 +1,189 @@
+"""Local Router - nearest-centroid query routing over embeddings, ahead of the LLM classifier."""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config.settings import (
+    get_embedding_model,
+    AZURE_EMBEDDINGS_DEPLOYMENT,
+    ROUTER_CACHE_PATH,
+    ROUTER_LOG_FILES,
+    ROUTER_MAX_LOG_EXAMPLES,
+    ROUTER_TEMPERATURE,
+)
+from src.utils import iter_logs, load_prompt
+
+
+ROUTES = ("sql", "rag", "hybrid")
+
+# Back-off between attempts to train the router after a failure (e.g. the embeddings endpoint is down)
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 3600.0
+
+# Matches example lines of classify_query.txt: - "Question?" → sql
+_EXAMPLE_PATTERN = re.compile(r'^\s*-\s*"(?P<query>[^"]+)"\s*(?:→|->)\s*(?P<route>sql|rag|hybrid)\b', re.MULTILINE)
+
+
+def load_prompt_examples() -> List[Tuple[str, str]]:
+    """Labeled (query, route) examples from the classification prompt."""
+    prompt = load_prompt("classify_query")
+    return [(m.group("query"), m.group("route")) for m in _EXAMPLE_PATTERN.finditer(prompt)]
+
+
+def load_logged_examples(
+    log_files: List[str] = ROUTER_LOG_FILES,
+    limit: int = ROUTER_MAX_LOG_EXAMPLES
+) -> List[Tuple[str, str]]:
+    """
+    Labeled examples from past LLM classifications.
+
+    Decisions made by this router are skipped so it never trains on its own output.
+
+    Args:
+        log_files: Log files holding classifier entries
+        limit: Keep only the most recent examples
+
+    Returns:
+        List of (query, route) tuples
+    """
+    examples = {}
+    for log_file in log_files:
+        for entry in iter_logs(log_file):
+            query, route = entry.get("query"), entry.get("classification")
+            if not query or route not in ROUTES or entry.get("routing_source") == "local":
+                continue
+            examples.pop(query, None)  # Keep the latest label, in recency order
+            examples[query] = route
+    return list(examples.items())[-limit:] if limit else list(examples.items())
+
+
+class CentroidRouter:
+    """
+    Nearest-centroid classifier over L2-normalized query embeddings.
+
+    Confidence is the softmax of the cosine similarity to each route centroid,
+    sharpened by ``temperature`` (cosine scores of embedding models sit in a
+    narrow band, so a raw softmax would never be confident).
+    """
+
+    def __init__(self, centroids: Dict[str, List[float]], temperature: float = ROUTER_TEMPERATURE):
+        self.routes = list(centroids)
+        self.centroids = np.asarray([centroids[r] for r in self.routes], dtype=np.float32)
+        self.temperature = temperature
+
+    @classmethod
+    def fit(
+        cls,
+        examples: List[Tuple[str, str]],
+        embeddings: Embeddings,
+        temperature: float = ROUTER_TEMPERATURE
+    ) -> "CentroidRouter":
+        """Embed the examples and average them per route."""
+        vectors = np.asarray(embeddings.embed_documents([query for query, _ in examples]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        labels = np.asarray([route for _, route in examples])
+
+        centroids = {}
+        for route in ROUTES:
+            members = vectors[labels == route]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[route] = (centroid / (np.linalg.norm(centroid) + 1e-12)).tolist()
+        return cls(centroids, temperature)
+
+    def predict(self, embedding: List[float]) -> Tuple[str, float, Dict[str, float]]:
+        """
+        Route one query embedding.
+
+        Returns:
+            (route, confidence, per-route cosine scores)
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        scores = self.centroids @ query
+        logits = (scores - scores.max()) / self.temperature
+        probs = np.exp(logits) / np.exp(logits).sum()
+        best = int(np.argmax(probs))
+        return self.routes[best], float(probs[best]), dict(zip(self.routes, scores.round(4).tolist()))
+
+
+def _examples_fingerprint(examples: List[Tuple[str, str]]) -> str:
+    payload = json.dumps([AZURE_EMBEDDINGS_DEPLOYMENT, sorted(examples)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def train_router(
+    log_files: List[str] = ROUTER_LOG_FILES,
+    cache_path: Optional[str] = ROUTER_CACHE_PATH,
+    embeddings: Optional[Embeddings] = None
+) -> Optional[CentroidRouter]:
+    """
+    Train the router from prompt and log examples, reusing cached centroids.
+
+    Centroids are stored in ``cache_path`` keyed by a fingerprint of the training
+    set and embedding deployment, so workers only re-embed when the data changed.
+
+    Returns:
+        CentroidRouter, or None when fewer than two routes have examples
+    """
+    examples = load_prompt_examples() + load_logged_examples(log_files)
+    if len({route for _, route in examples}) < 2:
+        return None
+
+    fingerprint = _examples_fingerprint(examples)
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == fingerprint:
+            return CentroidRouter(cached["centroids"])
+
+    router = CentroidRouter.fit(examples, embeddings or get_embedding_model())
+    if cache_path:
+        if os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "num_examples": len(examples),
+                "centroids": dict(zip(router.routes, router.centroids.tolist())),
+            }, f)
+        os.replace(tmp_path, cache_path)
+    return router
+
+
+# Module-level Cache
+_router: Optional[CentroidRouter] = None
+_router_loaded = False
+_router_failures = 0
+_router_retry_at = 0.0
+_router_lock = threading.Lock()
+
+
+def get_router() -> Optional[CentroidRouter]:
+    """
+    Get or train the local router once per process.
+
+    Returns None while it is unavailable. A failed training is retried on a
+    later call, after a back-off that doubles with each consecutive failure.
+    """
+    global _router, _router_loaded, _router_failures, _router_retry_at
+    with _router_lock:
+        if not _router_loaded and time.monotonic() >= _router_retry_at:
+            try:
+                _router = train_router()
+                _router_loaded = True
+                _router_failures = 0
+            except Exception as e:
+                delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** _router_failures)
+                _router_failures += 1
+                _router_retry_at = time.monotonic() + delay
+                print(f"Local router unavailable, using the LLM classifier only (retry in {delay:.0f}s): {e}")
+        return _router
@@ -2,105 +2,306 @@
 
 
 
-from logging import log
-from typing import Dict, Any, Optional
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
 import dotenv
-from langchain_community.utilities import SQLDatabase
-from src.db.connection import DB_URI
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy.engine import Engine
+from src.db.copilot_database import CopilotSQLDatabase
+from src.db.cost_guard import guard_query
+from src.db.result_cache import get_result_cache
+from src.db.rollups import get_rollup_manager
+from src.db.schema_cache import get_schema_cache
+from src.db.sql_validation import SQLValidationError, validate_select
 from langchain_openai import AzureChatOpenAI
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from datetime import datetime
+import asyncio
 import json
+import re
+import threading
+from src.tracing import record, span, tracing_callbacks
 from src.utils import load_prompt, log_agent_execution
-from src.config.settings import get_llm
+from src.config.settings import get_llm, SQL_DIRECT_MAX_ROWS, SQL_DIRECT_MODE
 
 
 dotenv.load_dotenv()  # Load environment variables from .env file
 
-_db = SQLDatabase.from_uri(DB_URI)
-_toolkit = None
 _agent_executor = None
+_agent_schema_version = None
+_agent_lock = threading.Lock()
 
 def _get_agent_executor():
-    global _toolkit, _agent_executor
-    if _agent_executor is None:
-        llm = get_llm(temperature=0)
-        _toolkit = SQLDatabaseToolkit(db=_db, llm=llm)
-        system_prompt = load_prompt("sql_agent_prompt")
-        _agent_executor = create_sql_agent(
-            llm=llm,
-            toolkit=_toolkit,
-            verbose=False,
-            return_intermediate_steps=True,
-            prefix=system_prompt,
-        )
+    """Build the agent on first use, and again whenever the schema cache picks up a new schema version."""
+    global _agent_executor, _agent_schema_version
+    schema_cache = get_schema_cache()
+    schema_cache.ensure_ready()
+    with _agent_lock:
+        if _agent_executor is None or _agent_schema_version != schema_cache.version:
+            version = schema_cache.version
+            # Tables are described from the cache: no reflection here, and sql_db_schema answers without sampling
+            db = CopilotSQLDatabase(
+                schema_cache.engine,
+                lazy_table_reflection=True,
+                custom_table_info={name: schema_cache.table_info(name) for name in schema_cache.tables},
+                result_cache=get_result_cache(),
+            )
+            llm = get_llm(temperature=0)
+            toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+            system_prompt = load_prompt("sql_agent_prompt")
+            _agent_executor = create_sql_agent(
+                llm=llm,
+                toolkit=toolkit,
+                verbose=False,
+                agent_executor_kwargs={"return_intermediate_steps": True},
+                prefix=system_prompt,
+                suffix=load_prompt("sql_agent_suffix"),
+            )
+            _agent_schema_version = version
     return _agent_executor
 
 
+def _schema_context(question: str) -> str:
+    """Cached schema of the relevant tables, plus the rollups aggregate questions should use."""
+    schema_cache = get_schema_cache()
+    context = schema_cache.prompt_context(question)
+    rollup_manager = get_rollup_manager()
+    rollups = rollup_manager.context(schema_cache.tables) if rollup_manager is not None else ""
+    return f"{context}\n\n{rollups}" if rollups else context
 
-def execute_sql_query(
-    question: str,
-    log_file: Optional[str] = None
-) -> Dict[str, Any]:
+
+def _agent_input(question: str, log_entry: Dict[str, Any]) -> Dict[str, str]:
+    """The question followed by the cached schema of the tables it most likely needs."""
+    schema_cache = get_schema_cache()
+    log_entry["schema_tables"] = schema_cache.relevant_tables(question)
+    agent_input = f"{question}\n\n{_schema_context(question)}"
+    if log_entry.get("direct_sql"):
+        # The direct attempt's query was rejected or failed: let the agent avoid the same mistake
+        agent_input += f"\n\nA first query for this question failed:\n{log_entry['direct_sql']}\nReason: {log_entry['fallback_reason']}"
+    return {"input": agent_input}
+
+
+
+class _LLMCallCounter(BaseCallbackHandler):
+    """Counts the LLM calls made while answering one question."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        self._count()
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self._count()
+
+
+_DIRECT_REPLY = re.compile(r"SQL:\s*(?P<sql>.*?)\s*(?:ANSWER:\s*(?P<answer>.*))?$", re.DOTALL | re.IGNORECASE)
+_MAX_VALUE_CHARS = 100
+
+
+def _direct_prompt(question: str) -> str:
+    schema_cache = get_schema_cache()
+    return load_prompt("sql_direct_prompt").format(
+        dialect=schema_cache.engine.dialect.name,
+        schema=_schema_context(question),
+        question=question,
+    )
+
+
+def _direct_sql(reply: str, log_entry: Dict[str, Any]) -> Tuple[str, str]:
+    """Extract and validate the query (and the single-value answer template) from the model reply."""
+    match = _DIRECT_REPLY.search(re.sub(r"```(?:sql)?", "", reply))
+    if not match or not match.group("sql"):
+        raise SQLValidationError("No SQL in the model reply")
+    log_entry["generated_sql"] = match.group("sql")  # Kept for the agent if validation rejects it
+    sql = validate_select(match.group("sql"), get_schema_cache().tables)
+    log_entry["generated_sql"] = sql
+    return sql, (match.group("answer") or "").strip()
+
+
+def _run_select(engine: Engine, sql: str, max_rows: int) -> Tuple[List[str], List[tuple]]:
+    """Run a validated query in a read-only transaction, past the cost guard; returns columns and up to max_rows + 1 rows."""
+    with span("sql_query"), engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+        result = conn.exec_driver_sql(guard_query(conn, sql, row_limit=max_rows + 1))
+        columns = list(result.keys())
+        rows = [tuple(row) for row in result.fetchmany(max_rows + 1)]
+        conn.rollback()
+    return columns, rows
+
+
+def _select(sql: str, log_entry: Dict[str, Any], max_rows: int = SQL_DIRECT_MAX_ROWS) -> Tuple[List[str], List[tuple], bool]:
+    """Result of a direct-mode query, from the result cache when possible; returns columns, rows, truncated flag."""
+    engine = get_schema_cache().engine
+    result_cache = get_result_cache()
+    if result_cache is None:
+        columns, rows = _run_select(engine, sql, max_rows)
+    else:
+        columns, rows, hit = result_cache.fetch(sql, lambda: _run_select(engine, sql, max_rows), f"max_rows={max_rows}")
+        log_entry["result_cache"] = "hit" if hit else "miss"
+    return columns, rows[:max_rows], len(rows) > max_rows
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool) or value is None:
+        return str(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, (float, Decimal)):
+        return f"{value:,.2f}"
+    value = str(value)
+    return value if len(value) <= _MAX_VALUE_CHARS else value[:_MAX_VALUE_CHARS] + "..."
+
+
+def _format_rows(columns: List[str], rows: List[tuple]) -> str:
+    lines = ["\t".join(columns)]
+    lines += ["\t".join(_format_value(value) for value in row) for row in rows]
+    return "\n".join(lines)
+
+
+def _template_answer(template: str, rows: List[tuple]) -> Optional[str]:
+    """Fill the model's answer template when the result is a single value (saves the answer call)."""
+    if "{value}" not in template or len(rows) != 1 or len(rows[0]) != 1:
+        return None
+    return template.replace("{value}", _format_value(rows[0][0]))
+
+
+def _answer_prompt(question: str, sql: str, columns: List[str], rows: List[tuple], truncated: bool) -> str:
+    row_count = f"first {len(rows)} rows" if truncated else f"{len(rows)} rows"
+    return load_prompt("sql_direct_answer_prompt").format(
+        question=question, sql=sql, row_count=row_count, result=_format_rows(columns, rows)
+    )
+
+
+def _direct_step(sql: str, columns: List[str], rows: List[tuple], log_entry: Dict[str, Any]) -> None:
+    log_entry["steps"].append({
+        "step_number": 1,
+        "tool": "direct_sql",
+        "tool_input": sql,
+        "observation": _format_rows(columns, rows)[:500],
+    })
+
+
+def _execute_direct(question: str, log_entry: Dict[str, Any], counter: _LLMCallCounter) -> Dict[str, Any]:
     """
-    Execute a natural language query against the SQL database.
-    
-    Args:
-        question: Natural language question
-        log_file: Optional path to log file
-        
-    Returns:
-        Dict with 'answer', 'steps', 'duration_seconds', and optional 'error'
+    Answer with one LLM call writing the query from the cached schema (two if the result is a table).
+
+    Raises on invalid SQL or a failed query, for the caller to fall back to the agent.
     """
-    agent_executor = _get_agent_executor()
-    start_time = datetime.now()
-    
-    log_entry = {
+    llm = get_llm(temperature=0)
+    config = {"callbacks": [counter, *tracing_callbacks()]}
+    get_schema_cache().ensure_ready()
+    sql, template = _direct_sql(llm.invoke(_direct_prompt(question), config=config).content, log_entry)
+    columns, rows, truncated = _select(sql, log_entry)
+    _direct_step(sql, columns, rows, log_entry)
+
+    answer = _template_answer(template, rows)
+    if answer is None:
+        answer = llm.invoke(_answer_prompt(question, sql, columns, rows, truncated), config=config).content
+    log_entry["answer"] = answer
+    log_entry["mode"] = "direct"
+    return {"answer": answer, "steps": log_entry["steps"]}
+
+
+async def _aexecute_direct(question: str, log_entry: Dict[str, Any], counter: _LLMCallCounter) -> Dict[str, Any]:
+    """Async version of ``_execute_direct``; the query runs in the default executor."""
+    llm = get_llm(temperature=0)
+    config = {"callbacks": [counter, *tracing_callbacks()]}
+    await asyncio.to_thread(get_schema_cache().ensure_ready)
+    # The rollup context reads watermarks from the database
+    prompt = await asyncio.to_thread(_direct_prompt, question)
+    reply = await llm.ainvoke(prompt, config=config)
+    sql, template = _direct_sql(reply.content, log_entry)
+    columns, rows, truncated = await asyncio.to_thread(_select, sql, log_entry)
+    _direct_step(sql, columns, rows, log_entry)
+
+    answer = _template_answer(template, rows)
+    if answer is None:
+        answer = (await llm.ainvoke(_answer_prompt(question, sql, columns, rows, truncated), config=config)).content
+    log_entry["answer"] = answer
+    log_entry["mode"] = "direct"
+    return {"answer": answer, "steps": log_entry["steps"]}
+
+
+def _note_fallback(e: Exception, log_entry: Dict[str, Any]) -> None:
+    print(f"Direct SQL failed, falling back to the agent: {e}")
+    log_entry["fallback_reason"] = str(e)
+    log_entry["direct_sql"] = log_entry.pop("generated_sql", None)
+    log_entry["steps"] = []
+
+
+def _new_log_entry(question: str) -> Dict[str, Any]:
+    return {
         "agent_type": "sql",
         "question": question,
         "answer": "",
         "steps": [],
         "duration_seconds": 0,
     }
+
+
+def _parse_agent_result(result: Dict[str, Any], log_entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the answer and intermediate steps of an agent run into the response."""
+    log_entry["answer"] = result["output"]
     
-    try:
-        result = agent_executor.invoke({"input": question})
-        log_entry["answer"] = result["output"]
-        
-        # Extract steps
-        if "intermediate_steps" in result:
-            for i, (action, observation) in enumerate(result["intermediate_steps"]):
-                step = {
-                    "step_number": i + 1,
-                    "tool": getattr(action, 'tool', str(action)),
-                    "tool_input": getattr(action, 'tool_input', str(action)),
-                    "observation": str(observation)[:500],
-                }
-                log_entry["steps"].append(step)
-                
-                # Capture SQL query
-                if "sql" in str(step["tool_input"]).lower():
-                    log_entry["generated_sql"] = step["tool_input"]
-        
-        response = {
-            "answer": result["output"],
-            "steps": log_entry["steps"],
-        }
-        
-    except Exception as e:
-        error_msg = f"Error: {str(e)}"
-        log_entry["error"] = str(e)
-        log_entry["answer"] = error_msg
-        response = {
-            "answer": error_msg,
-            "error": str(e),
-            "steps": [],
-        }
+    # Extract steps
+    if "intermediate_steps" in result:
+        for i, (action, observation) in enumerate(result["intermediate_steps"]):
+            step = {
+                "step_number": i + 1,
+                "tool": getattr(action, 'tool', str(action)),
+                "tool_input": getattr(action, 'tool_input', str(action)),
+                "observation": str(observation)[:500],
+            }
+            log_entry["steps"].append(step)
+            
+            # Capture SQL query
+            if "sql" in str(step["tool_input"]).lower():
+                log_entry["generated_sql"] = step["tool_input"]
     
+    log_entry["mode"] = "agent"
+    return {
+        "answer": result["output"],
+        "steps": log_entry["steps"],
+    }
+
+
+def _error_response(e: Exception, log_entry: Dict[str, Any]) -> Dict[str, Any]:
+    error_msg = f"Error: {str(e)}"
+    log_entry["error"] = str(e)
+    log_entry["answer"] = error_msg
+    return {
+        "answer": error_msg,
+        "error": str(e),
+        "steps": [],
+    }
+
+
+def _finalize(
+    response: Dict[str, Any],
+    log_entry: Dict[str, Any],
+    start_time: datetime,
+    log_file: Optional[str],
+    counter: _LLMCallCounter
+) -> Dict[str, Any]:
     # Duration
     log_entry["duration_seconds"] = (datetime.now() - start_time).total_seconds()
     response["duration_seconds"] = log_entry["duration_seconds"]
+    record("sql_agent", log_entry["duration_seconds"], error="error" in log_entry)
+
+    # Mode and cost
+    log_entry["llm_calls"] = counter.calls
+    response["mode"] = log_entry.get("mode", "agent")
+    response["llm_calls"] = counter.calls
+    if "fallback_reason" in log_entry:
+        response["fallback_reason"] = log_entry["fallback_reason"]
     
     # Log
     log_agent_execution(log_entry, log_file=log_file, log_type="sql")
@@ -108,6 +309,104 @@ def execute_sql_query(
     return response
 
 
+def execute_sql_query(
+    question: str,
+    log_file: Optional[str] = None,
+    direct: bool = SQL_DIRECT_MODE
+) -> Dict[str, Any]:
+    """
+    Execute a natural language query against the SQL database.
+
+    In direct mode one LLM call writes the query from the cached schema; it
+    is validated locally and run, and the ReAct agent is only used if that
+    fails.
+    
+    Args:
+        question: Natural language question
+        log_file: Optional path to log file
+        direct: Try the single-shot query first
+        
+    Returns:
+        Dict with 'answer', 'steps', 'mode' ('direct' or 'agent'), 'llm_calls',
+        'duration_seconds', and optional 'fallback_reason' and 'error'
+    """
+    start_time = datetime.now()
+    log_entry = _new_log_entry(question)
+    counter = _LLMCallCounter()
+
+    response = None
+
+    if direct:
+        try:
+            with span("sql_direct"):
+                response = _execute_direct(question, log_entry, counter)
+        except Exception as e:
+            _note_fallback(e, log_entry)
+
+    if response is None:
+        try:
+            # Builds the schema cache on a cold start: a database error becomes the error response
+            agent_executor = _get_agent_executor()
+            with span("sql_react_agent"):
+                result = agent_executor.invoke(
+                    _agent_input(question, log_entry), config={"callbacks": [counter, *tracing_callbacks()]}
+                )
+            response = _parse_agent_result(result, log_entry)
+        except Exception as e:
+            response = _error_response(e, log_entry)
+    
+    return _finalize(response, log_entry, start_time, log_file, counter)
+
+
+async def aexecute_sql_query(
+    question: str,
+    log_file: Optional[str] = None,
+    direct: bool = SQL_DIRECT_MODE
+) -> Dict[str, Any]:
+    """
+    Async version of ``execute_sql_query`` built on ``ainvoke``.
+
+    LLM calls are awaited on the event loop; queries (direct mode) and the
+    agent's database tool calls run in the default executor.
+    
+    Args:
+        question: Natural language question
+        log_file: Optional path to log file
+        direct: Try the single-shot query first
+        
+    Returns:
+        Dict with 'answer', 'steps', 'mode' ('direct' or 'agent'), 'llm_calls',
+        'duration_seconds', and optional 'fallback_reason' and 'error'
+    """
+    start_time = datetime.now()
+    log_entry = _new_log_entry(question)
+    counter = _LLMCallCounter()
+
+    response = None
+
+    if direct:
+        try:
+            with span("sql_direct"):
+                response = await _aexecute_direct(question, log_entry, counter)
+        except Exception as e:
+            _note_fallback(e, log_entry)
+
+    if response is None:
+        try:
+            # First call builds the agent and may build the schema cache; keep it off the loop
+            agent_executor = await asyncio.to_thread(_get_agent_executor)
+            agent_input = await asyncio.to_thread(_agent_input, question, log_entry)
+            with span("sql_react_agent"):
+                result = await agent_executor.ainvoke(
+                    agent_input, config={"callbacks": [counter, *tracing_callbacks()]}
+                )
+            response = _parse_agent_result(result, log_entry)
+        except Exception as e:
+            response = _error_response(e, log_entry)
+    
+    return _finalize(response, log_entry, start_time, log_file, counter)
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -117,9 +416,10 @@ if __name__ == "__main__":
         )
     argparser.add_argument("--question", '-q', type=str, required=True, help="The question to ask the SQL agent.")
     argparser.add_argument("--log_file", '-l', type=str, default="logs/agent_execution_log.json", help="Path to the logging file.")
+    argparser.add_argument("--agent", action="store_true", help="Skip direct mode and use the ReAct agent.")
 
     args = argparser.parse_args()
     question = args.question
     # Test the database connection and LLM
-    result = execute_sql_query(args.question, args.log_file)
+    result = execute_sql_query(args.question, args.log_file, direct=not args.agent)
     print(result)
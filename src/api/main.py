@@ -1,9 +1,103 @@
-from fastapi import FastAPI, Query
-from src.agents.hybrid_agent import execute_hybrid_query
+import json
+import time
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from src.agents.hybrid_agent import aexecute_hybrid_query, astream_hybrid_query
+from src.cache.answer_cache import get_answer_cache
+from src.cache.single_flight import get_single_flight
+from src.config.settings import ROLLUPS_ENABLED
+from src.db.connection import pool_stats
+from src.db.result_cache import get_result_cache
+from src.db.rollups import current_rollup_manager
+from src.db.schema_cache import get_schema_cache
+from src.tracing import HTTP_SECONDS, render_metrics, start_trace
 
 app = FastAPI() 
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Serve each request in its own trace (id from X-Trace-Id when given) and time it."""
+    start = time.perf_counter()
+    trace_id = (request.headers.get("x-trace-id") or request.headers.get("x-request-id") or "")[:64] or None
+    with start_trace(trace_id) as trace:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=getattr(route, "path", "unmatched"),  # Route template: bounded label values
+        status=str(response.status_code),
+    )
+    response.headers["X-Trace-Id"] = trace.trace_id
+    return response
+
+
 @app.get("/ask")
-def ask_question(question: str = Query(..., description="The question to ask the SQL agent")):
-    result = execute_hybrid_query(question, log_file="logs/hybrid_agent.log")
-    return {'answer': result['answer']}
\ No newline at end of file
+async def ask_question(question: str = Query(..., description="The question to ask the SQL agent")):
+    result = await aexecute_hybrid_query(question, log_file="logs/hybrid_agent.log")
+    return {'answer': result['answer']}
+
+
+@app.get("/ask/stream")
+async def ask_question_stream(question: str = Query(..., description="The question to ask")):
+    """Server-sent events: 'route', 'sources', 'token'..., then 'done' with the full result."""
+    async def event_stream():
+        async for event in astream_hybrid_query(question, log_file="logs/hybrid_agent.log"):
+            payload = json.dumps(event["data"], ensure_ascii=False, default=str)
+            yield f"event: {event['event']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return get_answer_cache().stats()
+
+
+@app.get("/coalescing/stats")
+def coalescing_stats():
+    """How many /ask requests ran their own execution vs. joined an identical in-flight one."""
+    return get_single_flight().stats()
+
+
+
+@app.get("/schema/stats")
+def schema_stats():
+    """Schema cache version, table count, age and rebuild counters."""
+    return get_schema_cache().stats()
+
+
+@app.get("/sql-cache/stats")
+def sql_cache_stats():
+    """SQL result cache hits, misses, invalidations and size."""
+    result_cache = get_result_cache()
+    return result_cache.stats() if result_cache is not None else {"enabled": False}
+
+
+@app.get("/db/pool/stats")
+def db_pool_stats():
+    """Connection pool size, checked-out connections, overflow and connect/checkout counters."""
+    return pool_stats()
+
+
+@app.get("/rollups/stats")
+def rollup_stats():
+    """Rollup refresh counters and the watermark of each summary table (read-only: never starts the rollups)."""
+    if not ROLLUPS_ENABLED:
+        return {"enabled": False}
+    rollup_manager = current_rollup_manager()
+    if rollup_manager is None:
+        return {"enabled": True, "started": False}
+    return {"enabled": True, "started": True, **rollup_manager.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latency histograms, stage errors, LLM tokens and HTTP latency, for Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -6,7 +6,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 import streamlit as st
-from src.agents.hybrid_agent import execute_hybrid_query
+from src.agents.hybrid_agent import stream_hybrid_query
 
 st.title("Enterprise AI Copilot")
 
@@ -14,9 +14,26 @@ q = st.text_input("Ask a question")
 
 if st.button("Ask"):
     if q.strip():
-        with st.spinner("Thinking..."):
-            result = execute_hybrid_query(q)
-        
-        st.markdown(f"**Answer:**\n\n{result['answer']}")
+        route_placeholder = st.empty()
+        sources = []
+
+        def answer_tokens():
+            """Render route/sources events on the side and yield answer tokens to the page."""
+            route_placeholder.caption("Thinking...")
+            for event in stream_hybrid_query(q):
+                if event["event"] == "route":
+                    route_placeholder.caption(f"Route: {event['data'].get('route')}")
+                elif event["event"] == "sources":
+                    sources.extend(event["data"])
+                elif event["event"] == "token":
+                    yield event["data"]
+
+        st.markdown("**Answer:**")
+        st.write_stream(answer_tokens())
+
+        if sources:
+            with st.expander(f"Sources ({len(sources)})"):
+                for source in sources:
+                    st.markdown(f"- `{source['metadata'].get('source', 'unknown')}`: {source['content'][:200]}...")
     else:
-        st.warning("Please enter a question!")
\ No newline at end of file
+        st.warning("Please enter a question!")
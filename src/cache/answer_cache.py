@@ -0,0 +1,319 @@
+"""Two-tier answer cache (exact question, then embedding similarity) for the hybrid agent."""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.config.settings import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    SQL_DATA_FRESHNESS_TTL_SECONDS,
+)
+from src.utils import normalize_question
+
+
+# Routes whose answers depend on the document index (invalidated on rebuild)
+INDEX_ROUTES = ("rag", "hybrid")
+# Routes whose answers depend on database contents (expire after the freshness TTL)
+DATA_ROUTES = ("sql", "hybrid")
+
+
+class AnswerCache:
+    """
+    LRU/TTL answer cache persisted in SQLite.
+
+    Tier 1 matches the normalized question exactly. Tier 2 compares the question
+    embedding with cached ones by cosine similarity. Both tiers are scoped to
+    the index the question was asked against, so services answering from
+    different indexes (collections) never share answers. Entries of the RAG and
+    hybrid routes carry the index version they were answered against and are
+    dropped once the index is rebuilt; SQL and hybrid entries expire after the
+    data-freshness TTL. The SQLite file can be shared by several workers; the
+    in-memory embedding matrix is reloaded whenever another connection commits.
+    """
+
+    def __init__(
+        self,
+        path: str = ANSWER_CACHE_PATH,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        sql_ttl_seconds: float = SQL_DATA_FRESHNESS_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.sql_ttl_seconds = sql_ttl_seconds
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+        self._lock = threading.Lock()
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                route TEXT NOT NULL,
+                index_path TEXT NOT NULL,
+                index_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        columns = [name for _, name, *_ in self._conn.execute("PRAGMA table_info(answers)")]
+        if "index_path" not in columns:
+            # Entries of older versions were keyed without the index and can no longer be looked up
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("ALTER TABLE answers ADD COLUMN index_path TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+        self._data_version = None
+        self._keys: List[str] = []
+        self._scopes: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _scope(index_path: str) -> str:
+        """Canonical form of an index path, so "./faiss_index" and "faiss_index" share entries."""
+        return os.path.abspath(index_path) if index_path else ""
+
+    @staticmethod
+    def _key(question: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\0{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def _is_valid(self, route: str, version: str, created_at: float, index_version: str, now: float) -> bool:
+        age = now - created_at
+        if age > self.ttl_seconds:
+            return False
+        if route in DATA_ROUTES and age > self.sql_ttl_seconds:
+            return False
+        if route in INDEX_ROUTES and version != index_version:
+            return False
+        return True
+
+    def _refresh_matrix(self) -> None:
+        """Reload cached embeddings if the database changed since the last load."""
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        rows = self._conn.execute(
+            "SELECT key, index_path, embedding FROM answers WHERE embedding IS NOT NULL"
+        ).fetchall()
+        self._keys = [key for key, _, _ in rows]
+        self._scopes = [scope for _, scope, _ in rows]
+        vectors = [np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows]
+        self._matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        self._data_version = data_version
+
+    def _semantic_candidates(self, embedding: List[float], scope: str) -> List[str]:
+        """Keys of the cached questions of one index at or above the similarity threshold, most similar first."""
+        self._refresh_matrix()
+        if not self._keys:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != self._matrix.shape[1]:
+            return []
+        norms = np.linalg.norm(self._matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = (self._matrix @ query) / np.where(norms == 0, 1.0, norms)
+        above = np.flatnonzero(scores >= self.similarity_threshold)
+        return [
+            self._keys[i] for i in above[np.argsort(-scores[above], kind="stable")] if self._scopes[i] == scope
+        ]
+
+    def _fetch(self, key: str, index_version: str, now: float) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT route, index_version, result, created_at FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        route, version, result, created_at = row
+        if not self._is_valid(route, version, created_at, index_version, now):
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._conn.commit()
+            self._data_version = None
+            self.counters["invalidations"] += 1
+            return None
+        self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return json.loads(result)
+
+    def _lookup_exact(self, question: str, scope: str, index_version: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._fetch(self._key(question, scope), index_version, now)
+            if result is not None:
+                self.counters["exact_hits"] += 1
+                result["cache"] = {"hit": True, "tier": "exact"}
+            return result
+
+    def _lookup_similar(
+        self,
+        embedding: Optional[List[float]],
+        scope: str,
+        index_version: str,
+        now: float
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if embedding is not None:
+                # The closest entry may be stale (dropped by _fetch): fall through to the next one
+                for key in self._semantic_candidates(embedding, scope):
+                    result = self._fetch(key, index_version, now)
+                    if result is not None:
+                        self.counters["semantic_hits"] += 1
+                        result["cache"] = {"hit": True, "tier": "semantic"}
+                        return result
+
+            self.counters["misses"] += 1
+            return None
+
+    def get(
+        self,
+        question: str,
+        index_version: str = "",
+        embed_fn: Optional[Callable[[], Optional[List[float]]]] = None,
+        index_path: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer.
+
+        Args:
+            question: User's question
+            index_version: Current version of the document index
+            embed_fn: Optional callable returning the question embedding; only
+                called when the exact tier misses
+            index_path: Document index the question is asked against
+
+        Returns:
+            Cached result dict (with a 'cache' field naming the tier), or None
+        """
+        now = time.time()
+        scope = self._scope(index_path)
+        result = self._lookup_exact(question, scope, index_version, now)
+        if result is not None:
+            return result
+        # Embed outside the lock: it is a network call
+        embedding = embed_fn() if embed_fn else None
+        return self._lookup_similar(embedding, scope, index_version, now)
+
+    async def aget(
+        self,
+        question: str,
+        index_version: str = "",
+        aembed_fn: Optional[Callable[[], Awaitable[Optional[List[float]]]]] = None,
+        index_path: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """Async version of ``get``; SQLite reads run in a worker thread, ``aembed_fn`` is awaited on an exact-tier miss."""
+        now = time.time()
+        scope = self._scope(index_path)
+        result = await asyncio.to_thread(self._lookup_exact, question, scope, index_version, now)
+        if result is not None:
+            return result
+        embedding = await aembed_fn() if aembed_fn else None
+        return await asyncio.to_thread(self._lookup_similar, embedding, scope, index_version, now)
+
+    def put(
+        self,
+        question: str,
+        result: Dict[str, Any],
+        index_version: str = "",
+        embedding: Optional[List[float]] = None,
+        index_path: str = ""
+    ) -> None:
+        """
+        Store an answer, evicting the least recently used entries over capacity.
+
+        Args:
+            question: User's question
+            result: Result dict from execute_hybrid_query (must contain 'route')
+            index_version: Version of the document index used for the answer
+            embedding: Optional question embedding for the similarity tier
+            index_path: Document index the answer was produced from
+        """
+        now = time.time()
+        scope = self._scope(index_path)
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, question, route, index_path, index_version, result, embedding, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(question, scope), question, result["route"], scope, index_version,
+                    json.dumps(result, default=str), blob, now, now,
+                ),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN "
+                    "(SELECT key FROM answers ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.counters["evictions"] += overflow
+            self._conn.commit()
+            # data_version only tracks other connections' commits
+            self._data_version = None
+
+    async def aput(
+        self,
+        question: str,
+        result: Dict[str, Any],
+        index_version: str = "",
+        embedding: Optional[List[float]] = None,
+        index_path: str = ""
+    ) -> None:
+        """Async version of ``put``; the SQLite write runs in a worker thread."""
+        await asyncio.to_thread(self.put, question, result, index_version, embedding, index_path)
+
+    def invalidate_route(self, route: str) -> int:
+        """Drop all cached answers of one route. Returns the number removed."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM answers WHERE route = ?", (route,)).rowcount
+            self._conn.commit()
+            self._data_version = None
+            self.counters["invalidations"] += removed
+            return removed
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._data_version = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the current entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.counters["exact_hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": entries,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get or create the process-wide answer cache (singleton)."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
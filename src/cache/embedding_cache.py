@@ -0,0 +1,347 @@
+"""Persistent embedding cache: in-process LRU over a memory-mapped on-disk vector store."""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
+
+from src.config.settings import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_MEMORY_ENTRIES
+from src.tracing import span
+
+
+# Compaction trims the store to this fraction of max_entries, so it does not run on every write
+_COMPACT_TO = 0.9
+
+
+class EmbeddingStore:
+    """
+    Append-only float32 vector file plus a SQLite key -> row index.
+
+    Vectors are appended to the vector file and read back through a read-only
+    memory map, so lookups cost a page read and the OS page cache is shared by
+    every worker on the machine. Writers serialize on an exclusive file lock and
+    append the vectors before committing their index rows, so readers never see
+    a row that is not on disk yet.
+
+    With ``max_entries`` set, a write that takes the store past it compacts the
+    store down to the most recently used vectors (90% of the limit): they are
+    copied to a new generation of the vector file and the index is switched to
+    it in one commit. Readers take the row numbers and the generation from the
+    same snapshot, so they never read a row from the wrong file.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 0):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(directory, "write.lock")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        columns = [name for _, name, *_ in self._conn.execute("PRAGMA table_info(vectors)")]
+        if "last_used" not in columns:
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+
+        self._dim: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_generation: Optional[int] = None
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _dimension(self) -> Optional[int]:
+        if self._dim is None:
+            value = self._meta("dim")
+            self._dim = int(value) if value else None
+        return self._dim
+
+    def _generation(self) -> int:
+        return int(self._meta("generation") or 0)
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.directory, "vectors.f32" if generation == 0 else f"vectors.{generation}.f32")
+
+    def _rows(self, min_rows: int, generation: int) -> Optional[np.memmap]:
+        """Memory map of the vector file, remapped when it has grown past ``min_rows`` or was compacted."""
+        if self._mmap is None or self._mmap_generation != generation or len(self._mmap) < min_rows:
+            dim = self._dimension()
+            path = self._vectors_path(generation)
+            if not dim or not os.path.exists(path):
+                return None
+            n = os.path.getsize(path) // (dim * 4)
+            if n < min_rows:
+                return None
+            try:
+                self._mmap = np.memmap(path, dtype=np.float32, mode="r", shape=(n, dim))
+            except FileNotFoundError:  # Compacted away since the snapshot was read
+                return None
+            self._mmap_generation = generation
+        return self._mmap
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """One transaction on the autocommit connection; reads inside it share a snapshot."""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Vectors stored under any of ``keys``; missing keys are left out."""
+        found: Dict[str, int] = {}
+        with self._lock:
+            with self._transaction():
+                for start in range(0, len(keys), 500):
+                    chunk = list(keys[start:start + 500])
+                    placeholders = ",".join("?" * len(chunk))
+                    found.update(self._conn.execute(
+                        f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk
+                    ).fetchall())
+                generation = self._generation()
+            if not found:
+                return {}
+            rows = self._rows(max(found.values()) + 1, generation)
+            if rows is None:
+                return {}
+            vectors = {key: np.array(rows[row]) for key, row in found.items()}
+            if self.max_entries:
+                self._touch(list(found))
+            return vectors
+
+    def _touch(self, keys: List[str]) -> None:
+        """Record a use of ``keys``, for compaction to keep the recently used vectors."""
+        now = time.time()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"UPDATE vectors SET last_used = ? WHERE key IN ({placeholders})", [now, *chunk])
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """Append vectors for keys not stored yet, compacting the store if it is over ``max_entries``."""
+        if not items:
+            return
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                dim = self._dimension()
+                if dim is None:
+                    dim = len(next(iter(items.values())))
+                    self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (str(dim),))
+                    self._dim = None
+                    dim = self._dimension()
+
+                keys = list(items)
+                existing = set()
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    existing.update(k for (k,) in self._conn.execute(
+                        f"SELECT key FROM vectors WHERE key IN ({placeholders})", chunk
+                    ))
+                new = [k for k in keys if k not in existing and len(items[k]) == dim]
+                if not new:
+                    return
+
+                with open(self._vectors_path(self._generation()), "ab") as f:
+                    # Rows are counted from the file; a torn tail left by a crashed writer is dropped
+                    first_row = f.tell() // (dim * 4)
+                    f.truncate(first_row * dim * 4)
+                    f.write(np.asarray([items[k] for k in new], dtype=np.float32).tobytes())
+                now = time.time()
+                with self._transaction():
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO vectors VALUES (?, ?, ?)",
+                        [(k, first_row + i, now) for i, k in enumerate(new)],
+                    )
+                if self.max_entries and self._count() > self.max_entries:
+                    self._compact(dim)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def _compact(self, dim: int) -> None:
+        """Keep the most recently used vectors in a new vector file (called with the write lock held)."""
+        keep = self._conn.execute(
+            "SELECT key, row, last_used FROM vectors ORDER BY last_used DESC, row DESC LIMIT ?",
+            (max(1, int(self.max_entries * _COMPACT_TO)),),
+        ).fetchall()
+        keep.sort(key=lambda item: item[1])
+        generation = self._generation()
+        old_path, new_path = self._vectors_path(generation), self._vectors_path(generation + 1)
+
+        n = os.path.getsize(old_path) // (dim * 4)
+        source = np.memmap(old_path, dtype=np.float32, mode="r", shape=(n, dim))
+        with open(new_path, "wb") as f:
+            for start in range(0, len(keep), 10_000):
+                f.write(np.asarray(source[[row for _, row, _ in keep[start:start + 10_000]]]).tobytes())
+        del source
+
+        try:
+            with self._transaction():
+                self._conn.execute("DELETE FROM vectors")
+                self._conn.executemany(
+                    "INSERT INTO vectors VALUES (?, ?, ?)",
+                    [(key, i, last_used) for i, (key, _, last_used) in enumerate(keep)],
+                )
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(generation + 1),))
+        except BaseException:
+            os.remove(new_path)
+            raise
+        # Workers that mapped the old file keep reading it until they see the new generation
+        os.remove(old_path)
+        self._mmap = None
+        print(f"Embedding cache: compacted {self.directory} to {len(keep)} vectors")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that memoizes vectors by model name and text hash.
+
+    Lookups go to an in-process LRU first, then to the shared on-disk store;
+    only texts found in neither are sent to the wrapped model. Queries and
+    documents are cached separately, since some models embed them differently.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: Optional[str],
+        cache_dir: Optional[str] = EMBEDDING_CACHE_DIR,
+        max_memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+        max_disk_entries: int = EMBEDDING_CACHE_MAX_ENTRIES
+    ):
+        self.underlying = underlying
+        self.model_name = model_name or "default"
+        self.max_memory_entries = max_memory_entries
+        self.store = (
+            EmbeddingStore(os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", self.model_name)), max_disk_entries)
+            if cache_dir else None
+        )
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text: str, kind: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.counters["memory_hits"] += len(found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.store is not None:
+            on_disk = self.store.get_many(missing)
+            with self._lock:
+                for key, vector in on_disk.items():
+                    self._remember(key, vector)
+                self.counters["disk_hits"] += len(on_disk)
+            found.update(on_disk)
+        return found
+
+    def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            self.counters["misses"] += len(vectors)
+        if self.store is not None:
+            self.store.put_many(vectors)
+
+    def _split(self, texts: Sequence[str], kind: str):
+        keys = [self._key(text, kind) for text in texts]
+        found = self._lookup(keys)
+        todo = {key: text for key, text in zip(keys, texts) if key not in found}
+        return keys, found, todo
+
+    def cached_documents(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached document vectors for ``texts`` (None where not cached), without calling the model."""
+        keys = [self._key(text, "document") for text in texts]
+        found = self._lookup(keys)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, todo = self._split(texts, "document")
+        if todo:
+            with span("embedding"):
+                vectors = self.underlying.embed_documents(list(todo.values()))
+            new = {key: np.asarray(v, dtype=np.float32) for key, v in zip(todo, vectors)}
+            self._store(new)
+            found.update(new)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, todo = self._split([text], "query")
+        if todo:
+            with span("embedding"):
+                vector = self.underlying.embed_query(text)
+            new = {keys[0]: np.asarray(vector, dtype=np.float32)}
+            self._store(new)
+            found.update(new)
+        return found[keys[0]].tolist()
+
+    # The async versions do their disk lookups and writes in a worker thread, off the event loop
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, todo = await asyncio.to_thread(self._split, texts, "document")
+        if todo:
+            with span("embedding"):
+                vectors = await self.underlying.aembed_documents(list(todo.values()))
+            new = {key: np.asarray(v, dtype=np.float32) for key, v in zip(todo, vectors)}
+            await asyncio.to_thread(self._store, new)
+            found.update(new)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, todo = await asyncio.to_thread(self._split, [text], "query")
+        if todo:
+            with span("embedding"):
+                vector = await self.underlying.aembed_query(text)
+            new = {keys[0]: np.asarray(vector, dtype=np.float32)}
+            await asyncio.to_thread(self._store, new)
+            found.update(new)
+        return found[keys[0]].tolist()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters of this process plus the number of vectors on disk."""
+        return {**self.counters, "memory_entries": len(self._memory),
+                "disk_entries": len(self.store) if self.store is not None else 0}
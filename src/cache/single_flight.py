@@ -0,0 +1,126 @@
+"""Single-flight request coalescing: concurrent identical calls share one execution."""
+import asyncio
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller (the leader) runs the function; callers arriving while it
+    is in flight wait for it and receive a deep copy of its result (or its
+    exception). The result is snapshotted once before it is published, so the
+    leader can modify the object it gets back while followers are still
+    copying theirs. Nothing is remembered once the call finishes - this dedupes
+    bursts, the answer cache handles repeats over time.
+
+    Works for threads (``do``) and for coroutines on one event loop (``ado``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, "asyncio.Task"] = {}
+        self.counters = {"executions": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers with ``key``.
+
+        Args:
+            key: Identity of the request
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            The result of ``fn`` (followers get a copy)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["executions"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            call.result = copy.deepcopy(result)  # Followers copy this snapshot, never the leader's object
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of ``do``.
+
+        The work runs as its own task, so a leader whose request is cancelled
+        (e.g. the client disconnected) does not cancel it for the followers.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None or task.get_loop() is not loop
+            if leader:
+                task = self._tasks[key] = loop.create_task(self._run_and_snapshot(coro_fn()))
+                task.add_done_callback(lambda t: self._forget_task(key, t))
+                self.counters["executions"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        result, snapshot = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(snapshot)
+
+    @staticmethod
+    async def _run_and_snapshot(coro: Awaitable[Any]) -> Tuple[Any, Any]:
+        result = await coro
+        return result, copy.deepcopy(result)
+
+    def _forget_task(self, key: Hashable, task: "asyncio.Task") -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Execution and coalescing counters, plus calls currently in flight."""
+        with self._lock:
+            in_flight = len(self._calls) + len(self._tasks)
+        total = self.counters["executions"] + self.counters["coalesced"]
+        return {
+            **self.counters,
+            "in_flight": in_flight,
+            "coalesced_ratio": self.counters["coalesced"] / total if total else 0.0,
+        }
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the process-wide single-flight group (singleton)."""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -1,6 +1,7 @@
 """Centralized configuration for Azure OpenAI and paths."""
 import os
 from typing import Optional
+from langchain_core.embeddings import Embeddings
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.utilities import SQLDatabase
@@ -21,36 +22,154 @@ AZURE_EMBEDDINGS_API_KEY = os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS")
 # Paths
 DEFAULT_FAISS_INDEX_PATH = "data/embeddings/faiss-index/"
 DEFAULT_LOG_DIR = "logs"
+DEFAULT_CACHE_DIR = os.getenv("CACHE_DIR", "data/cache")
+
+# JSONL execution logs: buffered on a background writer thread, rotated by size or age
+LOG_BUFFERED = os.getenv("LOG_BUFFERED", "true").lower() == "true"
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "50"))
+# Max age of the current log file (0 disables time-based rotation)
+LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "86400"))
+LOG_COMPRESS_ROTATED = os.getenv("LOG_COMPRESS_ROTATED", "true").lower() == "true"
+
+# Tracing: per-stage timers and LLM token counters exposed on /metrics, trace ids in the logs
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Spans kept per request for its log entry
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "200"))
+
+# Answer cache
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "answers.sqlite"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+SQL_DATA_FRESHNESS_TTL_SECONDS = float(os.getenv("SQL_DATA_FRESHNESS_TTL_SECONDS", "300"))
+
+# FAISS index type (flat, ivf_flat, hnsw, ivf_pq) used by build_index, and its search parameters
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0 = ~4*sqrt(n)
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+# RAG retrieval: vector + BM25 candidates merged with reciprocal rank fusion
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+RAG_HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "true").lower() == "true"
+RAG_FUSION_FETCH_K = int(os.getenv("RAG_FUSION_FETCH_K", "20"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_RERANK = os.getenv("RAG_RERANK", "true").lower() == "true"
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1000"))
+RAG_DEDUP_SIMILARITY = float(os.getenv("RAG_DEDUP_SIMILARITY", "0.95"))
+
+# Loaded indexes kept per process (least recently used beyond these limits are dropped)
+INDEX_REGISTRY_MAX_INDEXES = int(os.getenv("INDEX_REGISTRY_MAX_INDEXES", "8"))
+INDEX_REGISTRY_MEMORY_BUDGET_MB = float(os.getenv("INDEX_REGISTRY_MEMORY_BUDGET_MB", "4096"))
+# How often loaded indexes are checked for rebuilds on disk (0 disables hot reload)
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "5"))
+
+# Embedding cache (query and chunk vectors, keyed by model and text hash)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(DEFAULT_CACHE_DIR, "embeddings"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+# Vectors kept on disk per model; past it the least recently used are compacted away (0 = unbounded)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# SQL schema cache (DDL, column stats and sample rows injected into the SQL agent prompt)
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "schema.json"))
+SCHEMA_CACHE_REFRESH_SECONDS = float(os.getenv("SCHEMA_CACHE_REFRESH_SECONDS", "3600"))
+# How often the schema version is polled (0 disables the watcher)
+SCHEMA_VERSION_CHECK_SECONDS = float(os.getenv("SCHEMA_VERSION_CHECK_SECONDS", "60"))
+SCHEMA_SAMPLE_ROWS = int(os.getenv("SCHEMA_SAMPLE_ROWS", "3"))
+SCHEMA_PROMPT_MAX_TABLES = int(os.getenv("SCHEMA_PROMPT_MAX_TABLES", "4"))
+
+# Direct SQL mode: one LLM call writes the query from the schema cache (the ReAct agent is the fallback)
+SQL_DIRECT_MODE = os.getenv("SQL_DIRECT_MODE", "true").lower() == "true"
+SQL_DIRECT_MAX_ROWS = int(os.getenv("SQL_DIRECT_MAX_ROWS", "50"))
+
+# SQL result cache (keyed by normalized SQL, invalidated by per-table modification counts or the TTL)
+SQL_RESULT_CACHE_ENABLED = os.getenv("SQL_RESULT_CACHE_ENABLED", "true").lower() == "true"
+SQL_RESULT_CACHE_TTL_SECONDS = float(os.getenv("SQL_RESULT_CACHE_TTL_SECONDS", "300"))
+SQL_RESULT_CACHE_MAX_MB = float(os.getenv("SQL_RESULT_CACHE_MAX_MB", "64"))
+# Results with at least this many rows are stored as compressed columns
+SQL_RESULT_CACHE_COLUMNAR_MIN_ROWS = int(os.getenv("SQL_RESULT_CACHE_COLUMNAR_MIN_ROWS", "100"))
+# How long table modification counts are reused before pg_stat_user_tables is read again
+SQL_TABLE_VERSION_CHECK_SECONDS = float(os.getenv("SQL_TABLE_VERSION_CHECK_SECONDS", "2"))
+
+# SQL cost guard: EXPLAIN before running generated queries, reject expensive plans, cap returned rows
+SQL_GUARD_ENABLED = os.getenv("SQL_GUARD_ENABLED", "true").lower() == "true"
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "1000000"))
+# Max estimated rows of the result or of any join (catches cartesian products)
+SQL_MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", "10000000"))
+SQL_ROW_LIMIT = int(os.getenv("SQL_ROW_LIMIT", "1000"))
+
+# SQL rollups (summary tables over transactions, refreshed incrementally from the transaction_date watermark).
+# Off by default: enabling them creates tables and runs refreshes on the application database.
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "false").lower() == "true"
+# How often the background refresh runs (0 disables it; refresh with python -m src.db.rollups instead)
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ROLLUP_REFRESH_SECONDS", "300"))
+# Months touched by rows dated up to this many days before the watermark are recomputed (late arrivals)
+ROLLUP_LOOKBACK_DAYS = int(os.getenv("ROLLUP_LOOKBACK_DAYS", "3"))
+
+# Hybrid route: SQL and RAG branches run concurrently, each with its own deadline
+HYBRID_BRANCH_WORKERS = int(os.getenv("HYBRID_BRANCH_WORKERS", "16"))
+SQL_BRANCH_TIMEOUT_SECONDS = float(os.getenv("SQL_BRANCH_TIMEOUT_SECONDS", "60"))
+RAG_BRANCH_TIMEOUT_SECONDS = float(os.getenv("RAG_BRANCH_TIMEOUT_SECONDS", "30"))
+# Timed-out branches keep their worker thread; past this many per branch, new calls to it are refused
+HYBRID_MAX_ABANDONED_BRANCHES = int(os.getenv("HYBRID_MAX_ABANDONED_BRANCHES", str(max(1, HYBRID_BRANCH_WORKERS // 4))))
+
+# Local query router (falls back to the LLM classifier below the threshold)
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))
+ROUTER_TEMPERATURE = float(os.getenv("ROUTER_TEMPERATURE", "0.05"))
+ROUTER_MAX_LOG_EXAMPLES = int(os.getenv("ROUTER_MAX_LOG_EXAMPLES", "2000"))
+ROUTER_CACHE_PATH = os.getenv("ROUTER_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIR, "router_centroids.json"))
+# Comma-separated logs holding past classifications to learn from
+ROUTER_LOG_FILES = [
+    path for path in os.getenv(
+        "ROUTER_LOG_FILES", os.path.join(DEFAULT_LOG_DIR, "classification", "agent_executions.jsonl")
+    ).split(",") if path
+]
 
 # ===== Client Factories =====
 _llm_instance: Optional[AzureChatOpenAI] = None
-_embedding_instance: Optional[AzureOpenAIEmbeddings] = None
+_embedding_instance: Optional[Embeddings] = None
 
 
 def get_llm(temperature: float = 0) -> AzureChatOpenAI:
     """Get or create the Azure Chat LLM instance (singleton)."""
     global _llm_instance
     if _llm_instance is None:
+        from src.tracing import tracing_callbacks  # Imports this module
         _llm_instance = AzureChatOpenAI(
             azure_endpoint=AZURE_OPENAI_ENDPOINT,
             deployment_name=AZURE_OPENAI_DEPLOYMENT,
             api_version=AZURE_OPENAI_API_VERSION,
             api_key=AZURE_OPENAI_API_KEY,
             temperature=temperature,
+            callbacks=tracing_callbacks(),
         )
     return _llm_instance
 
 
-def get_embedding_model() -> AzureOpenAIEmbeddings:
-    """Get or create the Azure Embeddings instance (singleton)."""
+def get_embedding_model() -> Embeddings:
+    """Get or create the Azure Embeddings instance (singleton), wrapped in the embedding cache."""
     global _embedding_instance
     if _embedding_instance is None:
-        _embedding_instance = AzureOpenAIEmbeddings(
+        embeddings = AzureOpenAIEmbeddings(
             azure_endpoint=AZURE_EMBEDDINGS_ENDPOINT,
             azure_deployment=AZURE_EMBEDDINGS_DEPLOYMENT,
             api_version=AZURE_EMBEDDINGS_API_VERSION,
             api_key=AZURE_EMBEDDINGS_API_KEY,
         )
+        if EMBEDDING_CACHE_ENABLED:
+            from src.cache.embedding_cache import CachedEmbeddings  # Imports this module
+            embeddings = CachedEmbeddings(embeddings, model_name=AZURE_EMBEDDINGS_DEPLOYMENT)
+        _embedding_instance = embeddings
     return _embedding_instance
 
 
@@ -59,9 +178,11 @@ def load_vector_store(index_path: str = DEFAULT_FAISS_INDEX_PATH) -> FAISS:
     if not os.path.exists(index_path):
         raise FileNotFoundError(f"FAISS index not found at: {index_path}")
     
+    from src.rag.index_factory import apply_search_params, load_index_config  # Imports this module
+    from src.rag.index_store import load_index
+
     embeddings = get_embedding_model()
-    return FAISS.load_local(
-        index_path,
-        embeddings=embeddings,
-        allow_dangerous_deserialization=True  # Only for trusted local indexes.
-    )
\ No newline at end of file
+    vector_store = load_index(index_path, embeddings)
+    # Search-time knobs come from the environment, so they can be tuned without a rebuild
+    apply_search_params(vector_store.index, load_index_config(index_path), FAISS_NPROBE, FAISS_EF_SEARCH)
+    return vector_store
\ No newline at end of file
@@ -1,6 +1,10 @@
 import dotenv
-import psycopg2
 import os
+import threading
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 
 dotenv.load_dotenv()  # Load environment variables from .env file
 
@@ -10,17 +14,119 @@ DB_PASSWORD = os.getenv("POSTGRES_PASSWORD") or os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("POSTGRES_HOST") or os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("POSTGRES_PORT") or os.getenv("DB_PORT", "5432")
 
-DB_URI = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL overrides the POSTGRES_* settings (e.g. sqlite:///data/copilot.db for local runs)
+DB_URI = os.getenv("DATABASE_URL") or f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Optional read replica for the agents' queries (defaults to the primary, in read-only sessions)
+DB_REPLICA_URI = os.getenv("DATABASE_REPLICA_URL") or None
 
-def create_connection():
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        host=DB_HOST,
-        port=DB_PORT
+# Connection pool, shared by every database consumer of a process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+# Per-session statement timeout (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+_engines: Dict[str, Engine] = {}
+_pool_counters: Dict[str, Dict[str, int]] = {}
+_engines_lock = threading.Lock()
+
+
+def _session_options(read_only: bool) -> str:
+    options = []
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        options.append(f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+    if read_only:
+        options.append("-c default_transaction_read_only=on")
+    return " ".join(options)
+
+
+def _track_pool(role: str, engine: Engine) -> None:
+    counters = _pool_counters.setdefault(role, {"connects": 0, "checkouts": 0, "invalidations": 0})
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        counters["invalidations"] += 1
+
+
+def _create_engine(uri: str, read_only: bool) -> Engine:
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        engine = create_engine(url, pool_pre_ping=True)
+        if read_only:
+            @event.listens_for(engine, "connect")
+            def _query_only(dbapi_connection, connection_record):
+                dbapi_connection.execute("PRAGMA query_only = ON")
+        return engine
+
+    connect_args = {}
+    options = _session_options(read_only)
+    if options and url.get_backend_name() == "postgresql":
+        connect_args["options"] = options
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        connect_args=connect_args,
     )
-    return conn
+
+
+def get_engine(read_only: bool = True) -> Engine:
+    """
+    Get the pooled engine of the application database (one per role, per process).
+
+    Read-only engines connect to the replica when ``DATABASE_REPLICA_URL`` is
+    set, and open every session with ``default_transaction_read_only`` on;
+    both roles apply ``DB_STATEMENT_TIMEOUT_MS``.
+
+    Args:
+        read_only: The agents' read-only engine, or the writable one (schema resets, rollups)
+
+    Returns:
+        SQLAlchemy engine
+    """
+    role = "read_only" if read_only else "primary"
+    with _engines_lock:
+        if role not in _engines:
+            uri = (DB_REPLICA_URI or DB_URI) if read_only else DB_URI
+            engine = _create_engine(uri, read_only)
+            _track_pool(role, engine)
+            _engines[role] = engine
+        return _engines[role]
+
+
+def create_connection():
+    """Writable DB-API connection from the pool; ``close()`` returns it to the pool."""
+    return get_engine(read_only=False).raw_connection()
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Size, checked-out connections, overflow and event counters of each engine created so far."""
+    with _engines_lock:
+        engines = dict(_engines)
+    stats = {}
+    for role, engine in engines.items():
+        pool = engine.pool
+        role_stats: Dict[str, Any] = {
+            "url": engine.url.render_as_string(hide_password=True),
+            **_pool_counters.get(role, {}),
+        }
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                role_stats[name] = getattr(pool, name)()
+        stats[role] = role_stats
+    return stats
 
 
 if __name__ == "__main__":
@@ -31,4 +137,4 @@ if __name__ == "__main__":
             cur.execute("SELECT version();")
             version = cur.fetchone()
             print("PostgreSQL version:", version)
-        conn.close()
\ No newline at end of file
+        conn.close()
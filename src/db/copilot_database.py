@@ -0,0 +1,50 @@
+"""SQLDatabase used by the SQL agent: queries pass the cost guard and go through the result cache."""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy.engine import Result
+from sqlalchemy.sql.expression import Executable
+
+from src.db.cost_guard import guard_query
+from src.db.result_cache import ResultCache
+
+
+class CopilotSQLDatabase(SQLDatabase):
+    """
+    ``SQLDatabase`` whose text queries (the agent's ``sql_db_query`` calls) are guarded and cached.
+
+    Each query is checked and rewritten by ``guard_query`` before it runs; a
+    rejection is a ``SQLAlchemyError``, which the query tool returns to the
+    agent as the observation. Results come from the ``ResultCache`` when
+    possible, so cache hits skip both the EXPLAIN and the query.
+    """
+
+    def __init__(self, *args, result_cache: Optional[ResultCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.result_cache = result_cache
+
+    def _execute(
+        self,
+        command: Union[str, Executable],
+        fetch: str = "all",
+        *,
+        parameters: Optional[Dict[str, Any]] = None,
+        execution_options: Optional[Dict[str, Any]] = None,
+    ) -> Union[Sequence[Dict[str, Any]], Result]:
+        if not isinstance(command, str) or parameters or fetch == "cursor":
+            return super()._execute(command, fetch, parameters=parameters, execution_options=execution_options)
+
+        def execute() -> Tuple[List[str], List[tuple]]:
+            with self._engine.connect() as conn:
+                guarded = guard_query(conn, command)
+            rows = super(CopilotSQLDatabase, self)._execute(
+                guarded, fetch, parameters=parameters, execution_options=execution_options
+            )
+            columns = list(rows[0].keys()) if rows else []
+            return columns, [tuple(row.values()) for row in rows]
+
+        if self.result_cache is None:
+            columns, rows = execute()
+        else:
+            columns, rows, _ = self.result_cache.fetch(command, execute, variant=f"fetch={fetch}")
+        return [dict(zip(columns, row)) for row in rows]
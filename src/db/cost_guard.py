@@ -0,0 +1,173 @@
+"""Cost Guard - EXPLAIN-based limits and LIMIT injection for generated SQL."""
+import json
+import re
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.config.settings import SQL_GUARD_ENABLED, SQL_MAX_PLAN_COST, SQL_MAX_PLAN_ROWS, SQL_ROW_LIMIT
+from src.db.sql_validation import SQLValidationError, mask_sql, validate_select
+
+
+_JOIN_NODES = ("Nested Loop", "Hash Join", "Merge Join")
+
+
+class QueryCostExceeded(SQLAlchemyError):
+    """
+    Query rejected before execution because its plan is too expensive.
+
+    A ``SQLAlchemyError``, so ``SQLDatabase.run_no_throw`` hands the message
+    back to the agent as the tool result and it can retry with a cheaper query.
+    """
+
+
+_LIMIT_CLAUSE = re.compile(r"\b(?:limit\s+(\d+|all)|fetch\s+(?:first|next)\s+(\d*))")
+
+
+def _top_level_limit(masked: str) -> Optional[re.Match]:
+    """LIMIT (or FETCH FIRST) clause of the outermost query, if any."""
+    depth = 0
+    for i, ch in enumerate(masked):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and ch in "lf":
+            match = _LIMIT_CLAUSE.match(masked, i)
+            if match:
+                return match
+    return None
+
+
+def inject_limit(sql: str, row_limit: int = SQL_ROW_LIMIT) -> str:
+    """
+    Cap the rows a query returns.
+
+    Adds ``LIMIT row_limit`` to the outermost query, or lowers a larger
+    literal LIMIT to it; ``LIMIT ALL`` counts as missing.
+
+    Args:
+        sql: Read-only SELECT statement
+        row_limit: Max rows (0 disables)
+
+    Returns:
+        The statement, possibly rewritten
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if row_limit <= 0:
+        return sql
+    match = _top_level_limit(mask_sql(sql))
+    if match is None:
+        # On its own line: the statement may end with a -- comment
+        return f"{sql}\nLIMIT {row_limit}"
+    value = match.group(1) or match.group(2)
+    if value == "all":
+        return f"{sql[:match.start()]}LIMIT {row_limit}{sql[match.end():]}"
+    if value and int(value) > row_limit:
+        start, end = match.span(1) if match.group(1) else match.span(2)
+        return f"{sql[:start]}{row_limit}{sql[end:]}"
+    return sql
+
+
+def _nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _describe_node(node: Dict[str, Any]) -> str:
+    relation = node.get("Relation Name")
+    return f"{node['Node Type']}{f' on {relation}' if relation else ''} (~{node.get('Plan Rows', 0):,.0f} rows)"
+
+
+def plan_violation(plan: Dict[str, Any], max_cost: float = SQL_MAX_PLAN_COST, max_rows: float = SQL_MAX_PLAN_ROWS) -> Optional[str]:
+    """
+    Reason to reject a plan (``EXPLAIN (FORMAT JSON)`` root node), or None.
+
+    The total cost is the planner's estimate of the work; row estimates of
+    the result and of every join catch cartesian products.
+
+    Args:
+        plan: Root plan node
+        max_cost: Max estimated total cost
+        max_rows: Max estimated rows of the result or of any join
+
+    Returns:
+        Human-readable reason, or None if the plan is within the limits
+    """
+    nodes = list(_nodes(plan))
+    problems = []
+    if plan.get("Total Cost", 0) > max_cost:
+        problems.append(f"estimated cost {plan['Total Cost']:,.0f} exceeds {max_cost:,.0f}")
+    big = [
+        node for node in nodes
+        if (node is plan or node["Node Type"] in _JOIN_NODES) and node.get("Plan Rows", 0) > max_rows
+    ]
+    if big:
+        problems.append(f"estimated {max(n['Plan Rows'] for n in big):,.0f} rows exceed {max_rows:,.0f}")
+    if not problems:
+        return None
+
+    costliest = sorted(
+        (node for node in nodes if node is not plan),
+        key=lambda node: node.get("Total Cost", 0),
+        reverse=True,
+    )[:3]
+    hotspots = ", ".join(_describe_node(node) for node in [plan] + costliest if node.get("Node Type"))
+    return (
+        f"Query rejected by the cost guard: {'; '.join(problems)}. Plan: {hotspots}. "
+        "Write a cheaper query: filter on indexed columns (e.g. a date range), aggregate in SQL, "
+        "and join only on matching keys."
+    )
+
+
+def explain(conn: Connection, sql: str) -> Optional[Dict[str, Any]]:
+    """Root plan node of a statement on PostgreSQL (None on other databases)."""
+    if conn.dialect.name != "postgresql":
+        return None
+    raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    document = json.loads(raw) if isinstance(raw, str) else raw
+    return document[0]["Plan"]
+
+
+def guard_query(
+    conn: Connection,
+    sql: str,
+    row_limit: int = SQL_ROW_LIMIT,
+    max_cost: float = SQL_MAX_PLAN_COST,
+    max_rows: float = SQL_MAX_PLAN_ROWS
+) -> str:
+    """
+    Rewrite a SELECT with a LIMIT, then check its plan against the limits.
+
+    Statements that are not read-only SELECTs are returned unchanged (the
+    read-only session rejects writes); so is everything when
+    ``SQL_GUARD_ENABLED`` is off.
+
+    Args:
+        conn: Connection the statement will run on
+        sql: Statement
+        row_limit: Max rows returned
+        max_cost: Max estimated total cost
+        max_rows: Max estimated rows of the result or of any join
+
+    Returns:
+        The statement to run
+
+    Raises:
+        QueryCostExceeded: If the plan exceeds the limits
+    """
+    if not SQL_GUARD_ENABLED:
+        return sql
+    try:
+        validate_select(sql)
+    except SQLValidationError:
+        return sql
+    sql = inject_limit(sql, row_limit)
+    plan = explain(conn, sql)
+    if plan is not None:
+        reason = plan_violation(plan, max_cost, max_rows)
+        if reason:
+            raise QueryCostExceeded(reason)
+    return sql
@@ -1,21 +1,8 @@
-import dotenv
-import psycopg2
-import os
-
-
+from src.db.connection import create_connection
 
 
 if __name__ == "__main__":
-    dotenv.load_dotenv()  # Load environment variables from .env file
-
-
-    conn = psycopg2.connect(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT")
-    )
+    conn = create_connection()
 
     cur = conn.cursor()
 
@@ -0,0 +1,231 @@
+"""SQL Result Cache - query results keyed by normalized SQL, invalidated per table."""
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.config.settings import (
+    SQL_RESULT_CACHE_COLUMNAR_MIN_ROWS,
+    SQL_RESULT_CACHE_ENABLED,
+    SQL_RESULT_CACHE_MAX_MB,
+    SQL_RESULT_CACHE_TTL_SECONDS,
+    SQL_TABLE_VERSION_CHECK_SECONDS,
+)
+from src.db.schema_cache import get_schema_cache
+from src.db.sql_validation import SQLValidationError, normalize_sql, referenced_tables, validate_select
+
+
+# Results of these differ between runs of the same SQL
+_VOLATILE_FUNCTIONS = re.compile(
+    r"\b(random|setseed|gen_random_uuid|uuid_generate_v\d\w*|clock_timestamp|timeofday|nextval|txid_current)\s*\("
+)
+
+Rows = List[tuple]
+
+
+class _Entry:
+    def __init__(self, columns: List[str], rows: Rows, versions: Dict[str, Any], columnar_min_rows: int):
+        self.columns = columns
+        self.versions = versions
+        self.created_at = time.time()
+        self.row_count = len(rows)
+        if len(rows) >= columnar_min_rows:
+            # Column-wise values compress far better than rows (repeated types and values)
+            self.rows = None
+            self.payload = zlib.compress(pickle.dumps([list(column) for column in zip(*rows)], protocol=5), 1)
+            self.size = len(self.payload)
+        else:
+            self.rows = rows
+            self.payload = None
+            self.size = len(pickle.dumps(rows, protocol=5))
+
+    def decode(self) -> Rows:
+        if self.rows is not None:
+            return self.rows
+        columns = pickle.loads(zlib.decompress(self.payload))
+        return list(zip(*columns)) if columns else [() for _ in range(self.row_count)]
+
+
+class ResultCache:
+    """
+    In-process LRU of query results, keyed by normalized SQL.
+
+    Each entry remembers the version of every table the query reads. On
+    PostgreSQL a table's version is its ``pg_stat_user_tables`` modification
+    count, read for all tables in one query at most every
+    ``version_check_seconds``, so hits within that window make no database
+    round trip. Writes made by the application can be announced with
+    ``bump_table_version`` to invalidate at once; the TTL bounds staleness
+    everywhere else (statistics are flushed with a short delay, and other
+    databases have no counters). Only read-only, deterministic queries are
+    cached; results of ``columnar_min_rows`` rows or more are stored as
+    zlib-compressed columns.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        ttl_seconds: float = SQL_RESULT_CACHE_TTL_SECONDS,
+        max_mb: float = SQL_RESULT_CACHE_MAX_MB,
+        columnar_min_rows: int = SQL_RESULT_CACHE_COLUMNAR_MIN_ROWS,
+        version_check_seconds: float = SQL_TABLE_VERSION_CHECK_SECONDS,
+    ):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_mb * 1024 * 1024
+        self.columnar_min_rows = columnar_min_rows
+        self.version_check_seconds = version_check_seconds
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0, "uncacheable": 0}
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local_versions: Dict[str, int] = {}
+        self._db_versions: Dict[str, Any] = {}
+        self._db_versions_at = 0.0
+        self._versions_lock = threading.Lock()
+
+    def _read_db_versions(self) -> Dict[str, Any]:
+        if self.engine.dialect.name != "postgresql":
+            return {}
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT relname, n_tup_ins + n_tup_upd + n_tup_del, n_live_tup FROM pg_stat_user_tables"
+            )).fetchall()
+        return {table.lower(): (int(modifications), int(live)) for table, modifications, live in rows}
+
+    def table_versions(self, tables: Sequence[str]) -> Dict[str, Any]:
+        """
+        Current version of each table: (database modification counts, local bumps).
+
+        Args:
+            tables: Table names (lowercase)
+
+        Returns:
+            Dict of table -> version
+        """
+        with self._versions_lock:
+            if time.time() - self._db_versions_at >= self.version_check_seconds:
+                self._db_versions = self._read_db_versions()
+                self._db_versions_at = time.time()
+            db_versions = self._db_versions
+        return {table: (db_versions.get(table), self._local_versions.get(table, 0)) for table in tables}
+
+    def bump_table_version(self, *tables: str) -> None:
+        """Invalidate cached results reading these tables (call after writes made by the application)."""
+        with self._versions_lock:
+            for table in tables:
+                self._local_versions[table.lower()] = self._local_versions.get(table.lower(), 0) + 1
+
+    @staticmethod
+    def cacheable(sql: str) -> bool:
+        """Read-only statements whose result only depends on the data."""
+        try:
+            validate_select(sql)
+        except SQLValidationError:
+            return False
+        return not _VOLATILE_FUNCTIONS.search(normalize_sql(sql))
+
+    def _evict(self) -> None:
+        while self._entries and self._bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.counters["evictions"] += 1
+
+    def _lookup(self, key: Tuple[str, str], tables: List[str]) -> Optional[Tuple[List[str], Rows]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds or self.table_versions(tables) != entry.versions:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self._bytes -= entry.size
+                self.counters["invalidations"] += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+        return entry.columns, entry.decode()
+
+    def fetch(
+        self,
+        sql: str,
+        execute: Callable[[], Tuple[List[str], Rows]],
+        variant: str = ""
+    ) -> Tuple[List[str], Rows, bool]:
+        """
+        Result of a query from the cache, or from ``execute`` (then cached).
+
+        Args:
+            sql: SQL statement (used for the key and the tables it reads)
+            execute: Runs the query; returns (columns, rows)
+            variant: Distinguishes results of the same SQL fetched differently (e.g. row limit)
+
+        Returns:
+            (columns, rows, hit)
+        """
+        if not self.cacheable(sql):
+            with self._lock:
+                self.counters["uncacheable"] += 1
+            columns, rows = execute()
+            return columns, rows, False
+
+        key = (normalize_sql(sql), variant)
+        tables = referenced_tables(sql)
+        cached = self._lookup(key, tables)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+        # Versions read before the query: a write racing with it invalidates the entry
+        versions = self.table_versions(tables)
+        columns, rows = execute()
+        entry = _Entry(columns, [tuple(row) for row in rows], versions, self.columnar_min_rows)
+        with self._lock:
+            self.counters["misses"] += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            if entry.size <= self.max_bytes:
+                self._entries[key] = entry
+                self._bytes += entry.size
+                self._evict()
+        return columns, rows, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / 1024 / 1024, 2),
+                "hit_ratio": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Get or create the result cache of the application database (singleton); None when disabled."""
+    global _result_cache
+    if not SQL_RESULT_CACHE_ENABLED:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(get_schema_cache().engine)
+        return _result_cache
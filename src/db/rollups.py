@@ -0,0 +1,416 @@
+"""SQL Rollups - monthly summary tables over transactions, refreshed incrementally for the SQL agent."""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from src.config.settings import (
+    ROLLUP_LOOKBACK_DAYS,
+    ROLLUP_REFRESH_SECONDS,
+    ROLLUPS_ENABLED,
+    SCHEMA_VERSION_CHECK_SECONDS,
+)
+from src.db.connection import get_engine
+from src.db.result_cache import get_result_cache
+from src.db.schema_cache import get_schema_cache
+
+
+WATERMARK_TABLE = "rollup_watermarks"
+
+# First day of the month of t.transaction_date, per dialect
+_MONTH_EXPRESSIONS = {
+    "postgresql": "CAST(date_trunc('month', t.transaction_date) AS DATE)",
+    "sqlite": "date(t.transaction_date, 'start of month')",
+}
+# Arbitrary constant: serializes refreshes across processes on PostgreSQL
+_ADVISORY_LOCK_KEY = 72_615_001
+
+
+class Rollup:
+    """One summary table: its columns and the aggregate query that fills it, grouped by month."""
+
+    def __init__(self, name: str, description: str, columns: List[Tuple[str, str]], query: str):
+        self.name = name
+        self.description = description
+        self.columns = columns
+        self.query = query
+
+    def create_statements(self) -> List[str]:
+        columns = ",\n    ".join(f"{column} {type_}" for column, type_ in self.columns)
+        return [
+            f"CREATE TABLE IF NOT EXISTS {self.name} (\n    {columns}\n)",
+            f"CREATE INDEX IF NOT EXISTS ix_{self.name}_month ON {self.name} (month)",
+        ]
+
+    def insert_statement(self, dialect: str, since: bool) -> str:
+        if dialect not in _MONTH_EXPRESSIONS:
+            raise ValueError(f"Rollups are not supported on {dialect}")
+        query = self.query.format(
+            month=_MONTH_EXPRESSIONS[dialect],
+            since="AND t.transaction_date >= :start" if since else "",
+        )
+        return f"INSERT INTO {self.name} ({', '.join(column for column, _ in self.columns)})\n{query}"
+
+
+# Completed transactions only; amounts are summed as stored, per currency
+ROLLUPS = [
+    Rollup(
+        "rollup_revenue_by_month",
+        "completed purchases and refunds per month and currency (revenue, refund totals, active customers)",
+        [
+            ("month", "DATE NOT NULL"),
+            ("currency", "VARCHAR(10)"),
+            ("purchase_count", "INTEGER NOT NULL"),
+            ("purchase_amount", "NUMERIC(14, 2) NOT NULL"),
+            ("refund_count", "INTEGER NOT NULL"),
+            ("refund_amount", "NUMERIC(14, 2) NOT NULL"),
+            ("customer_count", "INTEGER NOT NULL"),
+        ],
+        """SELECT {month}, t.currency,
+    SUM(CASE WHEN t.type = 'purchase' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN t.type = 'purchase' THEN t.amount ELSE 0 END),
+    SUM(CASE WHEN t.type = 'refund' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN t.type = 'refund' THEN t.amount ELSE 0 END),
+    COUNT(DISTINCT t.customer_id)
+FROM transactions t
+WHERE t.status = 'completed' {since}
+GROUP BY 1, 2""",
+    ),
+    Rollup(
+        "rollup_customer_spend_by_month",
+        "completed purchases and refunds per customer, month and currency; sum over months for top customers "
+        "by spend, join customers on customer_id for names",
+        [
+            ("month", "DATE NOT NULL"),
+            ("customer_id", "INTEGER"),
+            ("currency", "VARCHAR(10)"),
+            ("purchase_count", "INTEGER NOT NULL"),
+            ("purchase_amount", "NUMERIC(14, 2) NOT NULL"),
+            ("refund_amount", "NUMERIC(14, 2) NOT NULL"),
+        ],
+        """SELECT {month}, t.customer_id, t.currency,
+    SUM(CASE WHEN t.type = 'purchase' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN t.type = 'purchase' THEN t.amount ELSE 0 END),
+    SUM(CASE WHEN t.type = 'refund' THEN t.amount ELSE 0 END)
+FROM transactions t
+WHERE t.status = 'completed' {since}
+GROUP BY 1, 2, 3""",
+    ),
+    Rollup(
+        "rollup_refunds_by_payment_method",
+        "completed refunds per month, payment method and currency",
+        [
+            ("month", "DATE NOT NULL"),
+            ("payment_method", "VARCHAR(20)"),
+            ("currency", "VARCHAR(10)"),
+            ("refund_count", "INTEGER NOT NULL"),
+            ("refund_amount", "NUMERIC(14, 2) NOT NULL"),
+        ],
+        """SELECT {month}, t.payment_method, t.currency, COUNT(*), SUM(t.amount)
+FROM transactions t
+WHERE t.type = 'refund' AND t.status = 'completed' {since}
+GROUP BY 1, 2, 3""",
+    ),
+    Rollup(
+        "rollup_employee_sales_by_region",
+        "completed purchases per month, employee region, employee and currency; join employees on employee_id "
+        "for names",
+        [
+            ("month", "DATE NOT NULL"),
+            ("region", "VARCHAR(100)"),
+            ("employee_id", "INTEGER"),
+            ("currency", "VARCHAR(10)"),
+            ("sale_count", "INTEGER NOT NULL"),
+            ("sale_amount", "NUMERIC(14, 2) NOT NULL"),
+            ("customer_count", "INTEGER NOT NULL"),
+        ],
+        """SELECT {month}, e.region, t.employee_id, t.currency, COUNT(*), SUM(t.amount), COUNT(DISTINCT t.customer_id)
+FROM transactions t
+JOIN employees e ON e.id = t.employee_id
+WHERE t.type = 'purchase' AND t.status = 'completed' {since}
+GROUP BY 1, 2, 3, 4""",
+    ),
+]
+
+
+def _as_datetime(value: Any) -> datetime:
+    """transaction_date as returned by the driver (datetime, date or ISO string on SQLite)."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return datetime.fromisoformat(str(value))
+
+
+class RollupManager:
+    """
+    Summary tables the SQL agent reads instead of scanning ``transactions``.
+
+    Each rollup keeps one row per month and group, so a refresh only has to
+    recompute the months that can have changed: it records the latest
+    ``transaction_date`` it has seen (the watermark) and replaces every month
+    from ``lookback_days`` before the watermark onward in one transaction.
+    That happens when newer rows exist, and also when existing rows may have
+    changed (e.g. a purchase moving to 'completed'): on PostgreSQL when the
+    modification count of ``transactions`` in ``pg_stat_user_tables`` moved
+    since the last refresh, on other databases (no counters) on every pass.
+    ``full=True`` rebuilds everything (after backfills or corrections older
+    than the lookback). ``context`` tells the agent which rollups exist and
+    how fresh they are.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        read_engine: Optional[Engine] = None,
+        rollups: Sequence[Rollup] = ROLLUPS,
+        refresh_seconds: float = ROLLUP_REFRESH_SECONDS,
+        lookback_days: int = ROLLUP_LOOKBACK_DAYS,
+        watermark_check_seconds: float = SCHEMA_VERSION_CHECK_SECONDS,
+    ):
+        self.engine = engine
+        self.read_engine = read_engine or engine
+        self.rollups = list(rollups)
+        self.refresh_seconds = refresh_seconds
+        self.lookback_days = lookback_days
+        self.watermark_check_seconds = watermark_check_seconds
+        self.counters = {"refreshes": 0, "incremental": 0, "full": 0, "skipped": 0, "failures": 0}
+
+        self._lock = threading.Lock()
+        self._watermarks: Dict[str, Dict[str, Any]] = {}
+        self._watermarks_at = 0.0
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def create_tables(self) -> List[str]:
+        """
+        Create the rollup and watermark tables that do not exist yet.
+
+        Returns:
+            Names of the tables created
+        """
+        existing = set(inspect(self.engine).get_table_names())
+        created = [rollup.name for rollup in self.rollups if rollup.name not in existing]
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (\n"
+                "    rollup_name VARCHAR(100) PRIMARY KEY,\n"
+                "    watermark VARCHAR(40) NOT NULL,\n"
+                "    refreshed_at VARCHAR(40) NOT NULL,\n"
+                "    source_version VARCHAR(40)\n"
+                ")"
+            ))
+            if WATERMARK_TABLE in existing and "source_version" not in {
+                column["name"] for column in inspect(conn).get_columns(WATERMARK_TABLE)
+            }:
+                conn.execute(text(f"ALTER TABLE {WATERMARK_TABLE} ADD COLUMN source_version VARCHAR(40)"))
+            for rollup in self.rollups:
+                for statement in rollup.create_statements():
+                    conn.execute(text(statement))
+        if WATERMARK_TABLE not in existing:
+            created.append(WATERMARK_TABLE)
+        return created
+
+    def _source_version(self, conn: Connection) -> Optional[str]:
+        """Modification count of ``transactions`` (PostgreSQL), or None where the database keeps no counters."""
+        if self.engine.dialect.name != "postgresql":
+            return None
+        count = conn.execute(text(
+            "SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables WHERE relname = 'transactions'"
+        )).scalar()
+        return str(count) if count is not None else None
+
+    def _refresh_one(
+        self,
+        conn: Connection,
+        rollup: Rollup,
+        latest: datetime,
+        version: Optional[str],
+        full: bool
+    ) -> Optional[str]:
+        """Recompute the months of one rollup that may have changed; returns 'full', 'incremental' or None."""
+        stored = conn.execute(
+            text(f"SELECT watermark, source_version FROM {WATERMARK_TABLE} WHERE rollup_name = :name"),
+            {"name": rollup.name},
+        ).fetchone()
+        watermark = _as_datetime(stored[0]) if stored is not None else None
+        unchanged = version is not None and stored is not None and stored[1] == version
+        if not full and watermark is not None and latest <= watermark and unchanged:
+            return None
+
+        params = {}
+        if full or watermark is None:
+            conn.execute(text(f"DELETE FROM {rollup.name}"))
+        else:
+            since = min(watermark, latest) - timedelta(days=self.lookback_days)
+            params["start"] = since.date().replace(day=1).isoformat()
+            conn.execute(text(f"DELETE FROM {rollup.name} WHERE month >= :start"), params)
+        conn.execute(text(rollup.insert_statement(self.engine.dialect.name, since=bool(params))), params)
+
+        conn.execute(text(f"DELETE FROM {WATERMARK_TABLE} WHERE rollup_name = :name"), {"name": rollup.name})
+        conn.execute(
+            text(
+                f"INSERT INTO {WATERMARK_TABLE} (rollup_name, watermark, refreshed_at, source_version) "
+                "VALUES (:name, :watermark, :now, :version)"
+            ),
+            {"name": rollup.name, "watermark": latest.isoformat(sep=" "),
+             "now": datetime.now().isoformat(sep=" ", timespec="seconds"), "version": version},
+        )
+        return "incremental" if params else "full"
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Bring every rollup up to the latest ``transaction_date``.
+
+        Each rollup is refreshed in its own transaction, so readers see
+        either its old or its new months, never a partial update.
+
+        Args:
+            full: Rebuild every rollup from scratch
+
+        Returns:
+            {"created": new tables, "refreshed": {rollup: "full" | "incremental"}}
+        """
+        with self._lock:
+            created = self.create_tables()
+            refreshed = {}
+            for rollup in self.rollups:
+                with self.engine.begin() as conn:
+                    if self.engine.dialect.name == "postgresql":
+                        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+                    latest = conn.execute(text("SELECT MAX(transaction_date) FROM transactions")).scalar()
+                    if latest is None:
+                        continue
+                    mode = self._refresh_one(conn, rollup, _as_datetime(latest), self._source_version(conn), full)
+                self.counters[mode or "skipped"] += 1
+                if mode:
+                    refreshed[rollup.name] = mode
+            self.counters["refreshes"] += 1
+            self._watermarks_at = 0.0
+        return {"created": created, "refreshed": refreshed}
+
+    def watermarks(self) -> Dict[str, Dict[str, Any]]:
+        """Watermark and refresh time of each rollup, re-read at most every ``watermark_check_seconds``."""
+        if time.time() - self._watermarks_at >= self.watermark_check_seconds:
+            try:
+                with self.read_engine.connect() as conn:
+                    rows = conn.execute(text(
+                        f"SELECT rollup_name, watermark, refreshed_at FROM {WATERMARK_TABLE}"
+                    )).fetchall()
+                self._watermarks = {name: {"watermark": mark, "refreshed_at": at} for name, mark, at in rows}
+            except Exception:
+                self._watermarks = {}  # Not created yet
+            self._watermarks_at = time.time()
+        return self._watermarks
+
+    def context(self, tables: Sequence[str]) -> str:
+        """
+        Section of the SQL agent prompt that points aggregate questions at the rollups.
+
+        Args:
+            tables: Tables of the database (rollups missing from it, or never refreshed, are left out)
+
+        Returns:
+            Rollup list with what each covers, or "" if none is available
+        """
+        watermarks = self.watermarks()
+        lines = [
+            f"- {rollup.name}: {rollup.description} (transactions up to {watermarks[rollup.name]['watermark']})"
+            for rollup in self.rollups if rollup.name in tables and rollup.name in watermarks
+        ]
+        if not lines:
+            return ""
+        return (
+            "Precomputed monthly summaries of completed transactions (month is the first day of the month). "
+            "Prefer them over aggregating transactions when they answer the question; use transactions for "
+            "dates after their watermark, other statuses or row-level detail:\n" + "\n".join(lines)
+        )
+
+    def _refresh_loop(self) -> None:
+        while True:
+            try:
+                refresh_rollups(self)
+            except Exception as e:
+                self.counters["failures"] += 1
+                print(f"Rollups: refresh failed, keeping the current summaries: {e}")
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+    def start(self) -> None:
+        """Refresh in a background thread every ``refresh_seconds`` (no-op when 0)."""
+        if self.refresh_seconds <= 0:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="rollup-refresher", daemon=True)
+                self._refresher.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "rollups": self.watermarks()}
+
+
+def refresh_rollups(manager: Optional["RollupManager"] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    Refresh the rollups, then let the schema and result caches see the changes.
+
+    Args:
+        manager: Rollup manager (defaults to the application one)
+        full: Rebuild every rollup from scratch
+
+    Returns:
+        Result of ``RollupManager.refresh``
+    """
+    manager = manager or get_rollup_manager()
+    result = manager.refresh(full=full)
+    if result["created"]:
+        get_schema_cache().refresh()
+    result_cache = get_result_cache()
+    if result_cache is not None and result["refreshed"]:
+        result_cache.bump_table_version(*result["refreshed"])
+    if result["created"] or result["refreshed"]:
+        print(f"Rollups: created {result['created'] or 'none'}, refreshed {result['refreshed'] or 'none'}")
+    return result
+
+
+_rollup_manager: Optional[RollupManager] = None
+_rollup_manager_lock = threading.Lock()
+
+
+def get_rollup_manager() -> Optional[RollupManager]:
+    """Get or create the rollup manager of the application database (singleton, refreshing in the background); None when disabled."""
+    global _rollup_manager
+    if not ROLLUPS_ENABLED:
+        return None
+    with _rollup_manager_lock:
+        if _rollup_manager is None:
+            _rollup_manager = RollupManager(get_engine(read_only=False), read_engine=get_schema_cache().engine)
+            _rollup_manager.start()
+        return _rollup_manager
+
+
+def current_rollup_manager() -> Optional[RollupManager]:
+    """The rollup manager if the application has started it, without creating it (no DDL, no refresh thread)."""
+    with _rollup_manager_lock:
+        return _rollup_manager
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description="Create and refresh the SQL rollup tables.",
+        epilog="Example: python -m src.db.rollups --full"
+    )
+    argparser.add_argument("--full", action="store_true", help="Rebuild every rollup instead of the changed months.")
+    args = argparser.parse_args()
+
+    manager = RollupManager(get_engine(read_only=False), refresh_seconds=0, watermark_check_seconds=0)
+    refresh_rollups(manager, full=args.full)
+    print(manager.stats())
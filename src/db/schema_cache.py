@@ -0,0 +1,357 @@
+"""Schema Cache - table DDL, column stats and sample rows precomputed for the SQL agent prompt."""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import MetaData, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+
+from src.config.settings import (
+    SCHEMA_CACHE_PATH,
+    SCHEMA_CACHE_REFRESH_SECONDS,
+    SCHEMA_PROMPT_MAX_TABLES,
+    SCHEMA_SAMPLE_ROWS,
+    SCHEMA_VERSION_CHECK_SECONDS,
+)
+from src.db.connection import get_engine
+
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_MAX_VALUE_CHARS = 100
+
+
+def _words(text_: str) -> set:
+    """Lowercase words of a question or identifier, with naive singulars (orders -> order)."""
+    words = set()
+    for word in _WORD_PATTERN.findall(text_.lower().replace("_", " ")):
+        words.add(word)
+        if len(word) > 3 and word.endswith("ies"):
+            words.add(word[:-3] + "y")
+        elif len(word) > 3 and word.endswith("s"):
+            words.add(word[:-1])
+    return words
+
+
+def _truncate(value: Any) -> str:
+    value = str(value)
+    return value if len(value) <= _MAX_VALUE_CHARS else value[:_MAX_VALUE_CHARS] + "..."
+
+
+def schema_version(engine: Engine) -> str:
+    """
+    Hash of every table's columns and types; changes with any DDL that matters to queries.
+
+    On PostgreSQL this is a single catalog query, cheap enough to poll.
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        Hex digest
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT table_name, column_name, data_type, is_nullable FROM information_schema.columns "
+                "WHERE table_schema = current_schema() ORDER BY table_name, ordinal_position"
+            )).fetchall()
+        description = [list(row) for row in rows]
+    else:
+        inspector = inspect(engine)
+        description = [
+            [table, column["name"], str(column["type"]), column["nullable"]]
+            for table in sorted(inspector.get_table_names())
+            for column in inspector.get_columns(table)
+        ]
+    return hashlib.sha256(json.dumps(description, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _postgres_stats(engine: Engine) -> Dict[str, Dict[str, Any]]:
+    """Planner statistics per table: estimated rows and, per column, distinct count, null share and common values."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    with engine.connect() as conn:
+        for table, rows in conn.execute(text(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace"
+        )):
+            stats.setdefault(table, {"columns": {}})["row_estimate"] = max(int(rows), 0)
+        for table, column, null_frac, n_distinct, common in conn.execute(text(
+            "SELECT tablename, attname, null_frac, n_distinct, most_common_vals::text FROM pg_stats "
+            "WHERE schemaname = current_schema()"
+        )):
+            stats.setdefault(table, {"columns": {}})["columns"][column] = {
+                "null_frac": round(float(null_frac or 0), 3),
+                # Negative n_distinct is a fraction of the row count
+                "n_distinct": float(n_distinct or 0),
+                "common_values": _truncate(common.strip("{}")) if common else None,
+            }
+    return stats
+
+
+def _describe_table(name: str, info: Dict[str, Any]) -> str:
+    parts = [info["ddl"]]
+    if info.get("row_estimate") is not None:
+        parts.append(f"/* ~{info['row_estimate']} rows */")
+    column_stats = [
+        f"{column}: {stats['n_distinct']:g} distinct"
+        + (f", {stats['null_frac']:.0%} null" if stats["null_frac"] else "")
+        + (f", common: {stats['common_values']}" if stats.get("common_values") else "")
+        for column, stats in info["column_stats"].items()
+    ]
+    if column_stats:
+        parts.append("/*\nColumn stats:\n" + "\n".join(column_stats) + "\n*/")
+    if info["sample_rows"]:
+        rows = info["sample_rows"].count("\n")
+        parts.append(f"/*\n{rows} rows from {name} table:\n{info['sample_rows']}\n*/")
+    return "\n\n".join(parts)
+
+
+class SchemaCache:
+    """
+    Precomputed description of the database for the SQL agent.
+
+    ``refresh`` reflects the schema once and stores each table's DDL, column
+    statistics (PostgreSQL planner stats) and a few sample rows in a JSON file,
+    so restarts reuse it. A background thread polls ``schema_version`` and
+    rebuilds when the schema changes, or when the stored stats are older than
+    ``refresh_seconds``. ``prompt_context`` then gives the agent the tables
+    relevant to a question, so it can go straight to writing the query.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        path: str = SCHEMA_CACHE_PATH,
+        refresh_seconds: float = SCHEMA_CACHE_REFRESH_SECONDS,
+        check_interval: float = SCHEMA_VERSION_CHECK_SECONDS,
+        sample_rows: int = SCHEMA_SAMPLE_ROWS,
+    ):
+        self.engine = engine
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.check_interval = check_interval
+        self.sample_rows = sample_rows
+        self.counters = {"builds": 0, "version_checks": 0}
+
+        self.version: Optional[str] = None
+        self.built_at = 0.0
+        self.tables: Dict[str, Dict[str, Any]] = {}
+
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._load()
+
+    @property
+    def _database(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Schema cache at {self.path} unreadable, rebuilding: {e}")
+            return
+        if data.get("database") != self._database:
+            return  # Cache of another database
+        self.version = data["version"]
+        self.built_at = data["built_at"]
+        self.tables = data["tables"]
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "database": self._database,
+                "version": self.version,
+                "built_at": self.built_at,
+                "tables": self.tables,
+            }, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _sample(self, conn, table) -> str:
+        rows = conn.execute(select(table).limit(self.sample_rows)).fetchall()
+        lines = ["\t".join(column.name for column in table.columns)]
+        lines += ["\t".join(_truncate(value) for value in row) for row in rows]
+        return "\n".join(lines)
+
+    def _build(self) -> Dict[str, Dict[str, Any]]:
+        metadata = MetaData()
+        metadata.reflect(bind=self.engine)
+        stats = _postgres_stats(self.engine) if self.engine.dialect.name == "postgresql" else {}
+
+        tables = {}
+        with self.engine.connect() as conn:
+            for name, table in metadata.tables.items():
+                try:
+                    sample = self._sample(conn, table) if self.sample_rows > 0 else ""
+                except Exception as e:
+                    sample = ""
+                    print(f"Schema cache: no sample rows for {name}: {e}")
+                table_stats = stats.get(name, {})
+                tables[name] = {
+                    "ddl": str(CreateTable(table).compile(self.engine)).strip(),
+                    "columns": [column.name for column in table.columns],
+                    "references": sorted({fk.column.table.name for fk in table.foreign_keys}),
+                    "row_estimate": table_stats.get("row_estimate"),
+                    "column_stats": table_stats.get("columns", {}),
+                    "sample_rows": sample,
+                }
+        return tables
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Rebuild the cache if the schema version changed or the stats are stale.
+
+        Args:
+            force: Rebuild even if nothing changed
+
+        Returns:
+            True if the cache was rebuilt
+        """
+        with self._lock:
+            version = schema_version(self.engine)
+            self.counters["version_checks"] += 1
+            stale = time.time() - self.built_at > self.refresh_seconds
+            if not force and not stale and version == self.version:
+                return False
+            self.tables = self._build()
+            self.version = version
+            self.built_at = time.time()
+            self.counters["builds"] += 1
+            self._save()
+        print(f"Schema cache: {len(self.tables)} tables cached (version {version})")
+        return True
+
+    def ensure_ready(self) -> None:
+        """Build the cache on first use (or reuse the stored one) and start the version watcher."""
+        if self.version is None:
+            self.refresh(force=True)
+        self._ensure_watcher()
+
+    def relevant_tables(self, question: str, max_tables: int = SCHEMA_PROMPT_MAX_TABLES) -> List[str]:
+        """
+        Tables a question most likely needs, by word overlap with table names, columns and common values.
+
+        The best ``max_tables`` are returned, plus the tables they reference
+        (for joins). When nothing matches, small schemas are returned whole.
+
+        Args:
+            question: Natural language question
+            max_tables: Max tables selected by score (referenced tables come on top)
+
+        Returns:
+            Table names, best first
+        """
+        tables = self.tables  # Snapshot: a refresh swaps the dict, never mutates it
+        question_words = _words(question)
+        scores = {}
+        for name, info in tables.items():
+            score = 3 * len(question_words & _words(name))
+            score += sum(1 for column in info["columns"] if question_words & _words(column))
+            score += sum(
+                1 for stats in info["column_stats"].values()
+                if stats.get("common_values") and question_words & _words(stats["common_values"])
+            )
+            if score:
+                scores[name] = score
+
+        if not scores:
+            return sorted(tables) if len(tables) <= max_tables else []
+
+        selected = sorted(scores, key=lambda name: (-scores[name], name))[:max_tables]
+        for name in list(selected):
+            selected += [ref for ref in tables[name]["references"] if ref not in selected and ref in tables]
+        return selected
+
+    def table_info(self, name: str) -> str:
+        """DDL, column stats and sample rows of one table, in the format of ``sql_db_schema``."""
+        return _describe_table(name, self.tables[name])
+
+    def prompt_context(self, question: str) -> str:
+        """
+        Schema section to append to a question for the SQL agent.
+
+        Args:
+            question: Natural language question
+
+        Returns:
+            Table list plus the full description of the relevant tables
+        """
+        tables = self.tables
+        relevant = [name for name in self.relevant_tables(question) if name in tables]
+        lines = [f"Tables in the database: {', '.join(sorted(tables))}"]
+        if relevant:
+            lines.append("Schemas of the relevant tables (already inspected, no need to call the schema tools for these):")
+            lines += [_describe_table(name, tables[name]) for name in relevant]
+        return "\n\n".join(lines)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Schema cache: refresh failed, keeping the cached schema: {e}")
+
+    def _ensure_watcher(self) -> None:
+        if self.check_interval <= 0:
+            return
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="schema-watcher", daemon=True)
+                self._watcher.start()
+
+    def stop(self) -> None:
+        """Stop the background watcher."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "version": self.version,
+            "tables": len(self.tables),
+            "age_seconds": round(time.time() - self.built_at, 1) if self.built_at else None,
+        }
+
+
+_schema_cache: Optional[SchemaCache] = None
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema_cache() -> SchemaCache:
+    """Get or create the schema cache of the application database (singleton)."""
+    global _schema_cache
+    with _schema_cache_lock:
+        if _schema_cache is None:
+            _schema_cache = SchemaCache(get_engine(read_only=True))
+        return _schema_cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description="Build the SQL schema cache and show the context a question would get.",
+        epilog='Example: python -m src.db.schema_cache --question "Total revenue per customer last month?"'
+    )
+    argparser.add_argument("--question", "-q", type=str, help="Show the schema context for this question.")
+    argparser.add_argument("--force", action="store_true", help="Rebuild even if the schema did not change.")
+    args = argparser.parse_args()
+
+    cache = get_schema_cache()
+    rebuilt = cache.refresh(force=args.force)
+    print(f"{'Rebuilt' if rebuilt else 'Up to date'}: {cache.stats()}")
+    if args.question:
+        print(cache.prompt_context(args.question))
@@ -0,0 +1,215 @@
+"""Local checks on generated SQL: a single, read-only SELECT over known tables."""
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Keywords that write, change the schema or take locks, wherever they appear
+# (data-modifying CTEs, SELECT ... INTO, SELECT ... FOR UPDATE)
+_FORBIDDEN_KEYWORDS = re.compile(
+    r"\b(insert|update|delete|merge|drop|alter|create|truncate|grant|revoke|copy|into|call|vacuum|execute)\b"
+)
+# Functions with side effects or access outside the database
+_FORBIDDEN_FUNCTIONS = re.compile(
+    r"\b(pg_sleep\w*|pg_terminate_backend|pg_cancel_backend|pg_read_\w+|pg_ls_\w+|pg_advisory_\w+|"
+    r"pg_reload_conf|set_config|lo_\w+|dblink\w*)\s*\("
+)
+_TABLE_REFERENCE = re.compile(r"\b(distinct\s+)?(?:from|join)\s+((?:\"[^\"]+\"|\w+)(?:\.(?:\"[^\"]+\"|\w+))?)(\s*\()?")
+_CTE_NAME = re.compile(r"(?:\bwith(?:\s+recursive)?|,)\s*(\w+)\s+as\s*\(")
+
+
+class SQLValidationError(ValueError):
+    """Generated SQL rejected before execution."""
+
+
+def _segments(sql: str) -> Iterator[Tuple[str, str]]:
+    """Split SQL into ('code' | 'comment' | 'string' | 'identifier', text) pieces."""
+    i, n = 0, len(sql)
+    code_start = 0
+    while i < n:
+        ch = sql[i]
+        if sql.startswith("--", i) or sql.startswith("/*", i):
+            yield "code", sql[code_start:i]
+            start = i
+            if ch == "-":
+                end = sql.find("\n", i)
+                i = n if end == -1 else end
+            else:
+                end = sql.find("*/", i + 2)
+                if end == -1:
+                    raise SQLValidationError("Unterminated comment")
+                i = end + 2
+            yield "comment", sql[start:i]
+            code_start = i
+        elif ch == "'":
+            j = i + 1
+            while True:
+                j = sql.find("'", j)
+                if j == -1:
+                    raise SQLValidationError("Unterminated string literal")
+                if sql.startswith("''", j):
+                    j += 2
+                    continue
+                break
+            yield "code", sql[code_start:i]
+            yield "string", sql[i:j + 1]
+            i = code_start = j + 1
+        elif ch == '"':
+            end = sql.find('"', i + 1)
+            if end == -1:
+                raise SQLValidationError("Unterminated quoted identifier")
+            yield "code", sql[code_start:i]
+            yield "identifier", sql[i:end + 1]
+            i = code_start = end + 1
+        elif ch == "$" and re.match(r"\$\w*\$", sql[i:]):
+            raise SQLValidationError("Dollar-quoted strings are not allowed")
+        else:
+            i += 1
+    yield "code", sql[code_start:]
+
+
+def mask_sql(sql: str) -> str:
+    """
+    Lowercase SQL with comments and string literal contents blanked out.
+
+    Quoted identifiers are kept (table checks need them). Keywords and
+    semicolons are then only found in code, not in data, and every
+    position matches the original statement.
+
+    Args:
+        sql: SQL statement
+
+    Returns:
+        Masked statement of the same length
+    """
+    parts = []
+    for kind, text in _segments(sql):
+        if kind == "string":
+            parts.append("'" + " " * (len(text) - 2) + "'")
+        elif kind == "comment":
+            parts.append(" " * len(text))
+        else:
+            parts.append(text.lower())
+    return "".join(parts)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a statement for cache keys.
+
+    Comments are dropped, whitespace collapsed and code lowercased, while
+    string literals and quoted identifiers are kept as written.
+
+    Args:
+        sql: SQL statement
+
+    Returns:
+        Normalized statement
+    """
+    pieces: List[Tuple[str, str]] = []
+    for kind, text in _segments(sql):
+        if kind == "comment":
+            kind, text = "code", " "
+        if kind == "code" and pieces and pieces[-1][0] == "code":
+            pieces[-1] = ("code", pieces[-1][1] + text)  # Rejoin code split by a comment
+        else:
+            pieces.append((kind, text))
+
+    parts = []
+    for kind, text in pieces:
+        if kind == "code":
+            text = re.sub(r"\s+", " ", text.lower())
+            text = re.sub(r"\(\s+", "(", re.sub(r"\s+\)", ")", re.sub(r"\s*,\s*", ", ", text)))
+        parts.append(text)
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _unquote(identifier: str) -> str:
+    return identifier.split(".")[-1].strip('"')
+
+
+def _table_references(masked: str) -> List[str]:
+    """Tables after FROM/JOIN clauses, skipping FROM inside function arguments (EXTRACT(x FROM y))."""
+    opening = []  # Position of the innermost open parenthesis, per character
+    stack: List[int] = []
+    for i, ch in enumerate(masked):
+        if ch == "(":
+            stack.append(i)
+        elif ch == ")" and stack:
+            stack.pop()
+        opening.append(stack[-1] if stack else -1)
+
+    ctes = set(_CTE_NAME.findall(masked))
+    tables = []
+    for match in _TABLE_REFERENCE.finditer(masked):
+        distinct, reference, call = match.groups()
+        if distinct or call:
+            continue  # IS DISTINCT FROM, table functions such as generate_series(...)
+        start = opening[match.start()]
+        if start >= 0 and not re.match(r"\s*(select|with)\b", masked[start + 1:]):
+            continue
+        name = _unquote(reference)
+        if name not in ctes:
+            tables.append(name)
+    return tables
+
+
+def referenced_tables(sql: str) -> List[str]:
+    """
+    Tables a query reads (CTE names and schema prefixes left out).
+
+    Args:
+        sql: SQL statement
+
+    Returns:
+        Lowercase table names, without duplicates
+    """
+    return list(dict.fromkeys(_table_references(mask_sql(sql))))
+
+
+def validate_select(sql: str, known_tables: Optional[Iterable[str]] = None) -> str:
+    """
+    Check that SQL is one read-only SELECT (or WITH ... SELECT) statement.
+
+    Also checks that literals, comments and parentheses are well formed and,
+    given ``known_tables``, that every table it reads exists.
+
+    Args:
+        sql: Generated SQL
+        known_tables: Table names of the database (schema prefixes are ignored)
+
+    Returns:
+        The statement without trailing semicolons
+
+    Raises:
+        SQLValidationError: If the statement is rejected
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if not sql:
+        raise SQLValidationError("Empty query")
+    masked = mask_sql(sql)
+
+    if ";" in masked:
+        raise SQLValidationError("Only a single statement is allowed")
+    if not re.match(r"\s*\(*\s*(select|with)\b", masked):
+        raise SQLValidationError("Only SELECT queries are allowed")
+    keyword = _FORBIDDEN_KEYWORDS.search(masked)
+    if keyword:
+        raise SQLValidationError(f"Read-only queries only, found '{keyword.group(1).upper()}'")
+    function = _FORBIDDEN_FUNCTIONS.search(masked)
+    if function:
+        raise SQLValidationError(f"Function '{function.group(1)}' is not allowed")
+
+    depth = 0
+    for ch in masked:
+        depth += {"(": 1, ")": -1}.get(ch, 0)
+        if depth < 0:
+            break
+    if depth != 0:
+        raise SQLValidationError("Unbalanced parentheses")
+
+    if known_tables is not None:
+        known = {table.lower() for table in known_tables}
+        for name in _table_references(masked):
+            if name not in known:
+                raise SQLValidationError(f"Unknown table '{name}'")
+    return sql
@@ -1,25 +1,10 @@
-from dotenv import load_dotenv
-import psycopg2
-import os
-
-load_dotenv()  # reads the .env file and populates os.environ
-
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
+from src.db.connection import create_connection, pool_stats
 
 try:
-    conn = psycopg2.connect(
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS,
-        host=DB_HOST,
-        port=DB_PORT
-    )
+    conn = create_connection()
 
-    print("Connection successful:", conn.status)
+    print("Connection successful:", conn.dbapi_connection)
     conn.close()
+    print("Pool:", pool_stats())
 except Exception as e:
-    print("Connection failed:", e)
\ No newline at end of file
+    print("Connection failed:", e)
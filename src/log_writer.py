@@ -0,0 +1,237 @@
+"""Log Writer - buffered JSONL appends on a background thread, with rotation and cross-process locking."""
+import atexit
+import gzip
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not coordinated across processes
+    fcntl = None
+
+from src.config.settings import (
+    LOG_BUFFERED,
+    LOG_COMPRESS_ROTATED,
+    LOG_FLUSH_INTERVAL_SECONDS,
+    LOG_MAX_MB,
+    LOG_QUEUE_SIZE,
+    LOG_ROTATE_SECONDS,
+)
+
+
+_MAX_BATCH_LINES = 1000
+_FLUSH = object()
+_STOP = object()
+
+
+def _rotated_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    candidate, n = f"{root}.{stamp}{ext}", 1
+    while os.path.exists(candidate) or os.path.exists(f"{candidate}.gz"):
+        candidate, n = f"{root}.{stamp}-{n}{ext}", n + 1
+    return candidate
+
+
+def _compress(path: str) -> None:
+    with open(path, "rb") as src, gzip.open(f"{path}.gz.part", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(f"{path}.gz.part", f"{path}.gz")
+    os.remove(path)
+
+
+def append_lines(
+    path: str,
+    lines: List[str],
+    max_bytes: float = LOG_MAX_MB * 1024 * 1024,
+    rotate_seconds: float = LOG_ROTATE_SECONDS,
+    compress: bool = LOG_COMPRESS_ROTATED
+) -> Optional[str]:
+    """
+    Append lines to a log file in one write, rotating it first if it is full or too old.
+
+    Processes sharing the file serialize on an exclusive ``flock`` of
+    ``<path>.lock``, which also stores when the current file was started.
+    Rotated files are renamed with a timestamp (``x.20250101-120000.jsonl``)
+    and gzipped after the lock is released.
+
+    Args:
+        path: Log file
+        lines: Lines, each ending with a newline
+        max_bytes: Rotate before the file would exceed this size (0 disables)
+        rotate_seconds: Rotate once the file is this old (0 disables)
+        compress: Gzip rotated files
+
+    Returns:
+        Path of the rotated file, if the file was rotated
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = "".join(lines).encode("utf-8")
+    rotated = None
+    with open(f"{path}.lock", "a+", encoding="utf-8") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            lock.seek(0)
+            started = float(lock.read().strip() or 0)
+            now = time.time()
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            too_big = max_bytes and size + len(data) > max_bytes
+            too_old = rotate_seconds and started and now - started >= rotate_seconds
+            if size and (too_big or too_old):
+                rotated = _rotated_path(path)
+                os.replace(path, rotated)
+                size = 0
+            if not size or not started:
+                lock.seek(0)
+                lock.truncate()
+                lock.write(str(now))
+                lock.flush()
+            with open(path, "ab") as f:
+                f.write(data)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    if rotated and compress:
+        _compress(rotated)
+    return rotated
+
+
+class LogWriter:
+    """
+    Background writer for JSONL logs.
+
+    ``write`` only enqueues the line, so the request path does no file I/O.
+    A daemon thread collects lines for up to ``flush_interval`` seconds and
+    appends each file's batch with a single ``append_lines`` call. The queue
+    is bounded: when the disk falls behind, ``write`` blocks rather than
+    dropping entries. ``close`` (registered with ``atexit``) drains the
+    queue before the process exits.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+        queue_size: int = LOG_QUEUE_SIZE,
+        max_bytes: float = LOG_MAX_MB * 1024 * 1024,
+        rotate_seconds: float = LOG_ROTATE_SECONDS,
+        compress: bool = LOG_COMPRESS_ROTATED
+    ):
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.counters = {"lines": 0, "batches": 0, "rotations": 0, "errors": 0}
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _append(self, path: str, lines: List[str]) -> None:
+        try:
+            if append_lines(path, lines, self.max_bytes, self.rotate_seconds, self.compress):
+                self.counters["rotations"] += 1
+            self.counters["lines"] += len(lines)
+            self.counters["batches"] += 1
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"Failed to write {len(lines)} log lines to {path}: {e}", file=sys.stderr)
+            sys.stderr.writelines(lines)
+
+    def _write_batch(self, items: List[tuple]) -> None:
+        by_path: Dict[str, List[str]] = {}
+        for path, line in items:
+            by_path.setdefault(path, []).append(line)
+        for path, lines in by_path.items():
+            self._append(path, lines)
+
+    def _run(self) -> None:
+        while True:
+            got = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather lines until the interval ends, the batch is full, or flush/close is requested
+            while got[-1] is not _FLUSH and got[-1] is not _STOP and len(got) < _MAX_BATCH_LINES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    got.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch([item for item in got if item is not _FLUSH and item is not _STOP])
+            for _ in got:
+                self._queue.task_done()
+            if got[-1] is _STOP:
+                return
+
+    def write(self, path: str, line: str) -> None:
+        """Queue one line (ending with a newline) for ``path``; written synchronously once closed."""
+        if self._closed:
+            self._append(path, [line])
+            return
+        self._queue.put((path, line))
+
+    def flush(self) -> None:
+        """Block until every queued line is written."""
+        if not self._closed:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write the queued lines and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "queued": self._queue.qsize()}
+
+
+_log_writer: Optional[LogWriter] = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> LogWriter:
+    """Get or create the process-wide log writer (singleton, flushed at exit)."""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter()
+            atexit.register(_log_writer.close)
+        return _log_writer
+
+
+def _reset_after_fork() -> None:
+    # The writer thread does not survive fork; the parent still owns the lines queued before it
+    global _log_writer, _log_writer_lock
+    _log_writer = None
+    _log_writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def write_line(path: str, line: str) -> None:
+    """Append a line to a log file: queued when ``LOG_BUFFERED``, otherwise written now."""
+    if LOG_BUFFERED:
+        get_log_writer().write(path, line)
+    else:
+        append_lines(path, [line])
+
+
+def flush_logs() -> None:
+    """Write the lines still queued by this process (no-op without a writer)."""
+    if _log_writer is not None:
+        _log_writer.flush()
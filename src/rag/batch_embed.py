@@ -0,0 +1,280 @@
+"""Batched, concurrent embedding engine used to build the document index."""
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from tqdm import tqdm
+
+from src.utils import count_tokens
+
+
+DEFAULT_MAX_BATCH_TOKENS = 8000
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+
+    Both limits are optional; a limit of None (or 0) disables it.
+    Thread-safe: ``acquire`` blocks the calling worker until capacity is free.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._request_allowance = float(self.requests_per_minute or 0)
+        self._token_allowance = float(self.tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request carrying ``tokens`` tokens may be sent."""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+
+        # A single batch larger than the whole minute budget would wait forever
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+            time.sleep(wait)
+
+
+def make_batches(
+    token_counts: Sequence[int],
+    max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+) -> List[List[int]]:
+    """
+    Group text positions into token-bounded batches, preserving order.
+
+    A text larger than ``max_batch_tokens`` is sent alone in its own batch.
+
+    Args:
+        token_counts: Token count for each text
+        max_batch_tokens: Upper bound on the summed tokens of a batch
+        max_batch_size: Upper bound on the number of texts in a batch
+
+    Returns:
+        List of batches, each a list of positions into ``token_counts``
+    """
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class BatchEmbedder:
+    """
+    Embed many texts with ``embed_documents`` in token-bounded batches.
+
+    Batches run concurrently on a bounded thread pool, each request goes through
+    a shared rate limiter, failed requests are retried with exponential backoff,
+    and finished vectors are appended to an optional JSONL checkpoint so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        checkpoint_path: Optional[str] = None,
+        show_progress: bool = True
+    ):
+        self.embedding_model = embedding_model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.checkpoint_path = checkpoint_path
+        self.show_progress = show_progress
+        self._checkpoint_lock = threading.Lock()
+
+    def _load_checkpoint(self, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """
+        Return vectors from a previous run for the texts it already embedded.
+
+        Vectors are matched by text hash, not position, so they are still
+        reused when chunks were inserted, removed or reordered in between.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+
+        by_hash: Dict[str, List[float]] = {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line from an interrupted run
+                if isinstance(record, dict) and "hash" in record and "embedding" in record:
+                    by_hash[record["hash"]] = record["embedding"]
+        if not by_hash:
+            return {}
+
+        done: Dict[int, List[float]] = {}
+        for i, text in enumerate(texts):
+            vector = by_hash.get(_text_hash(text))
+            if vector is not None:
+                done[i] = vector
+        return done
+
+    def _save_checkpoint(self, positions: List[int], texts: Sequence[str], vectors: List[List[float]]) -> None:
+        if not self.checkpoint_path:
+            return
+        lines = "".join(
+            json.dumps({"index": i, "hash": _text_hash(texts[i]), "embedding": vector}) + "\n"
+            for i, vector in zip(positions, vectors)
+        )
+        with self._checkpoint_lock:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+
+    def _embed_batch(self, batch: List[str], tokens: int) -> List[List[float]]:
+        """Send one batch, retrying transient failures with jittered backoff."""
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(tokens)
+            try:
+                vectors = self.embedding_model.embed_documents(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+                return vectors
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay *= 0.5 + random.random() / 2
+                print(f"Embedding batch failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s",
+                      file=sys.stderr)
+                time.sleep(delay)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Embed all texts, returning vectors in input order.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per text
+        """
+        results: Dict[int, List[float]] = self._load_checkpoint(texts)
+        if results:
+            print(f"Resuming from checkpoint: {len(results)}/{len(texts)} texts already embedded")
+
+        # Vectors already in an embedding cache cost neither requests nor rate-limit budget
+        cached_documents = getattr(self.embedding_model, "cached_documents", None)
+        if cached_documents is not None:
+            pending = [i for i in range(len(texts)) if i not in results]
+            cached = {i: v for i, v in zip(pending, cached_documents([texts[i] for i in pending])) if v is not None}
+            if cached:
+                print(f"Embedding cache: {len(cached)}/{len(texts)} texts already embedded")
+                results.update(cached)
+
+        pending = [i for i in range(len(texts)) if i not in results]
+        token_counts = [count_tokens(texts[i]) for i in pending]
+        batches = make_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+
+        progress = tqdm(total=len(texts), initial=len(results), desc="Embedding",
+                        disable=not self.show_progress)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {}
+            for batch in batches:
+                positions = [pending[j] for j in batch]
+                tokens = sum(token_counts[j] for j in batch)
+                future = executor.submit(self._embed_batch, [texts[i] for i in positions], tokens)
+                futures[future] = positions
+
+            try:
+                for future in as_completed(futures):
+                    positions = futures[future]
+                    vectors = future.result()
+                    self._save_checkpoint(positions, texts, vectors)
+                    results.update(zip(positions, vectors))
+                    progress.update(len(positions))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                # as_completed yields already finished futures in any order: keep
+                # the batches that succeeded before the failing one was reached
+                for future, positions in futures.items():
+                    if positions[0] not in results and future.done() and not future.cancelled() \
+                            and future.exception() is None:
+                        self._save_checkpoint(positions, texts, future.result())
+                raise
+            finally:
+                progress.close()
+
+        return [results[i] for i in range(len(texts))]
+
+    def clear_checkpoint(self) -> None:
+        """Remove the checkpoint file once its vectors are safely persisted."""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
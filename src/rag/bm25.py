@@ -0,0 +1,226 @@
+"""BM25 inverted index over the document chunks, stored next to the FAISS index."""
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+BM25_FILE = "bm25.sqlite"
+LEGACY_BM25_FILE = "bm25.json"
+
+# Words plus codes such as "POL-2024-07" or "v2.1" kept whole
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens; compound codes yield the whole code and its parts.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts, keyed by docstore id.
+
+    Postings are kept as NumPy arrays (rows, term frequencies) per term, so a
+    query costs one vectorized update per query term. This in-memory form is
+    what ``build`` returns; ``load`` opens a saved index as a SQLiteBM25Index.
+    """
+
+    def __init__(
+        self,
+        doc_ids: List[str],
+        doc_lengths: np.ndarray,
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.doc_ids = doc_ids
+        self.postings = postings
+        self._init_scoring(doc_lengths, k1, b)
+
+    def _init_scoring(self, doc_lengths: np.ndarray, k1: float, b: float) -> None:
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        self._norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avg_length or 1.0))
+
+    @classmethod
+    def build(cls, doc_ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Index chunk texts.
+
+        Args:
+            doc_ids: Docstore id of each chunk
+            texts: Chunk texts, parallel to doc_ids
+
+        Returns:
+            BM25Index
+        """
+        lengths = []
+        rows: Dict[str, List[int]] = defaultdict(list)
+        freqs: Dict[str, List[int]] = defaultdict(list)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                rows[term].append(row)
+                freqs[term].append(tf)
+        postings = {
+            term: (np.asarray(rows[term], dtype=np.int32), np.asarray(freqs[term], dtype=np.float32))
+            for term in rows
+        }
+        return cls(list(doc_ids), np.asarray(lengths), postings, k1, b)
+
+    def _lookup(self, terms: Iterable[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Postings (rows, term frequencies) of the given terms that occur in the index."""
+        return {term: self.postings[term] for term in terms if term in self.postings}
+
+    def _ids(self, rows: List[int]) -> List[str]:
+        """Docstore ids of the given rows, in order."""
+        return [self.doc_ids[row] for row in rows]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Top-k chunks for a query.
+
+        Args:
+            query: Query text
+            k: Number of results
+
+        Returns:
+            List of (docstore id, score), best first; chunks sharing no term are left out
+        """
+        n = len(self.doc_lengths)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        query_terms = Counter(tokenize(query))
+        for term, (rows, tf) in self._lookup(query_terms).items():
+            idf = float(np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5)))
+            scores[rows] += query_terms[term] * idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return list(zip(self._ids(top.tolist()), (float(score) for score in scores[top])))
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a new SQLite file, one postings row per term.
+
+        Args:
+            path: Destination file (must not exist)
+        """
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("CREATE TABLE params (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+            conn.execute("CREATE TABLE docs (row INTEGER PRIMARY KEY, id TEXT NOT NULL, length INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE postings (term TEXT PRIMARY KEY, rows BLOB NOT NULL, tfs BLOB NOT NULL) WITHOUT ROWID")
+            conn.executemany("INSERT INTO params VALUES (?, ?)", [("k1", self.k1), ("b", self.b)])
+            conn.executemany(
+                "INSERT INTO docs VALUES (?, ?, ?)",
+                ((row, doc_id, int(length)) for row, (doc_id, length) in enumerate(zip(self.doc_ids, self.doc_lengths)))
+            )
+            conn.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                (
+                    (term, rows.astype(np.int32).tobytes(), tf.astype(np.int32).tobytes())
+                    for term, (rows, tf) in self.postings.items()
+                )
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open an index written by ``save``; postings stay on disk."""
+        return SQLiteBM25Index(path)
+
+
+class SQLiteBM25Index(BM25Index):
+    """
+    Read-only BM25 index over ``bm25.sqlite``: postings are read per query term.
+
+    Only the document lengths are held in memory (BM25 normalizes by them on
+    every hit); the docstore ids are read for the top-k rows. Like the chunk
+    table, the file is opened once, so a search racing a rebuild keeps reading
+    the index it was loaded from.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"BM25 index not found at: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        params = dict(self._query("SELECT name, value FROM params"))
+        lengths = np.asarray([length for (length,) in self._query("SELECT length FROM docs ORDER BY row")])
+        self._init_scoring(lengths, params["k1"], params["b"])
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _lookup(self, terms: Iterable[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        terms = list(terms)
+        if not terms:
+            return {}
+        placeholders = ",".join("?" * len(terms))
+        return {
+            term: (np.frombuffer(rows, dtype=np.int32), np.frombuffer(tfs, dtype=np.int32).astype(np.float32))
+            for term, rows, tfs in self._query(
+                f"SELECT term, rows, tfs FROM postings WHERE term IN ({placeholders})", tuple(terms)
+            )
+        }
+
+    def _ids(self, rows: List[int]) -> List[str]:
+        placeholders = ",".join("?" * len(rows))
+        ids = dict(self._query(f"SELECT row, id FROM docs WHERE row IN ({placeholders})", tuple(rows)))
+        return [ids[row] for row in rows]
+
+
+def _load_legacy_json(path: str) -> BM25Index:
+    """Read a ``bm25.json`` written by earlier builds fully into memory."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    postings = {
+        term: (np.asarray(rows, dtype=np.int32), np.asarray(tf, dtype=np.float32))
+        for term, (rows, tf) in data["postings"].items()
+    }
+    return BM25Index(data["doc_ids"], np.asarray(data["doc_lengths"]), postings, data["k1"], data["b"])
+
+
+def load_bm25_index(index_path: str) -> Optional[BM25Index]:
+    """
+    BM25 index stored with a FAISS index, or None for indexes built without one.
+
+    Indexes built before the SQLite format still carry ``bm25.json``; it is
+    read into memory until the next build replaces it.
+    """
+    path = os.path.join(index_path, BM25_FILE)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    legacy_path = os.path.join(index_path, LEGACY_BM25_FILE)
+    return _load_legacy_json(legacy_path) if os.path.exists(legacy_path) else None
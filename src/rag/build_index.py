@@ -1,51 +1,175 @@
-from langchain_openai import AzureOpenAIEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 import argparse
-import os
-import dotenv
 import json
-from tqdm import tqdm
+import numpy as np
+from typing import Any, Dict, Optional
 
-dotenv.load_dotenv()  # Load environment variables from .env file
-
-# Initialize the embedding model once
-embedding_model = AzureOpenAIEmbeddings(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT_EMBEDDINGS"),
-    azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION_EMBEDDINGS"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS"),
+from src.config.settings import get_embedding_model, load_vector_store
+from src.rag.index_factory import (
+    INDEX_TYPES,
+    build_faiss_index,
+    default_index_config,
+    load_index_config,
+    requested_config,
+    supports_remove,
+)
+from src.rag.bm25 import BM25Index
+from src.rag.index_store import chunk_hash, load_index, load_manifest, save_index_atomic
+from src.rag.batch_embed import (
+    BatchEmbedder,
+    DEFAULT_MAX_BATCH_TOKENS,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
 )
+
+# Shared with the RAG agent: unchanged chunks are served from the embedding cache
+embedding_model = get_embedding_model()
 def embed_text(text: str):
     """Generate embeddings for the given text using Azure OpenAI."""
     response = embedding_model.embed_query(text)
     return response
 
-def embed_jsonl_file(file_path: str):
-    """Generate embeddings for each line in a JSONL file."""
-    
+def read_jsonl_file(file_path: str):
+    """Read texts and metadata from a JSONL file of chunks."""
     texts = []
-    embeddings = []
     metadata = []
     with open(file_path, "r") as f:
-        total_lines = sum(1 for _ in f)
-        f.seek(0)  
+        for line in f:
+            data = json.loads(line)
+            texts.append(data.get("text", ""))
+            metadata.append(data.get("metadata", {}))
+    return texts, metadata
 
 
-        for line in tqdm(f, total=total_lines, desc="Processing lines"):
-            data = json.loads(line)
-            text = data.get("text", "")
-            texts.append(text)
-            metadata_item = data.get("metadata", {})
-            embedding = embed_text(text)
-            embeddings.append(embedding)
-            metadata.append(metadata_item)
+def embed_jsonl_file(file_path: str, embedder: Optional[BatchEmbedder] = None):
+    """Generate embeddings for each line in a JSONL file, in concurrent batches."""
+    texts, metadata = read_jsonl_file(file_path)
+    embedder = embedder or BatchEmbedder(embedding_model)
+    embeddings = embedder.embed(texts)
     return texts, embeddings, metadata
 
-def create_faiss_index(texts, embeddings, metadata, index_path: str):
-    """Create and save a FAISS index from embeddings and metadata."""
-    text_embeddings = list(zip(texts, embeddings))
-    vector_store = FAISS.from_embeddings(text_embeddings, embedding=embedding_model, metadatas=metadata)
-    vector_store.save_local(index_path)
+def create_faiss_index(texts, embeddings, metadata, index_path: str, index_config: Optional[Dict[str, Any]] = None):
+    """
+    Create and save a FAISS index from embeddings and metadata.
+
+    Args:
+        texts: Chunk texts
+        embeddings: One vector per text
+        metadata: Chunk metadata, parallel to texts
+        index_path: FAISS index directory
+        index_config: Index factory config (defaults to the FAISS_* settings)
+    """
+    # Chunks are keyed by content hash; identical chunks are stored once
+    unique = {}
+    for i, (text, meta) in enumerate(zip(texts, metadata)):
+        unique.setdefault(chunk_hash(text, meta), i)
+
+    ids = list(unique)
+    positions = list(unique.values())
+    index, index_config = build_faiss_index(
+        np.asarray([embeddings[i] for i in positions], dtype=np.float32),
+        index_config or default_index_config(),
+    )
+    print(f"Building {index_config['type']} index over {len(ids)} chunks")
+
+    vector_store = FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vector_store.add_embeddings(
+        [(texts[i], embeddings[i]) for i in positions],
+        metadatas=[metadata[i] for i in positions],
+        ids=ids,
+    )
+    bm25 = BM25Index.build(ids, [texts[i] for i in positions])
+    save_index_atomic(
+        vector_store, index_path, manifest={h: h for h in ids}, index_config=index_config, bm25=bm25
+    )
+
+
+def update_faiss_index(
+    texts,
+    metadata,
+    index_path: str,
+    embedder: Optional[BatchEmbedder] = None,
+    index_config: Optional[Dict[str, Any]] = None
+):
+    """
+    Incrementally bring an existing FAISS index in line with the given chunks.
+
+    Only chunks whose content hash is not in the index manifest are embedded;
+    vectors of chunks that disappeared are deleted. The result is swapped in
+    atomically. Falls back to a full build when no manifest exists yet, when a
+    different index type is requested, or when chunks must be removed from an
+    index type that cannot delete in place (HNSW, IVF); unchanged chunks then
+    come from the embedding cache.
+
+    New vectors are added to the existing IVF centroids; rebuild from scratch
+    once the corpus has grown a lot so the quantizer is retrained.
+
+    Args:
+        texts: Chunk texts
+        metadata: Chunk metadata, parallel to texts
+        index_path: FAISS index directory
+        embedder: Optional configured BatchEmbedder
+        index_config: Optional index factory config; defaults to the stored one
+
+    Returns:
+        Dict with 'added', 'removed' and 'unchanged' chunk counts
+    """
+    embedder = embedder or BatchEmbedder(embedding_model)
+    manifest = load_manifest(index_path)
+    stored_config = load_index_config(index_path)
+
+    wanted = {}
+    for i, (text, meta) in enumerate(zip(texts, metadata)):
+        wanted.setdefault(chunk_hash(text, meta), i)
+
+    added = [h for h in wanted if h not in manifest]
+    removed = [h for h in manifest if h not in wanted]
+
+    rebuild_reason = None
+    if not manifest:
+        rebuild_reason = "No manifest found"
+    elif index_config and index_config["type"] != requested_config(stored_config)["type"]:
+        rebuild_reason = f"Index type changed ({stored_config['type']} -> {index_config['type']})"
+    elif removed and not supports_remove(stored_config):
+        rebuild_reason = f"{stored_config['type']} indexes cannot delete vectors"
+
+    if rebuild_reason:
+        print(f"{rebuild_reason}, building the full index.")
+        positions = list(wanted.values())
+        embeddings = embedder.embed([texts[i] for i in positions])
+        create_faiss_index(
+            [texts[i] for i in positions], embeddings, [metadata[i] for i in positions], index_path,
+            index_config or (requested_config(stored_config) if manifest else None),
+        )
+        unchanged = len(wanted) - len(added)
+        return {"added": len(added), "removed": len(removed), "unchanged": unchanged}
+
+    vector_store = load_index(index_path, embedding_model, writable=True)
+    if removed:
+        vector_store.delete([manifest[h] for h in removed])
+    if added:
+        embeddings = embedder.embed([texts[wanted[h]] for h in added])
+        vector_store.add_embeddings(
+            [(texts[wanted[h]], vector) for h, vector in zip(added, embeddings)],
+            metadatas=[metadata[wanted[h]] for h in added],
+            ids=added,
+        )
+
+    for h in removed:
+        del manifest[h]
+    manifest.update({h: h for h in added})
+
+    if added or removed:
+        # The lexical index is cheap to rebuild from the chunk texts
+        bm25 = BM25Index.build(list(wanted), [texts[i] for i in wanted.values()])
+        save_index_atomic(vector_store, index_path, manifest, index_config=stored_config, bm25=bm25)
+    return {"added": len(added), "removed": len(removed), "unchanged": len(wanted) - len(added)}
 
 
 
@@ -55,13 +179,45 @@ if __name__ == "__main__":
     argparser.add_argument("--index_path", "-o", type=str, required=True, help="Path to save the FAISS index.")
     argparser.add_argument("--test", "-t", action='store_true', help="Test argument.")
     argparser.add_argument("--search", "-s", type=str, required=False, help="Search query.")
+    argparser.add_argument("--batch_tokens", type=int, default=DEFAULT_MAX_BATCH_TOKENS, help="Max tokens per embedding request.")
+    argparser.add_argument("--concurrency", "-c", type=int, default=DEFAULT_MAX_CONCURRENCY, help="Embedding requests in flight at once.")
+    argparser.add_argument("--rpm", type=int, default=None, help="Embedding requests per minute limit.")
+    argparser.add_argument("--tpm", type=int, default=None, help="Embedding tokens per minute limit.")
+    argparser.add_argument("--max_retries", type=int, default=DEFAULT_MAX_RETRIES, help="Retries per failed batch.")
+    argparser.add_argument("--checkpoint", type=str, default=None, help="Checkpoint file (defaults to <index_path>.checkpoint.jsonl).")
+    argparser.add_argument("--incremental", "-u", action="store_true", help="Only embed new or changed chunks and drop removed ones.")
+    argparser.add_argument("--index_type", type=str, choices=INDEX_TYPES, default=None, help="FAISS index type (defaults to FAISS_INDEX_TYPE).")
+    argparser.add_argument("--nlist", type=int, default=None, help="IVF inverted lists (0 = ~4*sqrt(n)).")
+    argparser.add_argument("--hnsw_m", type=int, default=None, help="HNSW graph degree.")
+    argparser.add_argument("--pq_m", type=int, default=None, help="PQ sub-quantizers (must divide the embedding dimension).")
     args = argparser.parse_args()
     index_path = args.index_path
     if not args.test:
         jsonl_file_path = args.input_file
-        texts, embeddings, metadata = embed_jsonl_file(jsonl_file_path)
-        create_faiss_index(texts, embeddings, metadata, index_path)
+        embedder = BatchEmbedder(
+            embedding_model,
+            max_batch_tokens=args.batch_tokens,
+            max_concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            max_retries=args.max_retries,
+            checkpoint_path=args.checkpoint or index_path.rstrip("/\\") + ".checkpoint.jsonl",
+        )
+        overrides = {
+            key: value for key, value in
+            {"index_type": args.index_type, "nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": args.pq_m}.items()
+            if value is not None
+        }
+        index_config = default_index_config(**overrides) if overrides else None
+        if args.incremental:
+            texts, metadata = read_jsonl_file(jsonl_file_path)
+            stats = update_faiss_index(texts, metadata, index_path, embedder, index_config)
+            print(f"Index updated: {stats['added']} added, {stats['removed']} removed, {stats['unchanged']} unchanged")
+        else:
+            texts, embeddings, metadata = embed_jsonl_file(jsonl_file_path, embedder)
+            create_faiss_index(texts, embeddings, metadata, index_path, index_config)
+        embedder.clear_checkpoint()
     else:
         print("Test argument provided, skipping index creation.")
-        load_store = FAISS.load_local(index_path, embedding_model, allow_dangerous_deserialization=True) # safe because this FAISS index was created locally by us.
+        load_store = load_vector_store(index_path)
         print("Results: ", load_store.similarity_search(args.search, k=3))
\ No newline at end of file
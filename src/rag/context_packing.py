@@ -0,0 +1,98 @@
+"""Post-retrieval re-ranking (MMR over stored vectors) and token-budgeted context packing."""
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.utils import count_tokens
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def mmr_order(
+    relevance: Sequence[float],
+    vectors: np.ndarray,
+    lambda_mult: float = 0.7,
+    limit: Optional[int] = None
+) -> List[int]:
+    """
+    Order candidates by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    ``lambda * relevance - (1 - lambda) * max cosine to the already picked``,
+    with the pairwise similarities computed once as one matrix product and the
+    redundancy term updated as a running maximum.
+
+    Args:
+        relevance: Relevance of each candidate to the query (higher is better, ~[0, 1])
+        vectors: Candidate vectors, one row per candidate
+        lambda_mult: 1 = relevance only, 0 = diversity only
+        limit: Number of candidates to order (default: all)
+
+    Returns:
+        Candidate positions, in MMR order
+    """
+    n = len(relevance)
+    limit = n if limit is None else min(limit, n)
+    if n == 0 or limit == 0:
+        return []
+
+    unit = _normalize_rows(vectors)
+    similarity = unit @ unit.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    order = []
+    for _ in range(limit):
+        penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        order.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return order
+
+
+def pack_documents(
+    docs: Sequence[Document],
+    vectors: Optional[np.ndarray],
+    token_budget: int,
+    max_docs: int,
+    dedup_similarity: float = 0.95
+) -> List[Document]:
+    """
+    Greedily keep documents, in the given order, while they fit the token budget.
+
+    Near-duplicates (cosine >= ``dedup_similarity`` to a kept document) are
+    skipped, and so are documents too large for the remaining budget, letting
+    smaller ones behind them fill it. The first document is always kept, so
+    the prompt never ends up empty.
+
+    Args:
+        docs: Candidate documents, best first
+        vectors: Their vectors, one row per document (None disables near-duplicate trimming)
+        token_budget: Max total tokens of the kept documents' text
+        max_docs: Max number of documents kept
+        dedup_similarity: Cosine similarity above which a document is a near-duplicate
+
+    Returns:
+        Kept documents, in order
+    """
+    unit = _normalize_rows(vectors) if vectors is not None and len(docs) else None
+    kept: List[int] = []
+    used = 0
+    for i, doc in enumerate(docs):
+        if len(kept) >= max_docs:
+            break
+        if kept and unit is not None and float(np.max(unit[kept] @ unit[i])) >= dedup_similarity:
+            continue
+        tokens = count_tokens(doc.page_content)
+        if kept and used + tokens > token_budget:
+            continue
+        kept.append(i)
+        used += tokens
+    return [docs[i] for i in kept]
@@ -0,0 +1,171 @@
+"""Fusion Retriever - vector and BM25 results merged with reciprocal rank fusion, then packed into a token budget."""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from src.config.settings import (
+    RAG_CONTEXT_TOKEN_BUDGET,
+    RAG_DEDUP_SIMILARITY,
+    RAG_FUSION_FETCH_K,
+    RAG_MMR_LAMBDA,
+    RAG_RERANK,
+    RAG_RRF_K,
+    RAG_TOP_K,
+)
+from src.rag.bm25 import BM25Index
+from src.rag.context_packing import mmr_order, pack_documents
+from src.tracing import span
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = RAG_RRF_K) -> List[Tuple[str, float]]:
+    """
+    Merge ranked id lists: each id scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+
+    Args:
+        rankings: Ranked lists of ids, best first
+        rrf_k: Damping constant (60 in the original paper)
+
+    Returns:
+        List of (id, fused score), best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class FusionRetriever(BaseRetriever):
+    """
+    Retrieve ``fetch_k`` candidates by vector similarity and by BM25, keep the top ``k`` after RRF.
+
+    Lexical matching catches exact terms (policy codes, product names) that
+    embeddings blur, so a small ``k`` suffices. Without a BM25 index this is a
+    plain vector retriever.
+
+    With ``rerank``, all fused candidates are re-ranked by MMR over their
+    stored FAISS vectors (no extra embedding calls) and packed greedily into
+    ``token_budget`` tokens, skipping near-duplicates, so ``k`` becomes an
+    upper bound on the chunks passed to the LLM.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: FAISS
+    bm25: Optional[BM25Index] = None
+    k: int = RAG_TOP_K
+    fetch_k: int = RAG_FUSION_FETCH_K
+    rrf_k: int = RAG_RRF_K
+    rerank: bool = RAG_RERANK
+    mmr_lambda: float = RAG_MMR_LAMBDA
+    token_budget: int = RAG_CONTEXT_TOKEN_BUDGET
+    dedup_similarity: float = RAG_DEDUP_SIMILARITY
+
+    _row_by_id: Optional[Dict[str, int]] = PrivateAttr(default=None)
+
+    def _fuse(self, query: str, vector_docs: List[Document]) -> List[Document]:
+        if self.bm25 is None:
+            return vector_docs[:self.k]
+
+        docs = {_doc_key(doc): doc for doc in vector_docs}
+        with span("lexical_search"):
+            lexical_ids = [doc_id for doc_id, _ in self.bm25.search(query, self.fetch_k)]
+        fused = reciprocal_rank_fusion([list(docs), lexical_ids], self.rrf_k)
+
+        results = []
+        for key, _ in fused:
+            doc = docs.get(key)
+            if doc is None:
+                doc = self.vector_store.docstore.search(key)
+                if not isinstance(doc, Document):
+                    continue  # BM25 index from a newer build than the loaded vectors
+            results.append(doc)
+            if len(results) == self.k:
+                break
+        return results
+
+    def _rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        mapping = self.vector_store.index_to_docstore_id
+        if hasattr(mapping, "rows_for_ids"):
+            return mapping.rows_for_ids(ids)  # SQLite-backed mapping of a served index
+        if self._row_by_id is None:
+            self._row_by_id = {doc_id: row for row, doc_id in mapping.items()}
+        return {doc_id: self._row_by_id[doc_id] for doc_id in ids if doc_id in self._row_by_id}
+
+    def _stored_vectors(self, rows: List[int]) -> Optional[np.ndarray]:
+        try:
+            return self.vector_store.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+        except RuntimeError as e:
+            print(f"Stored vectors unavailable, skipping re-ranking: {e}")
+            return None
+
+    def _rerank(self, query: str, query_vector: List[float]) -> List[Document]:
+        """Over-fetch, fuse, re-rank by MMR over the stored vectors and pack into the token budget."""
+        with span("vector_search"):
+            vector_docs = self.vector_store.similarity_search_by_vector(query_vector, k=self.fetch_k)
+        docs = {_doc_key(doc): doc for doc in vector_docs}
+        if self.bm25 is not None:
+            with span("lexical_search"):
+                lexical_ids = [doc_id for doc_id, _ in self.bm25.search(query, self.fetch_k)]
+            fused = reciprocal_rank_fusion([list(docs), lexical_ids], self.rrf_k)
+        else:
+            fused = [(key, 1.0) for key in docs]
+
+        rows = self._rows_for_ids([key for key, _ in fused])
+        fused = [(key, score) for key, score in fused if key in rows]  # Skip ids of a newer BM25 build
+        if not fused:
+            return []
+        for key, _ in fused:
+            if key not in docs:
+                doc = self.vector_store.docstore.search(key)
+                if isinstance(doc, Document):
+                    docs[key] = doc
+        fused = [(key, score) for key, score in fused if key in docs]
+
+        vectors = self._stored_vectors([rows[key] for key, _ in fused])
+        candidates = [docs[key] for key, _ in fused]
+        if vectors is None:
+            return pack_documents(candidates, None, self.token_budget, self.k, self.dedup_similarity)
+
+        if self.bm25 is not None:
+            relevance = np.asarray([score for _, score in fused], dtype=np.float32)
+            relevance /= relevance.max()
+        else:
+            target = np.asarray(query_vector, dtype=np.float32)
+            relevance = vectors @ target / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(target) + 1e-12)
+        with span("rerank"):
+            order = mmr_order(relevance, vectors, self.mmr_lambda)
+            return pack_documents(
+                [candidates[i] for i in order], vectors[order], self.token_budget, self.k, self.dedup_similarity
+            )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> List[Document]:
+        if self.rerank:
+            return self._rerank(query, self.vector_store.embeddings.embed_query(query))
+        fetch_k = self.fetch_k if self.bm25 is not None else self.k
+        with span("vector_search"):
+            vector_docs = self.vector_store.similarity_search(query, k=fetch_k)
+        return self._fuse(query, vector_docs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, **kwargs: Any
+    ) -> List[Document]:
+        if self.rerank:
+            query_vector = await self.vector_store.embeddings.aembed_query(query)
+            return await asyncio.to_thread(self._rerank, query, query_vector)
+        fetch_k = self.fetch_k if self.bm25 is not None else self.k
+        with span("vector_search"):
+            vector_docs = await self.vector_store.asimilarity_search(query, k=fetch_k)
+        return self._fuse(query, vector_docs)
@@ -0,0 +1,190 @@
+"""FAISS index factory: Flat, IVF-Flat, HNSW and IVF-PQ indexes with tunable search parameters."""
+import json
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from src.config.settings import (
+    FAISS_EF_CONSTRUCTION,
+    FAISS_EF_SEARCH,
+    FAISS_HNSW_M,
+    FAISS_INDEX_TYPE,
+    FAISS_NLIST,
+    FAISS_NPROBE,
+    FAISS_PQ_M,
+    FAISS_TRAIN_SAMPLE,
+)
+from src.rag.index_store import INDEX_CONFIG_FILE
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# k-means wants ~39 training points per centroid (faiss warns below that)
+MIN_POINTS_PER_CENTROID = 39
+PQ_BITS = 8
+
+
+def default_index_config(
+    index_type: str = FAISS_INDEX_TYPE,
+    nlist: int = FAISS_NLIST,
+    hnsw_m: int = FAISS_HNSW_M,
+    ef_construction: int = FAISS_EF_CONSTRUCTION,
+    pq_m: int = FAISS_PQ_M,
+    nprobe: int = FAISS_NPROBE,
+    ef_search: int = FAISS_EF_SEARCH,
+    train_sample: int = FAISS_TRAIN_SAMPLE
+) -> Dict[str, Any]:
+    """
+    Index build and search parameters, as stored in ``index_config.json``.
+
+    Args:
+        index_type: One of 'flat', 'ivf_flat', 'hnsw', 'ivf_pq'
+        nlist: IVF inverted lists; 0 picks ~4*sqrt(n) at build time
+        hnsw_m: HNSW graph degree
+        ef_construction: HNSW build-time beam width
+        pq_m: PQ sub-quantizers (must divide the embedding dimension)
+        nprobe: IVF lists scanned per query
+        ef_search: HNSW search-time beam width
+        train_sample: Max vectors used to train IVF/PQ quantizers
+
+    Returns:
+        Config dict
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    return {
+        "type": index_type,
+        "nlist": nlist,
+        "hnsw_m": hnsw_m,
+        "ef_construction": ef_construction,
+        "pq_m": pq_m,
+        "nprobe": nprobe,
+        "ef_search": ef_search,
+        "train_sample": train_sample,
+    }
+
+
+def supports_remove(config: Dict[str, Any]) -> bool:
+    """
+    Whether vectors can be deleted in place; other index types are rebuilt instead.
+
+    HNSW graphs cannot delete at all, and IVF indexes keep the ids of the
+    remaining vectors, while LangChain renumbers its row mapping after a delete.
+    """
+    return config.get("type", "flat") == "flat"
+
+
+def _resolve_config(config: Dict[str, Any], n: int, dim: int) -> Dict[str, Any]:
+    """Adapt the requested config to the corpus size, degrading to simpler indexes when too small to train."""
+    config = dict(config)
+    config.setdefault("requested", {"type": config["type"], "nlist": config["nlist"]})
+    index_type = config["type"]
+
+    if index_type == "ivf_pq":
+        if dim % config["pq_m"] != 0:
+            raise ValueError(f"pq_m={config['pq_m']} must divide the embedding dimension {dim}")
+        if n < (2 ** PQ_BITS) * MIN_POINTS_PER_CENTROID:
+            print(f"Only {n} vectors: too few to train PQ codebooks, using ivf_flat")
+            index_type = "ivf_flat"
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = config["nlist"] or int(4 * math.sqrt(n))
+        nlist = min(nlist, n // MIN_POINTS_PER_CENTROID)
+        if nlist < 2:
+            print(f"Only {n} vectors: too few to train IVF centroids, using flat")
+            index_type = "flat"
+        config["nlist"] = nlist
+
+    config["type"] = index_type
+    return config
+
+
+def _factory_string(config: Dict[str, Any]) -> str:
+    return {
+        "flat": "Flat",
+        "ivf_flat": "IVF{nlist},Flat",
+        "hnsw": "HNSW{hnsw_m}",
+        "ivf_pq": "IVF{nlist},PQ{pq_m}x" + str(PQ_BITS),
+    }[config["type"]].format(**config)
+
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    config: Dict[str, Any],
+    seed: int = 0
+) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    Create (and train, if needed) an empty FAISS index for ``vectors``.
+
+    Quantizers are trained on a random sample of at most ``train_sample``
+    vectors; the caller adds the vectors afterwards. The metric is L2, like
+    LangChain's default flat index, so scores stay comparable.
+
+    Args:
+        vectors: float32 matrix of shape (n, dim)
+        config: Config from ``default_index_config``
+        seed: Sampling seed
+
+    Returns:
+        (trained empty index, resolved config that was actually built)
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    config = _resolve_config(config, n, dim)
+
+    index = faiss.index_factory(dim, _factory_string(config), faiss.METRIC_L2)
+    if config["type"] == "hnsw":
+        index.hnsw.efConstruction = config["ef_construction"]
+
+    if config["type"] in ("ivf_flat", "ivf_pq"):
+        # Lets LangChain reconstruct hit vectors (MMR search)
+        faiss.extract_index_ivf(index).make_direct_map()
+
+    if not index.is_trained:
+        sample = vectors
+        if n > config["train_sample"]:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(n, config["train_sample"], replace=False)]
+        index.train(sample)
+
+    apply_search_params(index, config)
+    return index, config
+
+
+def apply_search_params(
+    index: faiss.Index,
+    config: Dict[str, Any],
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> None:
+    """
+    Set query-time parameters; explicit arguments override the stored config.
+
+    Args:
+        index: Loaded FAISS index
+        config: Index config (for the stored defaults)
+        nprobe: IVF lists to scan per query
+        ef_search: HNSW beam width
+    """
+    params = faiss.ParameterSpace()
+    if config.get("type") in ("ivf_flat", "ivf_pq"):
+        params.set_index_parameter(index, "nprobe", nprobe or config["nprobe"])
+    elif config.get("type") == "hnsw":
+        params.set_index_parameter(index, "efSearch", ef_search or config["ef_search"])
+
+
+def requested_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """The config as asked for, before it was adapted to the corpus size (to rebuild with)."""
+    return {**config, **config.get("requested", {})}
+
+
+def load_index_config(index_path: str) -> Dict[str, Any]:
+    """Config stored with an index; indexes built before the factory are flat."""
+    path = os.path.join(index_path, INDEX_CONFIG_FILE)
+    if not os.path.exists(path):
+        return default_index_config("flat")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,221 @@
+"""Index Registry - several loaded FAISS indexes behind an LRU, hot-swapped when rebuilt on disk."""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from langchain_community.vectorstores import FAISS
+
+from src.config.settings import (
+    INDEX_REGISTRY_MAX_INDEXES,
+    INDEX_REGISTRY_MEMORY_BUDGET_MB,
+    INDEX_WATCH_INTERVAL_SECONDS,
+    load_vector_store,
+)
+from src.rag.bm25 import BM25_FILE, LEGACY_BM25_FILE
+from src.rag.index_store import INDEX_FILE, LEGACY_DOCSTORE_FILE, index_version
+
+
+def index_footprint(index_path: str) -> int:
+    """
+    Approximate memory charged to a loaded index, in bytes.
+
+    The vector file counts in full (whether read or memory-mapped, its pages
+    end up resident under load); a legacy pickled docstore and a legacy
+    ``bm25.json`` are held in memory too. ``bm25.sqlite`` counts as well, its
+    postings pages are read on every query, while ``docstore.sqlite`` is only
+    read for hits.
+    """
+    return sum(
+        os.path.getsize(os.path.join(index_path, name))
+        for name in (INDEX_FILE, LEGACY_DOCSTORE_FILE, BM25_FILE, LEGACY_BM25_FILE)
+        if os.path.exists(os.path.join(index_path, name))
+    )
+
+
+class _Entry:
+    def __init__(self, vector_store: FAISS, version: str, footprint: int):
+        self.vector_store = vector_store
+        self.version = version
+        self.footprint = footprint
+        self.derived: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+
+class IndexRegistry:
+    """
+    Thread-safe cache of loaded vector stores, keyed by index directory.
+
+    Each index is loaded once under its own lock (other indexes stay
+    available meanwhile). Least recently used indexes are dropped when the
+    count or the memory budget is exceeded. A background watcher polls the
+    on-disk version of every loaded index and swaps in rebuilt ones: the new
+    version is loaded first, then replaces the old entry in one step, so
+    in-flight queries finish on the store they started with.
+    """
+
+    def __init__(
+        self,
+        max_indexes: int = INDEX_REGISTRY_MAX_INDEXES,
+        memory_budget_mb: float = INDEX_REGISTRY_MEMORY_BUDGET_MB,
+        watch_interval: float = INDEX_WATCH_INTERVAL_SECONDS,
+        loader: Callable[[str], FAISS] = load_vector_store,
+    ):
+        self.max_indexes = max_indexes
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.watch_interval = watch_interval
+        self.loader = loader
+        self.counters = {"loads": 0, "reloads": 0, "evictions": 0}
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(index_path: str) -> str:
+        return os.path.abspath(os.path.normpath(index_path))
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _load(self, key: str, version: str) -> _Entry:
+        return _Entry(self.loader(key), version, index_footprint(key))
+
+    def _evict(self) -> None:
+        """Drop least recently used entries over the count or memory budget (keeps the newest)."""
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_indexes
+            or sum(e.footprint for e in self._entries.values()) > self.memory_budget
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+            print(f"Index registry: evicted {key}")
+
+    def _entry(self, index_path: str) -> _Entry:
+        key = self._key(index_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        with self._load_lock(key):
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry
+
+            entry = self._load(key, index_version(key))
+            with self._lock:
+                self._entries[key] = entry
+                self.counters["loads"] += 1
+                self._evict()
+        self._ensure_watcher()
+        return entry
+
+    def get(self, index_path: str) -> FAISS:
+        """
+        Get the vector store of an index directory, loading it on first use.
+
+        Args:
+            index_path: Path to FAISS index directory
+
+        Returns:
+            Loaded FAISS vector store
+        """
+        return self._entry(index_path).vector_store
+
+    def get_derived(self, index_path: str, name: str, build: Callable[[FAISS], Any]) -> Any:
+        """
+        Get an object built from an index (e.g. a QA chain), rebuilt with the index.
+
+        Args:
+            index_path: Path to FAISS index directory
+            name: Name of the derived object
+            build: Builds the object from the vector store
+
+        Returns:
+            The cached object for the current version of the index
+        """
+        entry = self._entry(index_path)
+        with entry.lock:
+            if name not in entry.derived:
+                entry.derived[name] = build(entry.vector_store)
+            return entry.derived[name]
+
+    def refresh(self) -> int:
+        """
+        Reload every loaded index whose on-disk version changed.
+
+        Returns:
+            Number of indexes swapped
+        """
+        with self._lock:
+            loaded = [(key, entry.version) for key, entry in self._entries.items()]
+
+        swapped = 0
+        for key, version in loaded:
+            current = index_version(key)
+            if not current or current == version:
+                continue  # Missing (mid-swap or deleted) or unchanged
+            with self._load_lock(key):
+                try:
+                    entry = self._load(key, current)
+                except Exception as e:
+                    print(f"Index registry: reloading {key} failed, keeping the loaded version: {e}")
+                    continue
+                with self._lock:
+                    if key not in self._entries:
+                        continue  # Evicted meanwhile
+                    self._entries[key] = entry
+                    self.counters["reloads"] += 1
+                    swapped += 1
+                    self._evict()
+            print(f"Index registry: reloaded {key}")
+        return swapped
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Index registry: watcher error: {e}")
+
+    def _ensure_watcher(self) -> None:
+        if self.watch_interval <= 0:
+            return
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+                self._watcher.start()
+
+    def stop(self) -> None:
+        """Stop the background watcher."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded indexes with their version and footprint, plus load counters."""
+        with self._lock:
+            indexes = {
+                key: {"version": entry.version, "footprint_mb": round(entry.footprint / 1024 / 1024, 1)}
+                for key, entry in self._entries.items()
+            }
+        return {**self.counters, "indexes": indexes}
+
+
+_index_registry: Optional[IndexRegistry] = None
+_index_registry_lock = threading.Lock()
+
+
+def get_index_registry() -> IndexRegistry:
+    """Get or create the process-wide index registry (singleton)."""
+    global _index_registry
+    with _index_registry_lock:
+        if _index_registry is None:
+            _index_registry = IndexRegistry()
+        return _index_registry
@@ -0,0 +1,213 @@
+"""On-disk layout helpers for the FAISS index: manifest, docstore, loading and atomic swaps."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from src.rag.bm25 import BM25_FILE, BM25Index
+from src.rag.sqlite_docstore import (
+    DOCSTORE_FILE,
+    ChunkTable,
+    LazyIndexToDocstoreId,
+    SQLiteDocstore,
+    load_docstore_in_memory,
+    write_docstore,
+)
+
+
+INDEX_FILE = "index.faiss"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+MANIFEST_FILE = "manifest.json"
+INDEX_CONFIG_FILE = "index_config.json"
+
+# Vectors stay on disk and are paged in through the OS page cache, shared by every worker.
+# IO_FLAG_MMAP_IFC maps flat/HNSW storage (newer faiss) but cannot be combined with the
+# IVF inverted-list mapping of IO_FLAG_MMAP, so both are tried in turn.
+_READ_ONLY = getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+MMAP_FLAG_CANDIDATES = [
+    flags | _READ_ONLY for flags in (
+        faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0),
+        faiss.IO_FLAG_MMAP,
+    )
+]
+MANIFEST_VERSION = 1
+
+
+def chunk_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """Content hash of a chunk; used as its stable docstore id."""
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest(index_path: str) -> Dict[str, str]:
+    """
+    Load the chunk manifest of an index.
+
+    Args:
+        index_path: Path to FAISS index directory
+
+    Returns:
+        Mapping of chunk content hash to docstore id (empty if no manifest)
+    """
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("chunks", {})
+
+
+def index_version(index_path: str) -> str:
+    """
+    Cheap fingerprint of an index on disk; changes whenever it is rebuilt.
+
+    Args:
+        index_path: Path to FAISS index directory
+
+    Returns:
+        Version string, or "" when the index does not exist
+    """
+    parts = []
+    for name in (INDEX_FILE, MANIFEST_FILE):
+        path = os.path.join(index_path, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest() if parts else ""
+
+
+def save_index_atomic(
+    vector_store: FAISS,
+    index_path: str,
+    manifest: Dict[str, str],
+    index_config: Optional[Dict[str, Any]] = None,
+    bm25: Optional[BM25Index] = None
+) -> None:
+    """
+    Write the index, docstore and manifest to a new versioned directory, then swap it in.
+
+    Chunks go to ``docstore.sqlite`` rather than LangChain's pickle, so serving
+    processes can open the index without reading every chunk into memory.
+
+    ``index_path`` is a symlink to a hidden sibling ``.<name>.v-*`` directory.
+    A save fully writes a new version directory, points a temporary symlink at
+    it and ``os.replace``s that over ``index_path`` (a single atomic rename), so
+    readers always resolve either the complete old index or the complete new
+    one. The previous version directory is deleted afterwards. An index saved
+    as a plain directory is migrated on the first save: it is moved aside just
+    for the rename and restored if the swap fails.
+
+    Args:
+        vector_store: Vector store to persist
+        index_path: Final index directory
+        manifest: Mapping of chunk content hash to docstore id
+        index_config: Optional index factory config, stored as index_config.json
+        bm25: Optional BM25 index over the same chunks, stored as bm25.sqlite
+    """
+    index_path = os.path.normpath(index_path)
+    parent = os.path.dirname(index_path) or "."
+    name = os.path.basename(index_path)
+    os.makedirs(parent, exist_ok=True)
+
+    version_dir = tempfile.mkdtemp(prefix=f".{name}.v-", dir=parent)
+    os.chmod(version_dir, 0o755)
+    try:
+        faiss.write_index(vector_store.index, os.path.join(version_dir, INDEX_FILE))
+        write_docstore(
+            os.path.join(version_dir, DOCSTORE_FILE), vector_store.docstore, vector_store.index_to_docstore_id
+        )
+        with open(os.path.join(version_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "chunks": manifest}, f)
+        if bm25 is not None:
+            bm25.save(os.path.join(version_dir, BM25_FILE))
+        if index_config is not None:
+            with open(os.path.join(version_dir, INDEX_CONFIG_FILE), "w", encoding="utf-8") as f:
+                json.dump(index_config, f, indent=2)
+        link = os.path.join(parent, f".{name}.link-{os.path.basename(version_dir)}")
+        os.symlink(os.path.basename(version_dir), link)
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    previous = os.path.realpath(index_path) if os.path.islink(index_path) else None
+    legacy_dir = None
+    try:
+        if os.path.isdir(index_path) and not os.path.islink(index_path):
+            # A directory cannot be replaced by a symlink in one rename
+            legacy_dir = tempfile.mkdtemp(prefix=f".{name}.old-", dir=parent)
+            os.rmdir(legacy_dir)
+            os.rename(index_path, legacy_dir)
+        os.replace(link, index_path)
+    except Exception:
+        if legacy_dir and not os.path.lexists(index_path):
+            os.rename(legacy_dir, index_path)
+        if os.path.lexists(link):
+            os.remove(link)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    # Only version directories written here are removed, never a user-managed symlink target
+    if previous and os.path.dirname(previous) == os.path.realpath(parent) \
+            and os.path.basename(previous).startswith(f".{name}.v-"):
+        shutil.rmtree(previous, ignore_errors=True)
+    if legacy_dir:
+        shutil.rmtree(legacy_dir, ignore_errors=True)
+
+
+def _read_faiss_index(path: str, mmap: bool) -> faiss.Index:
+    if mmap:
+        error = None
+        for flags in MMAP_FLAG_CANDIDATES:
+            try:
+                return faiss.read_index(path, flags)
+            except RuntimeError as e:
+                error = e
+        print(f"Memory-mapped read of {path} failed, loading it into memory: {error}")
+    return faiss.read_index(path)
+
+
+def load_index(index_path: str, embeddings: Embeddings, writable: bool = False) -> FAISS:
+    """
+    Open a FAISS index directory in whichever format it was saved.
+
+    Read-only opens memory-map the vectors and resolve chunks lazily from
+    ``docstore.sqlite``, so startup time and memory stay flat as the corpus
+    grows. ``writable`` loads everything into memory for tools that add or
+    delete vectors. Indexes saved by ``FAISS.save_local`` (``index.pkl``) are
+    still loaded through LangChain.
+
+    Args:
+        index_path: FAISS index directory
+        embeddings: Embedding model for queries
+        writable: Load a mutable in-memory copy
+
+    Returns:
+        FAISS vector store
+    """
+    docstore_path = os.path.join(index_path, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        if not os.path.exists(os.path.join(index_path, LEGACY_DOCSTORE_FILE)):
+            raise FileNotFoundError(f"FAISS index not found at: {index_path}")
+        return FAISS.load_local(
+            index_path,
+            embeddings=embeddings,
+            allow_dangerous_deserialization=True  # Only for trusted local indexes.
+        )
+
+    index = _read_faiss_index(os.path.join(index_path, INDEX_FILE), mmap=not writable)
+    if writable:
+        docstore, index_to_docstore_id = load_docstore_in_memory(docstore_path)
+    else:
+        table = ChunkTable(docstore_path)
+        docstore, index_to_docstore_id = SQLiteDocstore(table), LazyIndexToDocstoreId(table)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
@@ -1,8 +1,18 @@
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from datetime import datetime
+from pypdf import PdfReader
+from typing import Optional
+import hashlib
 import os
 import json
 
+DEFAULT_PAGES_PER_TASK = 50
+CACHE_DIR_NAME = ".ingest_cache"
+
 def load_and_split_documents(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200):
     """
     Load and split documents from a given file path.
@@ -53,6 +63,228 @@ def read_documents_from_folder(folder_path: str, chunk_size: int = 1000, chunk_o
     return all_chunks
 
 
+def _is_supported(file_path: str) -> bool:
+    return os.path.isfile(file_path) and file_path.lower().endswith(('.pdf', '.txt'))
+
+
+def _page_count(file_path: str) -> int:
+    """Number of pages of a PDF; runs in a worker so the parent never parses PDFs."""
+    return len(PdfReader(file_path).pages)
+
+
+def _plan_file_tasks(file_path: str, pages_per_task: int, total_pages: Optional[int] = None):
+    """Split a file into (file_path, first_page, last_page) parse tasks; TXT files have no pages."""
+    if total_pages is None:
+        return [(file_path, None, None)]
+    return [
+        (file_path, start, min(start + pages_per_task, total_pages))
+        for start in range(0, max(total_pages, 1), pages_per_task)
+    ]
+
+
+def _pdf_metadata(reader: PdfReader, file_path: str) -> dict:
+    """
+    Document-level metadata of a PDF, normalized the way PyPDFLoader normalizes it.
+
+    Info keys lose their leading "/" and are lowercased, values other than
+    str/int are stringified and strings stripped, PDF dates become ISO 8601,
+    and pypdf defaults fill in producer, creator and creationdate.
+
+    Args:
+        reader: Open PdfReader
+        file_path: Path recorded as the "source"
+
+    Returns:
+        Metadata dict shared by every page of the file
+    """
+    raw = (
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": file_path, "total_pages": len(reader.pages)}
+    )
+    metadata = {}
+    for key, value in raw.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = (key[1:] if key.startswith("/") else key).lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                metadata[key] = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                metadata[key] = value
+        elif key in ("page_count", "file_path"):
+            # Other PDF parsers' names, kept alongside the common one
+            metadata["total_pages" if key == "page_count" else "source"] = value
+            metadata[key] = value
+        else:
+            metadata[key] = value.strip() if isinstance(value, str) else value
+    return metadata
+
+
+def _process_task(task, chunk_size: int, chunk_overlap: int):
+    """
+    Parse and split one task in a worker process.
+
+    PDFs are read page by page with pypdf so a large file can be spread over
+    several workers. Page text and metadata are built as PyPDFLoader builds
+    them (document info, source, total_pages, page, page_label), so chunks and
+    their content hashes match ``load_and_split_documents``; chunks never cross
+    page boundaries.
+
+    Returns:
+        List of {"text", "metadata"} dicts
+    """
+    file_path, first_page, last_page = task
+    if first_page is None:
+        chunks = load_and_split_documents(file_path, chunk_size, chunk_overlap)
+    else:
+        reader = PdfReader(file_path)
+        doc_metadata = _pdf_metadata(reader, file_path)
+        pages = [
+            Document(
+                page_content=(reader.pages[i].extract_text(extraction_mode="plain") or "").strip(),
+                metadata=doc_metadata | {"page": i, "page_label": reader.page_labels[i]},
+            )
+            for i in range(first_page, last_page)
+        ]
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len
+        )
+        chunks = text_splitter.split_documents(pages)
+    return [{"text": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks]
+
+
+def _cache_key(file_path: str, chunk_size: int, chunk_overlap: int) -> str:
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{chunk_size}|{chunk_overlap}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def iter_document_chunks(
+    folder_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    max_workers: Optional[int] = None,
+    pages_per_task: int = DEFAULT_PAGES_PER_TASK,
+    cache_dir: Optional[str] = None,
+):
+    """
+    Stream chunks of every PDF/TXT file in a folder, parsing in a process pool.
+
+    Files are yielded in name order and each file's chunks in page order. At most
+    ``2 * max_workers`` tasks are in flight, so memory stays flat regardless of
+    folder size. When ``cache_dir`` is set, each file's chunks are cached under a
+    key of (path, mtime, size, chunking params) and unchanged files are replayed
+    from the cache without being parsed; stale cache entries are pruned.
+
+    Args:
+        folder_path (str): Path to the folder containing document files.
+        chunk_size (int): Size of each text chunk.
+        chunk_overlap (int): Overlap between chunks.
+        max_workers (int): Worker processes (defaults to CPU count).
+        pages_per_task (int): PDF pages parsed per task.
+        cache_dir (str): Optional parse cache directory.
+    Yields:
+        {"text", "metadata"} dicts.
+    """
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    file_paths = [
+        os.path.join(folder_path, name) for name in sorted(os.listdir(folder_path))
+        if _is_supported(os.path.join(folder_path, name))
+    ]
+    cache_files = {
+        file_path: os.path.join(cache_dir, f"{_cache_key(file_path, chunk_size, chunk_overlap)}.jsonl")
+        for file_path in file_paths
+    } if cache_dir else {}
+    used_cache_files = {os.path.basename(path) for path in cache_files.values()}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # PDF page counts are read by the workers, a few files ahead of the one being planned
+        page_counts = {}
+
+        def count_pages_ahead(position: int):
+            for file_path in file_paths[position:position + max_workers]:
+                if file_path.lower().endswith('.pdf') and file_path not in page_counts \
+                        and not os.path.exists(cache_files.get(file_path, "")):
+                    page_counts[file_path] = executor.submit(_page_count, file_path)
+
+        # Queue items: ("cached", path) or ("task", future, cache_tmp_path, is_last_task_of_file)
+        in_flight = deque()
+
+        def drain(limit: int):
+            while len(in_flight) > limit:
+                item = in_flight.popleft()
+                if item[0] == "cached":
+                    with open(item[1], "r", encoding="utf-8") as f:
+                        for line in f:
+                            yield json.loads(line)
+                    continue
+
+                _, future, cache_tmp, cache_final, is_last = item
+                chunks = future.result()
+                if cache_tmp:
+                    with open(cache_tmp, "a", encoding="utf-8") as f:
+                        for chunk in chunks:
+                            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                    if is_last:
+                        os.replace(cache_tmp, cache_final)
+                yield from chunks
+
+        for position, file_path in enumerate(file_paths):
+            count_pages_ahead(position)
+            cache_final = cache_tmp = None
+            if cache_dir:
+                cache_final = cache_files[file_path]
+                if os.path.exists(cache_final):
+                    in_flight.append(("cached", cache_final))
+                    yield from drain(2 * max_workers)
+                    continue
+                cache_tmp = cache_final + ".tmp"
+                if os.path.exists(cache_tmp):
+                    os.remove(cache_tmp)
+
+            total_pages = page_counts.pop(file_path).result() if file_path in page_counts else None
+            tasks = _plan_file_tasks(file_path, pages_per_task, total_pages)
+            for i, task in enumerate(tasks):
+                future = executor.submit(_process_task, task, chunk_size, chunk_overlap)
+                in_flight.append(("task", future, cache_tmp, cache_final, i == len(tasks) - 1))
+                yield from drain(2 * max_workers)
+
+        yield from drain(0)
+
+    if cache_dir:
+        for name in os.listdir(cache_dir):
+            if name not in used_cache_files:
+                os.remove(os.path.join(cache_dir, name))
+
+
+def stream_chunks_to_file(chunks, output_folder: str) -> int:
+    """
+    Write chunks to documents.jsonl as they arrive, without holding them in memory.
+
+    The file is written under a temporary name and renamed into place once complete.
+
+    Args:
+        chunks (iterable): Iterable of {"text", "metadata"} dicts.
+        output_folder (str): Path to the output folder.
+    Returns:
+        Number of chunks written.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = os.path.join(output_folder, "documents.jsonl")
+    count = 0
+    with open(output_path + ".tmp", 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk) + "\n")
+            count += 1
+    os.replace(output_path + ".tmp", output_path)
+    return count
+
+
 def save_chunks_to_files(chunks, output_folder: str):
     """
     Save text chunks to individual text files in the specified output folder, in jsonl format.
@@ -74,6 +306,11 @@ if __name__ == "__main__":
     chunk_size = 1000
     chunk_overlap = 200
 
-    chunks = read_documents_from_folder(input_folder, chunk_size, chunk_overlap)
-    save_chunks_to_files(chunks, output_folder)
-    print(f"Processed {len(chunks)} chunks and saved to {output_folder}")
\ No newline at end of file
+    chunks = iter_document_chunks(
+        input_folder,
+        chunk_size,
+        chunk_overlap,
+        cache_dir=os.path.join(output_folder, CACHE_DIR_NAME),
+    )
+    count = stream_chunks_to_file(chunks, output_folder)
+    print(f"Processed {count} chunks and saved to {output_folder}")
\ No newline at end of file
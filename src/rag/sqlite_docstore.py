@@ -0,0 +1,132 @@
+"""SQLite-backed docstore for FAISS indexes: chunks are read from disk only for the hits."""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Mapping, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+
+def write_docstore(path: str, docstore: Docstore, index_to_docstore_id: Dict[int, str]) -> None:
+    """
+    Write the chunks of a vector store to a new SQLite file.
+
+    Args:
+        path: Destination file (must not exist)
+        docstore: Docstore holding the chunk Documents
+        index_to_docstore_id: FAISS row -> docstore id
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        rows = []
+        for row, doc_id in sorted(index_to_docstore_id.items()):
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Docstore has no chunk for id {doc_id}")
+            rows.append((row, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.execute("CREATE UNIQUE INDEX chunks_id ON chunks (id)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+_READ_ONLY_MESSAGE = "SQLiteDocstore is read-only; update the index with build_index.py --incremental"
+
+
+class ReadOnlyDocstoreError(ValueError):
+    """Raised when a serving (read-only) index is asked to modify its chunks."""
+
+
+class ChunkTable:
+    """
+    Read-only handle on ``docstore.sqlite``, shared by the docstore and the row mapping.
+
+    The file is opened once, when the index is loaded: after a rebuild is
+    swapped in, queries still running on the old index keep reading the old
+    (unlinked) file rather than the new one at the same path.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Docstore not found at: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore looking chunks up by id in ``docstore.sqlite``."""
+
+    def __init__(self, table: ChunkTable):
+        self.table = table
+
+    def search(self, search: str) -> Union[str, Document]:
+        rows = self.table.query("SELECT text, metadata FROM chunks WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        text, metadata = rows[0]
+        return Document(id=search, page_content=text, metadata=json.loads(metadata))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        raise ReadOnlyDocstoreError(_READ_ONLY_MESSAGE)
+
+    def delete(self, ids: List) -> None:
+        raise ReadOnlyDocstoreError(_READ_ONLY_MESSAGE)
+
+
+class LazyIndexToDocstoreId(Mapping):
+    """FAISS row -> docstore id mapping resolved from ``docstore.sqlite`` on access."""
+
+    def __init__(self, table: ChunkTable):
+        self.table = table
+
+    def __getitem__(self, row: int) -> str:
+        rows = self.table.query("SELECT id FROM chunks WHERE row = ?", (int(row),))
+        if not rows:
+            raise KeyError(row)
+        return rows[0][0]
+
+    def __iter__(self) -> Iterator[int]:
+        return (row for (row,) in self.table.query("SELECT row FROM chunks ORDER BY row"))
+
+    def __len__(self) -> int:
+        return self.table.query("SELECT COUNT(*) FROM chunks")[0][0]
+
+    def rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        """Reverse lookup: docstore id -> FAISS row, for the ids present."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        return dict(self.table.query(f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", tuple(ids)))
+
+
+def load_docstore_in_memory(path: str):
+    """
+    Read every chunk into an InMemoryDocstore, for tools that modify the index.
+
+    Returns:
+        (InMemoryDocstore, index_to_docstore_id dict)
+    """
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        docs, mapping = {}, {}
+        for row, doc_id, text, metadata in conn.execute("SELECT row, id, text, metadata FROM chunks"):
+            docs[doc_id] = Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            mapping[row] = doc_id
+    finally:
+        conn.close()
+    return InMemoryDocstore(docs), mapping
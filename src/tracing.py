@@ -0,0 +1,341 @@
+"""Tracing - request-scoped trace ids, per-stage timers and Prometheus metrics."""
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config.settings import TRACE_MAX_SPANS, TRACING_ENABLED
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set, in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in sorted(values.items())]
+        return lines
+
+
+class Gauge:
+    """Current value per label set, in the Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in the Prometheus text format."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+                    break
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {key: list(series) for key, series in self._values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(values.items()):
+            labels = _format_labels(self.labelnames, key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")
+            bucket_labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {series[-1]:g}")
+            lines.append(f"{self.name}_sum{labels} {series[-2]:g}")
+            lines.append(f"{self.name}_count{labels} {series[-1]:g}")
+        return lines
+
+
+_registry: List[Any] = []
+
+STAGE_SECONDS = Histogram(
+    "copilot_stage_duration_seconds", "Duration of each pipeline stage.", ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "copilot_stage_errors_total", "Pipeline stages that raised.", ["stage"]
+)
+LLM_TOKENS = Counter(
+    "copilot_llm_tokens_total", "Tokens sent to and generated by the LLM.", ["model", "kind"]
+)
+ABANDONED_BRANCHES = Gauge(
+    "copilot_abandoned_branches", "Timed-out hybrid branches still occupying a worker thread.", ["branch"]
+)
+HTTP_SECONDS = Histogram(
+    "copilot_http_request_duration_seconds", "HTTP request latency (until the response headers).",
+    ["method", "path", "status"]
+)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans recorded while serving one request (the first ``TRACE_MAX_SPANS``)."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start: float, seconds: float, error: bool) -> None:
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append({
+                    "stage": stage,
+                    "offset_seconds": round(start - self.started, 4),
+                    "seconds": round(seconds, 4),
+                    **({"error": True} if error else {}),
+                })
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Seconds spent per stage (stages running concurrently each count in full)."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span_ in self.spans:
+                totals[span_["stage"]] = round(totals.get(span_["stage"], 0.0) + span_["seconds"], 4)
+        return totals
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("copilot_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Make a trace current for the enclosed code (and the tasks and threads given its context).
+
+    An already current trace is reused when no ``trace_id`` is given, so
+    nested entry points (the API, then the hybrid agent) share one trace.
+
+    Args:
+        trace_id: Id to use, e.g. from an incoming X-Trace-Id header
+
+    Yields:
+        The current trace
+    """
+    trace = _current_trace.get()
+    if trace is not None and trace_id is None:
+        yield trace
+        return
+    trace = Trace(trace_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record(stage: str, seconds: float, error: bool = False, start: Optional[float] = None) -> None:
+    """Record a finished stage in the metrics and the current trace."""
+    if not TRACING_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, start if start is not None else time.perf_counter() - seconds, seconds, error)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one stage; exceptions are counted and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record(stage, time.perf_counter() - start, error=True, start=start)
+        raise
+    record(stage, time.perf_counter() - start, start=start)
+
+
+def _token_usage(response) -> Tuple[int, int]:
+    """(prompt, completion) tokens of an LLMResult, from the messages' usage metadata or the provider output."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not prompt and not completion:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt or 0, completion or 0
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records LLM calls, agent tool calls and retriever runs as stages.
+
+    Stages are ``llm``, ``tool:<name>`` (e.g. ``tool:sql_db_query``) and
+    ``retrieval``; LLM token counts go to ``copilot_llm_tokens_total``. One
+    shared instance is attached to the LLM (``settings.get_llm``) and passed
+    in the agents' run configs; LangChain skips a handler it already has, and
+    runs are keyed by id, so nothing is counted twice.
+    """
+
+    run_inline = True  # Cheap: keep it on the caller's thread and context
+
+    def __init__(self):
+        self._starts: Dict[Any, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, stage: str) -> None:
+        with self._lock:
+            self._starts.setdefault(run_id, (stage, time.perf_counter()))
+
+    def _end(self, run_id, error: bool = False) -> None:
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+        if started is not None:
+            stage, start = started
+            record(stage, time.perf_counter() - start, error=error, start=start)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        with self._lock:
+            counted = run_id in self._starts
+        self._end(run_id)
+        if counted and TRACING_ENABLED:
+            model = (response.llm_output or {}).get("model_name") or "unknown"
+            prompt, completion = _token_usage(response)
+            if prompt:
+                LLM_TOKENS.inc(prompt, model=model, kind="prompt")
+            if completion:
+                LLM_TOKENS.inc(completion, model=model, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._start(run_id, f"tool:{(serialized or {}).get('name', 'unknown')}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs) -> None:
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=True)
+
+
+_tracing_handler: Optional[TracingCallbackHandler] = None
+_tracing_handler_lock = threading.Lock()
+
+
+def get_tracing_handler() -> TracingCallbackHandler:
+    """Get or create the shared LangChain callback handler (singleton)."""
+    global _tracing_handler
+    with _tracing_handler_lock:
+        if _tracing_handler is None:
+            _tracing_handler = TracingCallbackHandler()
+        return _tracing_handler
+
+
+def tracing_callbacks() -> List[BaseCallbackHandler]:
+    """Callbacks to add to a run config: the tracing handler, unless tracing is off."""
+    return [get_tracing_handler()] if TRACING_ENABLED else []
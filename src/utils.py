@@ -1,73 +1,130 @@
 from pathlib import Path
 import os
+import re
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 import sys
 
 
 DEFAULT_LOG_DIR = "logs"
 DEFAULT_LOG_FILE = "agent_executions.jsonl"
+DEFAULT_TOKEN_ENCODING = "cl100k_base"
 
+_token_encoder = None
+_token_encoder_loaded = False
 
 
 def load_prompt(prompt_name: str) -> str:
     prompt_path = Path(__file__).parent / "prompts" / f"{prompt_name}.txt"
     with open(prompt_path, "r", encoding="utf-8") as f:
         return f.read()
-    
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question for cache and de-duplication keys."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens the way the OpenAI models do.
+
+    Falls back to a ~4 characters per token estimate when the tiktoken
+    encoding cannot be loaded (e.g. offline machines without a cached BPE file).
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens
+    """
+    global _token_encoder, _token_encoder_loaded
+    if not _token_encoder_loaded:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding(DEFAULT_TOKEN_ENCODING)
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating token counts: {e}", file=sys.stderr)
+            _token_encoder = None
+        _token_encoder_loaded = True
+
+    if _token_encoder is None:
+        return max(1, len(text) // 4)
+    return len(_token_encoder.encode(text, disallowed_special=()))
+
 
 def log_agent_execution(log_entry: dict, log_file: str, log_type: str = "generic"):
     """
     Append a log entry to a JSONL file in a safe, consistent way.
+
+    The line is handed to the background log writer (see ``src.log_writer``),
+    which batches, rotates and locks the file off the request path.
     
     Args:
         log_entry: Dictionary containing log data
         log_file: Path to log file. If None, uses default path.
         log_type: Type of log for organizing files (e.g., 'sql', 'rag', 'hybrid')
     """
+    from src.log_writer import write_line
+    from src.tracing import current_trace_id
+
     if log_file is None:
         log_file = os.path.join(DEFAULT_LOG_DIR, log_type, DEFAULT_LOG_FILE)
 
-    log_dir = os.path.dirname(log_file)
-    if log_dir:
-        os.makedirs(log_dir, exist_ok=True)
-
     if "timestamp" not in log_entry:
         from datetime import datetime
         log_entry["timestamp"] = datetime.now().isoformat()
+    if "trace_id" not in log_entry and current_trace_id():
+        log_entry["trace_id"] = current_trace_id()
 
     try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        # Serialized now: the caller may keep mutating the entry
+        write_line(log_file, json.dumps(log_entry, ensure_ascii=False) + "\n")
     except Exception as e:
         print(f"Failed to write log to {log_file}: {e}", file=sys.stderr)
         print(f"Log entry: {json.dumps(log_entry, ensure_ascii=False)}", file=sys.stderr)
 
 
-def read_logs(log_file: str) -> list:
+def iter_logs(log_file: str) -> Iterator[dict]:
     """
-    Read all log entries from a JSONL file.
-    
+    Stream the entries of a JSONL file, one at a time.
+
+    Unparsable lines are skipped. Use ``src.log_analytics`` for time-range
+    queries and statistics over large logs.
+
     Args:
         log_file: Path to the log file
-        
-    Returns:
-        List of log entry dictionaries
+
+    Yields:
+        Log entry dictionaries
     """
+    from src.log_writer import flush_logs
+
+    flush_logs()  # Include entries this process has queued but not written yet
     if not os.path.exists(log_file):
-        return []
-    
-    logs = []
+        return
+
     try:
         with open(log_file, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 try:
-                    logs.append(json.loads(line))
+                    yield json.loads(line)
                 except json.JSONDecodeError:
                     continue
     except Exception as e:
         print(f"Failed to read logs from {log_file}: {e}", file=sys.stderr)
+
+
+def read_logs(log_file: str) -> list:
+    """
+    Read all log entries from a JSONL file.
     
-    return logs 
-    
\ No newline at end of file
+    Args:
+        log_file: Path to the log file
+        
+    Returns:
+        List of log entry dictionaries
+    """
+    return list(iter_logs(log_file))
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.cache.answer_cache import AnswerCache
+
+
+def test_answer_cache_exact_and_semantic_hits():
+    cache = AnswerCache(path=":memory:", similarity_threshold=0.95)
+    cache.put("What is the refund policy?", {"answer": "30 days", "route": "rag"},
+              index_version="v1", embedding=[1.0, 0.0, 0.0])
+
+    exact = cache.get("  what is the REFUND policy ", index_version="v1")
+    assert exact["answer"] == "30 days"
+    assert exact["cache"]["tier"] == "exact"
+
+    similar = cache.get("Tell me the refund policy", index_version="v1", embed_fn=lambda: [0.99, 0.05, 0.0])
+    assert similar["cache"]["tier"] == "semantic"
+
+    assert cache.get("Who is our top customer?", index_version="v1", embed_fn=lambda: [0.0, 1.0, 0.0]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_answer_cache_invalidates_rag_route_on_index_rebuild():
+    cache = AnswerCache(path=":memory:")
+    cache.put("What is the refund policy?", {"answer": "30 days", "route": "rag"}, index_version="v1")
+    assert cache.get("What is the refund policy?", index_version="v2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_cache_skips_a_stale_closest_match():
+    cache = AnswerCache(path=":memory:", similarity_threshold=0.9)
+    cache.put("What is the refund policy?", {"answer": "old index", "route": "rag"},
+              index_version="v1", embedding=[1.0, 0.0, 0.0])
+    cache.put("How many refunds did we issue?", {"answer": "42", "route": "sql"},
+              index_version="v1", embedding=[0.95, 0.3, 0.0])
+
+    # The closest entry was answered against the previous index; the next valid one is served
+    similar = cache.get("Refund policy?", index_version="v2", embed_fn=lambda: [0.99, 0.1, 0.0])
+    assert similar["answer"] == "42"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_answer_cache_is_scoped_to_the_index():
+    cache = AnswerCache(path=":memory:", similarity_threshold=0.9)
+    cache.put("What is the refund policy?", {"answer": "HR handbook", "route": "rag"},
+              index_version="v1", embedding=[1.0, 0.0], index_path="hr_index")
+
+    assert cache.get("What is the refund policy?", index_version="v1", index_path="./hr_index")["answer"] == "HR handbook"
+    # Another index with the same version string: neither tier crosses over
+    assert cache.get("What is the refund policy?", index_version="v1", embed_fn=lambda: [1.0, 0.0],
+                     index_path="legal_index") is None
+
+    cache.put("What is the refund policy?", {"answer": "Legal terms", "route": "rag"},
+              index_version="v1", index_path="legal_index")
+    assert cache.get("What is the refund policy?", index_version="v1", index_path="hr_index")["answer"] == "HR handbook"
+    assert cache.stats()["entries"] == 2
+
+
+def test_answer_cache_drops_entries_keyed_without_the_index(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "answers.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE answers (key TEXT PRIMARY KEY, question TEXT NOT NULL, route TEXT NOT NULL, "
+                 "index_version TEXT NOT NULL, result TEXT NOT NULL, embedding BLOB, created_at REAL NOT NULL, "
+                 "last_access REAL NOT NULL)")
+    conn.execute("INSERT INTO answers VALUES ('k', 'q', 'rag', 'v1', '{}', NULL, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = AnswerCache(path=path)
+    assert cache.stats()["entries"] == 0
+    cache.put("What is the refund policy?", {"answer": "30 days", "route": "rag"}, index_version="v1", index_path="idx")
+    assert cache.get("What is the refund policy?", index_version="v1", index_path="idx")["answer"] == "30 days"
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from langchain_core.embeddings import Embeddings
+from src.rag.batch_embed import BatchEmbedder, make_batches
+
+
+class FlakyEmbeddings(Embeddings):
+    """Returns the text length as a 1-d vector; fails after `fail_after` requests."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("endpoint down")
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_make_batches_respects_token_and_size_limits():
+    batches = make_batches([5, 5, 5, 20, 1, 1], max_batch_tokens=10, max_batch_size=2)
+    assert batches == [[0, 1], [2], [3], [4, 5]]
+
+
+def test_batch_embedder_resumes_from_checkpoint(tmp_path):
+    texts = [f"text {'x' * i}" for i in range(10)]
+    checkpoint = str(tmp_path / "embed.checkpoint.jsonl")
+
+    failing = BatchEmbedder(FlakyEmbeddings(fail_after=2), max_batch_size=2, max_concurrency=1,
+                            max_retries=0, checkpoint_path=checkpoint, show_progress=False)
+    with pytest.raises(RuntimeError):
+        failing.embed(texts)
+
+    backend = FlakyEmbeddings()
+    embedder = BatchEmbedder(backend, max_batch_size=2, max_concurrency=2,
+                             checkpoint_path=checkpoint, show_progress=False)
+    vectors = embedder.embed(texts)
+
+    assert vectors == [[float(len(t))] for t in texts]
+    assert backend.calls == 3  # The first two batches came from the checkpoint
+
+
+def test_checkpoint_matches_texts_by_hash_after_reordering(tmp_path):
+    texts = [f"text {'x' * i}" for i in range(6)]
+    checkpoint = str(tmp_path / "embed.checkpoint.jsonl")
+    BatchEmbedder(FlakyEmbeddings(), max_batch_size=2, checkpoint_path=checkpoint, show_progress=False).embed(texts)
+
+    # New chunks inserted ahead and the rest reordered: only the new ones are sent
+    changed = ["new text", "another new text"] + texts[::-1]
+    backend = FlakyEmbeddings()
+    embedder = BatchEmbedder(backend, max_batch_size=2, max_concurrency=1,
+                             checkpoint_path=checkpoint, show_progress=False)
+    assert embedder.embed(changed) == [[float(len(t))] for t in changed]
+    assert backend.calls == 1
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import subprocess
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.fixtures import scripted_reply
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_fakes_are_deterministic_and_report_usage():
+    llm = FakeChatModel(respond=scripted_reply, latency=0.01)
+    with open(os.path.join(ROOT, "src", "prompts", "classify_query.txt"), encoding="utf-8") as f:
+        prompt = f.read().format(query="What is the refund policy?")
+    reply = llm.invoke(prompt)
+    assert reply.content == "rag"
+    assert reply.usage_metadata["output_tokens"] == 1
+
+    answer = llm.invoke("Summarize the documents")
+    assert "".join(chunk.content for chunk in llm.stream("Summarize the documents")) == answer.content
+    assert llm.calls == 3
+
+    embeddings = FakeEmbeddings(dimensions=64, request_latency=0, per_text_latency=0)
+    refund, refund_again, payroll = embeddings.embed_documents(["refund policy", "refund policy", "payroll run"])
+    assert refund == refund_again
+    similar = sum(a * b for a, b in zip(refund, embeddings.embed_query("the refund policy")))
+    unrelated = sum(a * b for a, b in zip(refund, payroll))
+    assert similar > unrelated
+
+
+def test_end_to_end_benchmark_runs_offline(tmp_path):
+    command = [
+        sys.executable, "-m", "benchmarks.bench_e2e",
+        "--requests", "4", "--concurrency", "1", "2",
+        "--llm_latency", "0.01", "--embedding_latency", "0",
+        "--chunks", "100", "--customers", "100", "--transactions", "1000",
+        "--workdir", str(tmp_path / "work"), "--baseline", str(tmp_path / "baseline.json"),
+    ]
+    env = {**os.environ, "DATABASE_URL": "postgresql://must-not-be-used/"}
+    saved = subprocess.run(command + ["--save_baseline"], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert saved.returncode == 0, saved.stdout + saved.stderr
+
+    with open(tmp_path / "baseline.json", encoding="utf-8") as f:
+        results = json.load(f)["results"]
+    assert set(results) == {"classify", "sql", "rag", "hybrid"}
+    assert all(metrics["errors"] == 0 for levels in results.values() for metrics in levels.values())
+
+    compared = subprocess.run(command + ["--tolerance", "100"], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert compared.returncode == 0, compared.stdout + compared.stderr
+    assert "No regressions" in compared.stdout
@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+from src.rag.bm25 import BM25_FILE, LEGACY_BM25_FILE, BM25Index, SQLiteBM25Index, load_bm25_index, tokenize
+from src.rag.fusion_retriever import reciprocal_rank_fusion
+
+
+def test_bm25_matches_exact_codes(tmp_path):
+    assert tokenize("Policy POL-2024-07!") == ["policy", "pol-2024-07", "pol", "2024", "07"]
+
+    index = BM25Index.build(
+        ["a", "b", "c"],
+        ["Refund policy POL-2024-07 allows returns within 30 days.",
+         "Travel policy POL-2023-01 covers flights.",
+         "Our quarterly revenue grew."],
+    )
+    path = str(tmp_path / BM25_FILE)
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    results = loaded.search("what does POL-2024-07 say?", k=3)
+    assert results[0][0] == "a"
+    assert "c" not in [doc_id for doc_id, _ in results]
+    assert loaded.search("nothing matches", k=3) == []
+    assert loaded.search("policy travel", k=3) == index.search("policy travel", k=3)
+
+
+def test_bm25_postings_are_read_per_query_term(tmp_path):
+    from src.rag.index_registry import index_footprint
+
+    index = BM25Index.build(["a", "b"], ["Refunds take 30 days.", "Travel needs approval."])
+    index.save(str(tmp_path / BM25_FILE))
+    loaded = load_bm25_index(str(tmp_path))
+    assert isinstance(loaded, SQLiteBM25Index)
+    assert not hasattr(loaded, "postings") and not hasattr(loaded, "doc_ids")
+
+    looked_up = []
+    original = loaded._lookup
+    loaded._lookup = lambda terms: looked_up.append(sorted(terms)) or original(terms)
+    assert {doc_id for doc_id, _ in loaded.search("travel refunds", k=2)} == {"a", "b"}
+    assert looked_up == [["refunds", "travel"]]
+    assert index_footprint(str(tmp_path)) == os.path.getsize(tmp_path / BM25_FILE)
+
+
+def test_legacy_bm25_json_still_loads(tmp_path):
+    with open(tmp_path / LEGACY_BM25_FILE, "w", encoding="utf-8") as f:
+        json.dump({"k1": 1.5, "b": 0.75, "doc_ids": ["a", "b"], "doc_lengths": [3, 2],
+                   "postings": {"refunds": [[0], [1]], "travel": [[1], [1]]}}, f)
+
+    assert [doc_id for doc_id, _ in load_bm25_index(str(tmp_path)).search("travel", k=2)] == ["b"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]], rrf_k=60)
+    assert [key for key, _ in fused] == ["y", "x", "w", "z"]
@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.db.connection import _create_engine, _session_options
+
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'app.db'}"
+    with _create_engine(uri, read_only=False).begin() as conn:
+        conn.execute(text("CREATE TABLE orders (id INTEGER)"))
+
+    with _create_engine(uri, read_only=True).connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM orders")).scalar() == 0
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO orders VALUES (1)"))
+
+    assert "default_transaction_read_only=on" in _session_options(read_only=True)
+    assert "default_transaction_read_only" not in _session_options(read_only=False)
@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from langchain_core.documents import Document
+
+from src.rag.context_packing import mmr_order, pack_documents
+
+
+def test_mmr_prefers_diverse_candidates():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
+    relevance = [1.0, 0.95, 0.6]
+
+    assert mmr_order(relevance, vectors, lambda_mult=1.0) == [0, 1, 2]
+    assert mmr_order(relevance, vectors, lambda_mult=0.5) == [0, 2, 1]
+    assert mmr_order(relevance, vectors, lambda_mult=0.5, limit=2) == [0, 2]
+
+
+def test_pack_documents_respects_budget_and_skips_duplicates():
+    docs = [
+        Document(page_content="a" * 400),
+        Document(page_content="a" * 400 + "!"),
+        Document(page_content="b" * 400),
+        Document(page_content="c" * 40),
+    ]
+    vectors = np.array([[1.0, 0.0, 0.0], [1.0, 0.001, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+
+    packed = pack_documents(docs, vectors, token_budget=150, max_docs=3, dedup_similarity=0.95)
+    # Near-duplicate dropped, "b" does not fit next to "a", the short chunk does
+    assert [doc.page_content[0] for doc in packed] == ["a", "c"]
+
+    # The first chunk is kept even when it alone exceeds the budget
+    assert len(pack_documents(docs[:1], vectors[:1], token_budget=10, max_docs=3)) == 1
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import create_engine, text
+
+from src.db import cost_guard
+from src.db.copilot_database import CopilotSQLDatabase
+from src.db.cost_guard import inject_limit, plan_violation
+
+CARTESIAN_PLAN = {
+    "Node Type": "Nested Loop", "Total Cost": 5.0e7, "Plan Rows": 2.0e10,
+    "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "transactions", "Total Cost": 2.0e5, "Plan Rows": 2.0e5},
+        {"Node Type": "Seq Scan", "Relation Name": "customers", "Total Cost": 1.0e3, "Plan Rows": 1.0e5},
+    ],
+}
+
+
+def test_inject_limit_and_plan_limits():
+    assert inject_limit("SELECT * FROM transactions -- all", 100) == "SELECT * FROM transactions -- all\nLIMIT 100"
+    assert inject_limit("SELECT * FROM t WHERE note = 'limit 1' LIMIT 5000", 100) == "SELECT * FROM t WHERE note = 'limit 1' LIMIT 100"
+    assert inject_limit("SELECT * FROM (SELECT * FROM t LIMIT 3) s LIMIT 10;", 100) == "SELECT * FROM (SELECT * FROM t LIMIT 3) s LIMIT 10"
+
+    reason = plan_violation(CARTESIAN_PLAN, max_cost=1e6, max_rows=1e7)
+    assert "estimated cost" in reason and "rows exceed" in reason and "Seq Scan on transactions" in reason
+    assert plan_violation({"Node Type": "Index Scan", "Total Cost": 12.0, "Plan Rows": 3}, 1e6, 1e7) is None
+
+
+def test_rejection_is_returned_to_the_agent(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE transactions (id INTEGER, amount REAL)"))
+    db = CopilotSQLDatabase(engine)
+
+    monkeypatch.setattr(cost_guard, "explain", lambda conn, sql: CARTESIAN_PLAN)
+    observation = db.run_no_throw("SELECT * FROM transactions t1, transactions t2")
+    assert observation.startswith("Error: Query rejected by the cost guard")
+
+    monkeypatch.setattr(cost_guard, "explain", lambda conn, sql: None)
+    assert db.run_no_throw("SELECT COUNT(*) FROM transactions") == "[(0,)]"
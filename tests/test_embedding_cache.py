@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.embeddings import Embeddings
+from src.cache.embedding_cache import CachedEmbeddings
+from src.rag.batch_embed import BatchEmbedder
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds a text as [length, number of spaces]; counts embedded texts."""
+
+    def __init__(self):
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return [[float(len(t)), float(t.count(" "))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_cached_embeddings_survive_restart(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, "test-model", cache_dir=str(tmp_path))
+    assert cache.embed_documents(["a b", "ccc", "a b"]) == [[3.0, 1.0], [3.0, 0.0], [3.0, 1.0]]
+    assert cache.embed_query("hello world") == [11.0, 1.0]
+    assert cache.embed_query("hello world") == [11.0, 1.0]
+    assert model.texts == 3
+
+    # A new process (fresh LRU) reads the vectors back from disk
+    restarted = CachedEmbeddings(model, "test-model", cache_dir=str(tmp_path), max_memory_entries=1)
+    assert restarted.embed_documents(["ccc", "a b", "new one"]) == [[3.0, 0.0], [3.0, 1.0], [7.0, 1.0]]
+    assert model.texts == 4
+    assert restarted.stats()["disk_hits"] == 2
+
+    # Another model never reuses these vectors
+    CachedEmbeddings(model, "other-model", cache_dir=str(tmp_path)).embed_documents(["ccc"])
+    assert model.texts == 5
+
+
+def test_batch_embedder_skips_cached_texts(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, "test-model", cache_dir=str(tmp_path))
+    cache.embed_documents(["one", "two"])
+
+    vectors = BatchEmbedder(cache, show_progress=False).embed(["one", "two", "three"])
+    assert vectors == [[3.0, 0.0], [3.0, 0.0], [5.0, 0.0]]
+    assert model.texts == 3
+
+
+def test_store_compacts_to_the_recently_used_vectors(tmp_path):
+    import time
+    import numpy as np
+    from src.cache.embedding_cache import EmbeddingStore
+
+    store = EmbeddingStore(str(tmp_path), max_entries=10)
+    reader = EmbeddingStore(str(tmp_path))  # Another worker, mapping the same files
+    store.put_many({f"k{i}": np.full(4, i, dtype=np.float32) for i in range(10)})
+    assert set(reader.get_many(["k0", "k9"])) == {"k0", "k9"}
+    time.sleep(0.01)
+    store.get_many(["k0", "k1", "k2"])
+    time.sleep(0.01)
+
+    store.put_many({"k10": np.full(4, 10, dtype=np.float32), "k11": np.full(4, 11, dtype=np.float32)})
+    assert len(store) == 9
+    assert not os.path.exists(tmp_path / "vectors.f32")
+    kept = store.get_many([f"k{i}" for i in range(12)])
+    assert {"k0", "k1", "k2", "k10", "k11"} <= set(kept)
+    assert all((vector == int(key[1:])).all() for key, vector in kept.items())
+
+    # The other worker's old mapping is replaced, not read with the new row numbers
+    assert {key: vector[0] for key, vector in reader.get_many(["k1", "k11"]).items()} == {"k1": 1.0, "k11": 11.0}
+
+
+def test_async_embeddings_use_the_cache_off_the_event_loop(tmp_path):
+    import asyncio
+    import threading
+
+    class AsyncCounting(CountingEmbeddings):
+        async def aembed_documents(self, texts):
+            return self.embed_documents(texts)
+
+        async def aembed_query(self, text):
+            return self.embed_query(text)
+
+    model = AsyncCounting()
+    cache = CachedEmbeddings(model, "test-model", cache_dir=str(tmp_path))
+    on_loop = []
+    get_many, put_many = cache.store.get_many, cache.store.put_many
+    cache.store.get_many = lambda keys: on_loop.append(threading.current_thread() is threading.main_thread()) or get_many(keys)
+    cache.store.put_many = lambda items: on_loop.append(threading.current_thread() is threading.main_thread()) or put_many(items)
+
+    assert asyncio.run(cache.aembed_documents(["a b", "ccc"])) == [[3.0, 1.0], [3.0, 0.0]]
+    assert asyncio.run(cache.aembed_query("hello world")) == [11.0, 1.0]
+    assert CachedEmbeddings(model, "test-model", cache_dir=str(tmp_path)).embed_query("hello world") == [11.0, 1.0]
+    assert model.texts == 3
+    assert on_loop and not any(on_loop)
@@ -10,3 +10,289 @@ def test_hybrid_agent_executor_returns_response():
     assert "answer" in result
     assert isinstance(result["answer"], str)
 
+
+
+def _stub_agents(monkeypatch, route, order, sql_error=False, rag_error=False):
+    import asyncio
+    from langchain_core.language_models import FakeListChatModel
+    from src.agents import hybrid_agent
+
+    sources = [{"content": "Refunds within 30 days.", "metadata": {"source": "policy.md"}}]
+
+    async def aroute_query(query, query_embedding=None):
+        return {"route": route, "source": "llm", "confidence": None}
+
+    async def aexecute_sql_query(query, log_file=None):
+        await asyncio.sleep(0.2)
+        order.append("sql finished")
+        if sql_error:
+            return {"answer": "Error: database down", "error": "database down"}
+        return {"answer": "42 refunds"}
+
+    async def aexecute_rag_query(query, index_path, log_file=None):
+        if rag_error:
+            return {"answer": "Error: index missing", "error": "index missing"}
+        return {"answer": "Refunds within 30 days.", "source_documents": sources}
+
+    async def astream_rag_query(query, index_path, log_file=None):
+        yield {"event": "sources", "data": sources}
+        yield {"event": "token", "data": "Refunds within 30 days."}
+        yield {"event": "done", "data": {"answer": "Refunds within 30 days.", "source_documents": sources}}
+
+    monkeypatch.setattr(hybrid_agent, "aroute_query", aroute_query)
+    monkeypatch.setattr(hybrid_agent, "aexecute_sql_query", aexecute_sql_query)
+    monkeypatch.setattr(hybrid_agent, "aexecute_rag_query", aexecute_rag_query)
+    monkeypatch.setattr(hybrid_agent, "astream_rag_query", astream_rag_query)
+    monkeypatch.setattr(hybrid_agent, "get_llm", lambda temperature=0: FakeListChatModel(responses=["42 refunds, within 30 days."]))
+
+
+def _stream_events(tmp_path, **kwargs):
+    import asyncio
+    from src.agents.hybrid_agent import astream_hybrid_query
+
+    async def collect():
+        return [event async for event in astream_hybrid_query(
+            "How many refunds and what is the policy?", log_file=str(tmp_path / "hybrid.jsonl"),
+            index_path=str(tmp_path / "index"), **kwargs)]
+
+    return asyncio.run(collect())
+
+
+def _event_names(events):
+    names = [event["event"] for event in events]
+    # Consecutive tokens collapse to one, the stream's granularity is the model's
+    return [name for i, name in enumerate(names) if name != "token" or names[i - 1] != "token"]
+
+
+def test_stream_sends_hybrid_sources_before_the_sql_branch_finishes(tmp_path, monkeypatch):
+    order = []
+    _stub_agents(monkeypatch, "hybrid", order)
+    from src.agents import hybrid_agent
+
+    original = hybrid_agent.astream_hybrid_query
+
+    async def tracked(*args, **kwargs):
+        async for event in original(*args, **kwargs):
+            order.append(event["event"])
+            yield event
+
+    monkeypatch.setattr(hybrid_agent, "astream_hybrid_query", tracked)
+    events = _stream_events(tmp_path, use_cache=False)
+
+    assert order.index("sources") < order.index("sql finished") < order.index("token")
+    assert _event_names(events) == ["route", "sources", "token", "done"]
+    done = events[-1]["data"]
+    assert done["answer"] == "42 refunds, within 30 days."
+    assert done["branches"] == {"sql": "ok", "rag": "ok"}
+
+
+def test_stream_event_order_per_route(tmp_path, monkeypatch):
+    expected = {
+        "sql": ["route", "token", "done"],
+        "rag": ["route", "sources", "token", "done"],
+    }
+    for route, names in expected.items():
+        _stub_agents(monkeypatch, route, [])
+        events = _stream_events(tmp_path, use_cache=False)
+        assert _event_names(events) == names
+        assert events[-1]["data"]["route"] == route
+
+    _stub_agents(monkeypatch, "sql", [], sql_error=True)
+    assert _event_names(_stream_events(tmp_path, use_cache=False)) == ["route", "error", "token", "done"]
+
+
+def test_stream_sends_the_error_as_answer_text_when_both_branches_fail(tmp_path, monkeypatch):
+    _stub_agents(monkeypatch, "hybrid", [], sql_error=True, rag_error=True)
+    events = _stream_events(tmp_path, use_cache=False)
+
+    assert _event_names(events) == ["route", "error", "token", "done"]
+    # Clients that only render tokens (the Streamlit page) still show the failure
+    answer = "Error: database down\nError: index missing"
+    assert events[1]["data"] == events[2]["data"] == events[-1]["data"]["answer"] == answer
+
+
+def test_stream_replays_a_cached_answer(tmp_path, monkeypatch):
+    from src.agents import hybrid_agent
+
+    cached = {"answer": "Cached.", "route": "rag", "routing": {"route": "rag"}, "cache": {"hit": True, "tier": "exact"},
+              "rag_result": {"answer": "Cached.", "source_documents": [{"content": "x", "metadata": {}}]}}
+
+    class StubCache:
+        async def aget(self, query, index_version, aembed_fn=None, index_path=""):
+            return cached
+
+    monkeypatch.setattr(hybrid_agent, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(hybrid_agent, "get_answer_cache", lambda: StubCache())
+    events = _stream_events(tmp_path)
+    assert [event["event"] for event in events] == ["route", "sources", "token", "done"]
+    assert events[-1]["data"] is cached
+
+
+class _SynthesisLLM:
+    """Records the synthesis prompt instead of calling a model."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        from langchain_core.messages import AIMessage
+        self.prompts.append(messages[-1].content)
+        return AIMessage(content="synthesized")
+
+
+def _stub_sync_agents(monkeypatch, sql, rag):
+    from src.agents import hybrid_agent
+
+    llm = _SynthesisLLM()
+    monkeypatch.setattr(hybrid_agent, "route_query", lambda query, query_embedding=None:
+                        {"route": "hybrid", "source": "llm", "confidence": None})
+    monkeypatch.setattr(hybrid_agent, "execute_sql_query", lambda query, log_file=None: sql())
+    monkeypatch.setattr(hybrid_agent, "execute_rag_query", lambda query, index_path, log_file=None: rag())
+    monkeypatch.setattr(hybrid_agent, "get_llm", lambda temperature=0: llm)
+    return llm
+
+
+def _wait_for_abandoned_branches():
+    import time
+    from src.agents.hybrid_agent import abandoned_branches
+
+    deadline = time.time() + 5
+    while any(abandoned_branches().values()) and time.time() < deadline:
+        time.sleep(0.01)
+    return abandoned_branches()
+
+
+def _run_hybrid(tmp_path):
+    from src.agents.hybrid_agent import execute_hybrid_query
+    return execute_hybrid_query("How many refunds and what is the policy?", log_file=str(tmp_path / "hybrid.jsonl"),
+                                use_cache=False, index_path=str(tmp_path / "index"), coalesce=False)
+
+
+def test_branch_deadlines_and_partial_synthesis(tmp_path, monkeypatch):
+    import threading
+    import time
+    from src.agents import hybrid_agent
+
+    release = threading.Event()
+
+    def hung_sql():
+        release.wait(5)
+        return {"answer": "late"}
+
+    def failing_rag():
+        raise RuntimeError("index missing")
+
+    monkeypatch.setattr(hybrid_agent, "SQL_BRANCH_TIMEOUT_SECONDS", 0.2)
+    try:
+        # SQL misses its deadline: the RAG answer alone is synthesized
+        llm = _stub_sync_agents(monkeypatch, hung_sql, lambda: {"answer": "Refunds within 30 days."})
+        start = time.perf_counter()
+        result = _run_hybrid(tmp_path)
+        assert time.perf_counter() - start < 2
+        assert result["branches"] == {"sql": "timeout", "rag": "ok"}
+        assert result["answer"] == "synthesized"
+        assert "No structured data available." in llm.prompts[0] and "Refunds within 30 days." in llm.prompts[0]
+        assert hybrid_agent.abandoned_branches()["sql"] == 1
+    finally:
+        release.set()
+    assert _wait_for_abandoned_branches() == {"sql": 0, "rag": 0}
+
+    # RAG raises: the SQL answer alone is synthesized
+    llm = _stub_sync_agents(monkeypatch, lambda: {"answer": "42 refunds"}, failing_rag)
+    result = _run_hybrid(tmp_path)
+    assert result["branches"] == {"sql": "ok", "rag": "error"}
+    assert result["rag_result"]["error"] == "index missing"
+    assert "42 refunds" in llm.prompts[0] and "No document context available." in llm.prompts[0]
+
+    # Both fail: the errors are the answer, nothing is synthesized
+    llm = _stub_sync_agents(monkeypatch, lambda: {"answer": "Error: db down", "error": "db down"}, failing_rag)
+    result = _run_hybrid(tmp_path)
+    assert result["branches"] == {"sql": "error", "rag": "error"}
+    assert result["answer"] == "Error: db down\nError: index missing"
+    assert not llm.prompts
+
+
+def test_branch_with_stuck_workers_is_not_started(tmp_path, monkeypatch):
+    import threading
+    from src.agents import hybrid_agent
+
+    release = threading.Event()
+    sql_calls = []
+
+    def hung_sql():
+        sql_calls.append(1)
+        release.wait(5)
+        return {"answer": "late"}
+
+    monkeypatch.setattr(hybrid_agent, "SQL_BRANCH_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(hybrid_agent, "HYBRID_MAX_ABANDONED_BRANCHES", 1)
+    _stub_sync_agents(monkeypatch, hung_sql, lambda: {"answer": "Refunds within 30 days."})
+    try:
+        assert _run_hybrid(tmp_path)["branches"] == {"sql": "timeout", "rag": "ok"}
+        result = _run_hybrid(tmp_path)
+        assert result["branches"] == {"sql": "error", "rag": "ok"}
+        assert result["sql_result"]["error"] == "overloaded"
+        assert len(sql_calls) == 1
+    finally:
+        release.set()
+
+    assert _wait_for_abandoned_branches() == {"sql": 0, "rag": 0}
+    assert _run_hybrid(tmp_path)["branches"] == {"sql": "ok", "rag": "ok"}
+
+
+def test_async_hybrid_query_caches_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    from src.agents import hybrid_agent
+    from src.agents.hybrid_agent import aexecute_hybrid_query
+    from src.cache.answer_cache import AnswerCache
+
+    on_loop = []
+
+    class RecordingCache(AnswerCache):
+        def _lookup_exact(self, *args):
+            on_loop.append(threading.current_thread() is threading.main_thread())
+            return super()._lookup_exact(*args)
+
+        def put(self, *args, **kwargs):
+            on_loop.append(threading.current_thread() is threading.main_thread())
+            return super().put(*args, **kwargs)
+
+    cache = RecordingCache(path=str(tmp_path / "answers.sqlite"))
+    order = []
+    _stub_agents(monkeypatch, "hybrid", order)
+
+    async def no_embedding(query):
+        return None
+
+    monkeypatch.setattr(hybrid_agent, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(hybrid_agent, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(hybrid_agent, "_aembed_for_cache", no_embedding)
+
+    async def ask():
+        return await aexecute_hybrid_query("How many refunds and what is the policy?",
+                                           log_file=str(tmp_path / "hybrid.jsonl"), index_path=str(tmp_path / "index"))
+
+    first = asyncio.run(ask())
+    assert first["cache"] == {"hit": False}
+    assert first["branches"] == {"sql": "ok", "rag": "ok"}
+    assert first["answer"] == "42 refunds, within 30 days."
+    second = asyncio.run(ask())
+    assert second["cache"]["tier"] == "exact" and second["answer"] == first["answer"]
+    assert order == ["sql finished"]
+    assert on_loop == [False, False, False]
+
+
+def test_async_branches_time_out_and_are_cancelled(tmp_path, monkeypatch):
+    import asyncio
+    from src.agents import hybrid_agent
+
+    order = []
+    _stub_agents(monkeypatch, "hybrid", order)
+    monkeypatch.setattr(hybrid_agent, "SQL_BRANCH_TIMEOUT_SECONDS", 0.05)
+
+    branches = asyncio.run(hybrid_agent._arun_branches("How many refunds?", str(tmp_path / "hybrid.jsonl"),
+                                                       str(tmp_path / "index")))
+    assert {name: branch["status"] for name, branch in branches.items()} == {"sql": "timeout", "rag": "ok"}
+    assert branches["sql"]["result"]["error"] == "timeout"
+    assert order == []  # Cancelled before it finished
@@ -0,0 +1,28 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from src.rag.index_factory import build_faiss_index, default_index_config, requested_config
+
+
+def _vectors(n, dim=32):
+    return np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_ivf_index_finds_exact_vectors():
+    vectors = _vectors(2000)
+    index, config = build_faiss_index(vectors, default_index_config("ivf_flat", nprobe=8))
+    index.add(vectors)
+    assert config["type"] == "ivf_flat"
+    assert 2 <= config["nlist"] <= 2000 // 39
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).all()
+
+
+def test_small_corpus_degrades_to_trainable_index():
+    _, config = build_faiss_index(_vectors(500), default_index_config("ivf_pq", pq_m=8))
+    assert config["type"] == "ivf_flat"
+    assert requested_config(config)["type"] == "ivf_pq"
+
+    _, config = build_faiss_index(_vectors(50), default_index_config("ivf_flat"))
+    assert config["type"] == "flat"
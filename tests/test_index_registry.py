@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.rag.index_registry import IndexRegistry
+
+
+def _write_index(path, content):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "index.faiss"), "w") as f:
+        f.write(content)
+
+
+def _slow_loader(path):
+    time.sleep(0.05)
+    with open(os.path.join(path, "index.faiss")) as f:
+        return f.read()
+
+
+def test_registry_loads_once_and_evicts_lru(tmp_path):
+    paths = [str(tmp_path / name) for name in ("a", "b", "c")]
+    for path in paths:
+        _write_index(path, os.path.basename(path))
+    registry = IndexRegistry(max_indexes=2, watch_interval=0, loader=_slow_loader)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert set(pool.map(lambda _: registry.get(paths[0]), range(8))) == {"a"}
+    assert registry.counters["loads"] == 1
+
+    registry.get(paths[1])
+    registry.get(paths[0])  # b is now least recently used
+    registry.get(paths[2])
+    assert sorted(os.path.basename(p) for p in registry.stats()["indexes"]) == ["a", "c"]
+
+
+def test_registry_hot_swaps_rebuilt_index(tmp_path):
+    path = str(tmp_path / "docs")
+    _write_index(path, "v1")
+    registry = IndexRegistry(watch_interval=0, loader=_slow_loader)
+    assert registry.get_derived(path, "upper", str.upper) == "V1"
+
+    _write_index(path, "version 2")
+    assert registry.refresh() == 1
+    assert registry.get(path) == "version 2"
+    assert registry.get_derived(path, "upper", str.upper) == "VERSION 2"
+    assert registry.refresh() == 0
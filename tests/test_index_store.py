@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from src.rag.index_store import load_index, save_index_atomic
+from src.rag.sqlite_docstore import SQLiteDocstore
+
+
+class LetterEmbeddings(Embeddings):
+    """Counts of the letters a-d."""
+
+    def embed_documents(self, texts):
+        return [[float(t.count(c)) for c in "abcd"] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_saved_index_opens_lazily_without_pickle(tmp_path):
+    store = FAISS.from_texts(["aaa", "bbb", "ccd"], LetterEmbeddings(), metadatas=[{"n": 1}, {"n": 2}, {"n": 3}],
+                             ids=["x", "y", "z"])
+    index_path = str(tmp_path / "index")
+    save_index_atomic(store, index_path, manifest={"x": "x", "y": "y", "z": "z"})
+    assert not os.path.exists(os.path.join(index_path, "index.pkl"))
+
+    loaded = load_index(index_path, LetterEmbeddings())
+    assert isinstance(loaded.docstore, SQLiteDocstore)
+    assert len(loaded.index_to_docstore_id) == 3
+    hit = loaded.similarity_search("bb", k=1)[0]
+    assert (hit.page_content, hit.metadata, hit.id) == ("bbb", {"n": 2}, "y")
+
+    writable = load_index(index_path, LetterEmbeddings(), writable=True)
+    writable.delete(["x"])
+    assert writable.similarity_search("cc", k=1)[0].metadata == {"n": 3}
+
+
+def _build_index_module(monkeypatch):
+    from src.config import settings
+    monkeypatch.setattr(settings, "_embedding_instance", LetterEmbeddings())
+    from src.rag import build_index
+    monkeypatch.setattr(build_index, "embedding_model", LetterEmbeddings())
+    return build_index
+
+
+def test_update_adds_and_removes_chunks_by_hash(tmp_path, monkeypatch):
+    from src.rag.batch_embed import BatchEmbedder
+    from src.rag.index_store import chunk_hash, load_manifest
+
+    build_index = _build_index_module(monkeypatch)
+    embedder = BatchEmbedder(LetterEmbeddings(), show_progress=False)
+    index_path = str(tmp_path / "index")
+    texts, metadata = ["aaa", "bbb", "ccc"], [{"n": 1}, {"n": 2}, {"n": 3}]
+    build_index.create_faiss_index(texts, embedder.embed(texts), metadata, index_path)
+    first_version = os.path.realpath(index_path)
+
+    # Same text, new metadata: a different chunk
+    texts, metadata = ["aaa", "ccc", "ddd", "bbb"], [{"n": 1}, {"n": 3}, {"n": 4}, {"n": 5}]
+    counts = build_index.update_faiss_index(texts, metadata, index_path, embedder=embedder)
+    assert counts == {"added": 2, "removed": 1, "unchanged": 2}
+    assert set(load_manifest(index_path)) == {chunk_hash(t, m) for t, m in zip(texts, metadata)}
+
+    # The new version was swapped in through the symlink and the old one removed
+    assert os.path.islink(index_path) and os.path.realpath(index_path) != first_version
+    assert not os.path.exists(first_version)
+    loaded = load_index(index_path, LetterEmbeddings())
+    assert len(loaded.index_to_docstore_id) == 4
+    assert loaded.similarity_search("bb", k=1)[0].metadata == {"n": 5}
+    assert loaded.similarity_search("dd", k=1)[0].metadata == {"n": 4}
+
+    assert build_index.update_faiss_index(texts, metadata, index_path, embedder=embedder) == \
+        {"added": 0, "removed": 0, "unchanged": 4}
+
+
+def test_swap_migrates_a_plain_directory_and_restores_it_on_failure(tmp_path, monkeypatch):
+    import pytest
+
+    store = FAISS.from_texts(["aaa", "bbb"], LetterEmbeddings(), ids=["x", "y"])
+    index_path = str(tmp_path / "index")
+    os.makedirs(index_path)
+    with open(os.path.join(index_path, "index.pkl"), "w") as f:
+        f.write("legacy")
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        save_index_atomic(store, index_path, manifest={"x": "x", "y": "y"})
+    assert not os.path.islink(index_path)
+    assert os.listdir(index_path) == ["index.pkl"]
+    assert os.listdir(tmp_path) == ["index"]  # No version directory or link left behind
+
+    monkeypatch.undo()
+    save_index_atomic(store, index_path, manifest={"x": "x", "y": "y"})
+    assert os.path.islink(index_path)
+    assert sorted(os.listdir(tmp_path)) == sorted(["index", os.readlink(index_path)])
+    assert load_index(index_path, LetterEmbeddings()).similarity_search("bb", k=1)[0].id == "y"
+
+
+def test_serving_docstore_refuses_changes(tmp_path, monkeypatch):
+    import pytest
+    from langchain_core.documents import Document
+    from src.rag.batch_embed import BatchEmbedder
+    from src.rag.sqlite_docstore import ReadOnlyDocstoreError, SQLiteDocstore
+
+    build_index = _build_index_module(monkeypatch)
+    embedder = BatchEmbedder(LetterEmbeddings(), show_progress=False)
+    index_path = str(tmp_path / "index")
+    texts = ["aaa", "bbb"]
+    build_index.create_faiss_index(texts, embedder.embed(texts), [{}, {}], index_path)
+
+    docstore = load_index(index_path, LetterEmbeddings()).docstore
+    assert isinstance(docstore, SQLiteDocstore)
+    with pytest.raises(ReadOnlyDocstoreError, match="build_index.py --incremental"):
+        docstore.add({"z": Document(page_content="zzz")})
+    with pytest.raises(ValueError, match="build_index.py --incremental"):
+        docstore.delete(["x"])
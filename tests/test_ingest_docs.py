@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from src.rag.ingest_docs import iter_document_chunks, load_and_split_documents
+
+
+def _write_pdf(path, page_texts):
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in page_texts:
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+    writer.add_metadata({"/Title": " Handbook ", "/CreationDate": "D:20240105103000+01'00'"})
+    writer.write(str(path))
+
+
+def _chunks(folder, **kwargs):
+    return list(iter_document_chunks(str(folder), chunk_size=40, chunk_overlap=0, max_workers=2, **kwargs))
+
+
+def test_chunks_come_in_file_and_page_order_with_loader_metadata(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write_pdf(docs / "b_handbook.pdf", [f"Page {i} of the employee handbook." for i in range(5)])
+    (docs / "a_notes.txt").write_text("Expense reports are due monthly.")
+    (docs / "c_ignored.md").write_text("Not ingested.")
+
+    chunks = _chunks(docs, pages_per_task=2)
+
+    expected = [
+        {"text": chunk.page_content, "metadata": chunk.metadata}
+        for name in ("a_notes.txt", "b_handbook.pdf")
+        for chunk in load_and_split_documents(str(docs / name), chunk_size=40, chunk_overlap=0)
+    ]
+    assert chunks == expected
+    assert [chunk["metadata"].get("page") for chunk in chunks] == [None, 0, 1, 2, 3, 4]
+    assert chunks[1]["metadata"]["title"] == "Handbook" and chunks[1]["metadata"]["page_label"] == "1"
+    assert chunks[1]["metadata"]["creationdate"] == "2024-01-05T10:30:00+01:00"
+
+
+def test_cache_replays_unchanged_files_and_prunes_stale_entries(tmp_path):
+    docs, cache_dir = tmp_path / "docs", tmp_path / "cache"
+    docs.mkdir()
+    _write_pdf(docs / "handbook.pdf", ["Refunds are accepted.", "Travel must be approved."])
+    (docs / "notes.txt").write_text("Expense reports are due monthly.")
+
+    first = _chunks(docs, cache_dir=str(cache_dir))
+    assert len(os.listdir(cache_dir)) == 2
+
+    # Replayed from the cache: a marked entry comes back as written
+    marked = {"text": "from the cache", "metadata": {}}
+    for name in os.listdir(cache_dir):
+        with open(cache_dir / name, "w", encoding="utf-8") as f:
+            f.write(json.dumps(marked) + "\n")
+    assert _chunks(docs, cache_dir=str(cache_dir)) == [marked, marked]
+
+    # A changed size or mtime invalidates the entry; the stale one is pruned
+    (docs / "notes.txt").write_text("Expense reports are due weekly now.")
+    stat = os.stat(docs / "handbook.pdf")
+    os.utime(docs / "handbook.pdf", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = _chunks(docs, cache_dir=str(cache_dir))
+    assert second[:2] == first[:2]
+    assert second[2]["text"] == "Expense reports are due weekly now."
+    assert len(os.listdir(cache_dir)) == 2
+
+    (docs / "notes.txt").unlink()
+    assert _chunks(docs, cache_dir=str(cache_dir)) == first[:2]
+    assert len(os.listdir(cache_dir)) == 1
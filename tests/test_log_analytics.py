@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import random
+from datetime import datetime, timedelta
+
+from src.log_analytics import LogStats, OffsetIndex, SpaceSaving, iter_entries, parse_time, to_csv
+
+
+def _write(path, entries):
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_time_range_seek_matches_full_scan(tmp_path):
+    path = str(tmp_path / "agent_executions.jsonl")
+    start = datetime(2025, 1, 1)
+    rng = random.Random(0)
+    # Roughly ordered, like batches of several writers
+    entries = [
+        {"i": i, "timestamp": (start + timedelta(minutes=i + rng.randint(-5, 5))).isoformat()}
+        for i in range(2000)
+    ]
+    _write(path, entries[:1500])
+
+    since, until = parse_time("2025-01-01T10:00:00"), parse_time("2025-01-01T12:30:00")
+    index = OffsetIndex(path, interval=4096)
+    index.update()
+    assert len(index.checkpoints) > 10
+    ranges = index.ranges(since, until)
+    assert ranges[0][0] > 0 and ranges[0][1] is not None
+
+    _write(path, entries[1500:])
+    expected = [e["i"] for e in entries if since <= parse_time(e["timestamp"]) <= until]
+    assert [entry["i"] for _, entry in iter_entries(path, since, until)] == expected
+    assert os.path.exists(path + ".idx.json")
+
+
+def test_log_stats_percentiles_errors_and_top_questions():
+    stats = LogStats(bucket_seconds=3600, top_k=2)
+    base = parse_time("2025-01-01T09:00:00")
+    for i in range(1, 101):
+        stats.add(base + i * 60, {
+            "agent_type": "sql",
+            "question": "Total revenue?" if i % 2 else f"Question {i}",
+            "duration_seconds": i / 10,
+            **({"error": "boom"} if i % 10 == 0 else {}),
+        })
+    stats.add(base, {"agent_type": "hybrid", "route": "hybrid", "query": "q", "duration_seconds": 2,
+                     "branches": {"sql": "ok", "rag": "timeout"}})
+
+    result = stats.result()
+    sql = result["groups"]["agent:sql"]
+    assert sql["count"] == 100 and sql["error_rate"] == 0.1
+    assert abs(sql["latency_seconds"]["p50"] - 5.0) < 0.1 and abs(sql["latency_seconds"]["p99"] - 9.9) < 0.1
+    assert result["groups"]["route:hybrid"]["errors"] == 1
+    assert sum(b["total"] for b in result["throughput"]["buckets"]) == 101
+    assert result["top_questions"]["sql"][0] == {"question": "total revenue", "count": 50, "max_overcount": 0}
+    assert "latency_seconds,agent:sql,p95," in to_csv(result)
+
+
+def test_space_saving_keeps_heavy_hitters():
+    summary = SpaceSaving(capacity=10)
+    for i in range(1000):
+        summary.add("frequent" if i % 3 == 0 else f"rare {i}")
+    item, count, error = summary.top(1)[0]
+    assert item == "frequent" and count - error <= 334 <= count
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gzip
+import json
+import threading
+
+from src.log_writer import LogWriter, append_lines
+
+
+def test_log_writer_batches_lines_from_many_threads(tmp_path):
+    path = str(tmp_path / "sql" / "agent_executions.jsonl")
+    writer = LogWriter(flush_interval=0.5, rotate_seconds=0, max_bytes=0)
+
+    def log(worker):
+        for i in range(50):
+            writer.write(path, json.dumps({"worker": worker, "i": i}) + "\n")
+
+    threads = [threading.Thread(target=log, args=(w,)) for w in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.flush()
+
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == 400
+    assert writer.counters["batches"] < 400
+    writer.close()
+    writer.write(path, "{}\n")  # After close: written synchronously
+    assert writer.counters["lines"] == 401
+
+
+def test_append_lines_rotates_and_compresses(tmp_path):
+    path = str(tmp_path / "app.jsonl")
+    line = json.dumps({"answer": "x" * 80}) + "\n"
+    rotated = [append_lines(path, [line], max_bytes=250, rotate_seconds=0, compress=True) for _ in range(5)]
+
+    archives = [name for name in rotated if name]
+    assert len(archives) == 2
+    with gzip.open(archives[0] + ".gz", "rt", encoding="utf-8") as f:
+        assert f.read() == line * 2
+    assert not os.path.exists(archives[0])
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == line
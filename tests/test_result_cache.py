@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+
+from src.db.copilot_database import CopilotSQLDatabase
+from src.db.result_cache import ResultCache
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, region TEXT, amount REAL)"))
+        conn.execute(text("INSERT INTO orders VALUES (1, 'EU', 10.0), (2, 'US', 5.5)"))
+    return engine
+
+
+def test_result_cache_hits_and_table_invalidation(tmp_path):
+    cache = ResultCache(_engine(tmp_path), columnar_min_rows=3)
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return ["region", "total"], [("EU", Decimal("10.00")), ("US", None), ("APAC", Decimal("1.50"))]
+
+    sql = "SELECT region, SUM(amount) AS total FROM orders GROUP BY region"
+    first = cache.fetch(sql, execute)
+    second = cache.fetch("select region,  sum(amount) as total\nfrom orders group by region;", execute)
+    assert first[2] is False and second[2] is True
+    assert second[:2] == first[:2]  # Columnar storage round-trips values and types
+    assert len(calls) == 1
+
+    cache.bump_table_version("orders")
+    assert cache.fetch(sql, execute)[2] is False
+    assert cache.fetch("SELECT random() FROM orders", execute)[2] is False
+    assert cache.fetch("SELECT random() FROM orders", execute)[2] is False
+    assert cache.stats()["hits"] == 1 and cache.stats()["uncacheable"] == 2
+
+
+def test_sql_database_queries_go_through_the_cache(tmp_path):
+    engine = _engine(tmp_path)
+    cache = ResultCache(engine, ttl_seconds=60)
+    db = CopilotSQLDatabase(engine, result_cache=cache)
+
+    assert db.run("SELECT COUNT(*) FROM orders") == "[(2,)]"
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO orders VALUES (3, 'EU', 1.0)"))
+    assert db.run("SELECT COUNT(*) FROM orders") == "[(2,)]"  # No counters on SQLite: TTL-bound
+    cache.bump_table_version("orders")
+    assert db.run("SELECT COUNT(*) FROM orders") == "[(3,)]"
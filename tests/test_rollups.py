@@ -0,0 +1,122 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import create_engine, text
+
+from src.db.rollups import ROLLUPS, RollupManager
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE employees (id INTEGER PRIMARY KEY, name TEXT, region TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE transactions (id INTEGER PRIMARY KEY, customer_id INTEGER, employee_id INTEGER, amount REAL, "
+            "transaction_date TIMESTAMP, type TEXT, status TEXT, payment_method TEXT, currency TEXT)"
+        ))
+        conn.execute(text("INSERT INTO employees VALUES (1, 'Ana', 'North'), (2, 'Bo', 'South')"))
+        conn.execute(text(
+            "INSERT INTO transactions VALUES "
+            "(1, 10, 1, 100, '2024-01-05 10:00:00', 'purchase', 'completed', 'cash', 'EUR'), "
+            "(2, 11, 2, 50, '2024-01-20 09:00:00', 'purchase', 'completed', 'credit_card', 'EUR'), "
+            "(3, 10, 1, 30, '2024-02-02 12:00:00', 'refund', 'completed', 'cash', 'EUR'), "
+            "(4, 11, 2, 999, '2024-02-03 12:00:00', 'purchase', 'cancelled', 'cash', 'EUR')"
+        ))
+    return engine
+
+
+def _contents(engine):
+    with engine.connect() as conn:
+        return {
+            rollup.name: sorted(tuple(row) for row in conn.execute(text(f"SELECT * FROM {rollup.name}")))
+            for rollup in ROLLUPS
+        }
+
+
+def test_rollups_aggregate_completed_transactions(tmp_path):
+    engine = _engine(tmp_path)
+    manager = RollupManager(engine, refresh_seconds=0, watermark_check_seconds=0)
+    result = manager.refresh()
+    assert set(result["refreshed"]) == {rollup.name for rollup in ROLLUPS}
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT * FROM rollup_revenue_by_month ORDER BY month")).fetchall() == [
+            ("2024-01-01", "EUR", 2, 150, 0, 0, 2),
+            ("2024-02-01", "EUR", 0, 0, 1, 30, 1),
+        ]
+        assert conn.execute(text(
+            "SELECT region, SUM(sale_amount) FROM rollup_employee_sales_by_region GROUP BY region ORDER BY region"
+        )).fetchall() == [("North", 100), ("South", 50)]
+
+    context = manager.context(["transactions", "rollup_revenue_by_month", "rollup_refunds_by_payment_method"])
+    assert "rollup_revenue_by_month" in context and "up to 2024-02-03 12:00:00" in context
+    assert "rollup_customer_spend_by_month" not in context
+
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path):
+    engine = _engine(tmp_path)
+    manager = RollupManager(engine, refresh_seconds=0, lookback_days=3, watermark_check_seconds=0)
+    manager.refresh()
+    # SQLite keeps no modification counters: every pass recomputes the lookback window
+    assert set(manager.refresh()["refreshed"].values()) == {"incremental"}
+
+    with engine.begin() as conn:
+        # A late row inside the lookback window, and a new month
+        conn.execute(text(
+            "INSERT INTO transactions VALUES "
+            "(5, 12, 1, 70, '2024-02-01 08:00:00', 'purchase', 'completed', 'transfer', 'EUR'), "
+            "(6, 12, 2, 20, '2024-03-01 08:00:00', 'refund', 'completed', 'transfer', 'EUR')"
+        ))
+    assert set(manager.refresh()["refreshed"].values()) == {"incremental"}
+    incremental = _contents(engine)
+
+    assert set(manager.refresh(full=True)["refreshed"].values()) == {"full"}
+    assert _contents(engine) == incremental
+
+
+def test_refresh_follows_the_modification_count(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    manager = RollupManager(engine, refresh_seconds=0, lookback_days=3, watermark_check_seconds=0)
+    version = "1"
+    monkeypatch.setattr(manager, "_source_version", lambda conn: version)
+    manager.refresh()
+    assert manager.refresh()["refreshed"] == {}  # Nothing changed
+    assert manager.counters["skipped"] == len(ROLLUPS)
+
+    # A status change inside an existing month: no newer transaction_date, but the count moved
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE transactions SET status = 'completed' WHERE id = 4"))
+    version = "2"
+    assert set(manager.refresh()["refreshed"].values()) == {"incremental"}
+    with engine.connect() as conn:
+        assert conn.execute(text(
+            "SELECT purchase_count, purchase_amount FROM rollup_revenue_by_month WHERE month = '2024-02-01'"
+        )).fetchone() == (1, 999)
+
+
+def test_watermark_table_gains_the_version_column(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE rollup_watermarks (rollup_name VARCHAR(100) PRIMARY KEY, watermark VARCHAR(40) NOT NULL, "
+            "refreshed_at VARCHAR(40) NOT NULL)"
+        ))
+    manager = RollupManager(engine, refresh_seconds=0, watermark_check_seconds=0)
+    assert set(manager.refresh()["refreshed"].values()) == {"full"}
+    assert "rollup_revenue_by_month" in manager.watermarks()
+
+
+def test_stats_endpoint_never_starts_the_rollups(monkeypatch):
+    from src.api import main
+    from src.db import rollups
+
+    def fail():
+        raise AssertionError("the stats endpoint must not create the rollup tables")
+
+    monkeypatch.setattr(rollups, "get_rollup_manager", fail)
+    monkeypatch.setattr(rollups, "_rollup_manager", None)
+    monkeypatch.setattr(main, "ROLLUPS_ENABLED", False)
+    assert main.rollup_stats() == {"enabled": False}
+
+    monkeypatch.setattr(main, "ROLLUPS_ENABLED", True)
+    assert main.rollup_stats() == {"enabled": True, "started": False}
@@ -0,0 +1,74 @@
+import sys
+import os
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from langchain_core.embeddings import Embeddings
+from src.agents.router import load_prompt_examples, train_router
+
+
+VOCAB = ["customers", "revenue", "total", "employees", "policy", "refund", "policies", "summarize", "explain",
+         "list", "corporate", "clients", "loyal", "top"]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        words = text.lower().replace("?", "").split()
+        return [float(sum(w.startswith(v) for w in words)) + 1e-3 for v in VOCAB]
+
+
+def test_prompt_examples_are_parsed():
+    examples = dict(load_prompt_examples())
+    assert examples["What is the refund policy?"] == "rag"
+    assert examples["Show me total revenue this month"] == "sql"
+
+
+def test_router_trains_from_logs_and_routes_confidently(tmp_path):
+    log_file = tmp_path / "classification.jsonl"
+    with open(log_file, "w") as f:
+        f.write(json.dumps({"query": "total revenue by employees", "classification": "sql"}) + "\n")
+        f.write(json.dumps({"query": "explain the refund policies", "classification": "rag",
+                            "routing_source": "llm"}) + "\n")
+        f.write(json.dumps({"query": "refund customers", "classification": "sql",
+                            "routing_source": "local"}) + "\n")
+
+    router = train_router(log_files=[str(log_file)], cache_path=str(tmp_path / "centroids.json"),
+                          embeddings=BagOfWordsEmbeddings())
+    route, confidence, _ = router.predict(BagOfWordsEmbeddings().embed_query("what is the refund policy"))
+    assert route == "rag"
+    assert confidence > 0.5
+
+    # Second training run is served from the centroid cache
+    cached = train_router(log_files=[str(log_file)], cache_path=str(tmp_path / "centroids.json"),
+                          embeddings=None)
+    assert cached.routes == router.routes
+
+
+def test_get_router_retries_training_after_a_back_off(monkeypatch):
+    import time
+    from src.agents import router
+
+    attempts = []
+
+    def flaky_train_router():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("embeddings endpoint down")
+        return "trained"
+
+    monkeypatch.setattr(router, "train_router", flaky_train_router)
+    monkeypatch.setattr(router, "RETRY_BASE_SECONDS", 0.05)
+    monkeypatch.setattr(router, "_router", None)
+    monkeypatch.setattr(router, "_router_loaded", False)
+    monkeypatch.setattr(router, "_router_failures", 0)
+    monkeypatch.setattr(router, "_router_retry_at", 0.0)
+
+    assert router.get_router() is None
+    assert router.get_router() is None  # Still backing off
+    assert len(attempts) == 1
+    time.sleep(0.06)
+    assert router.get_router() == "trained"
+    assert router.get_router() == "trained"
+    assert len(attempts) == 2
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import create_engine, text
+
+from src.db.schema_cache import SchemaCache
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, country TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), amount REAL)"
+        ))
+        conn.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, sku TEXT, price REAL)"))
+        conn.execute(text("INSERT INTO customers VALUES (1, 'Acme', 'FR'), (2, 'Globex', 'US')"))
+        conn.execute(text("INSERT INTO orders VALUES (1, 1, 120.5)"))
+    return engine
+
+
+def test_schema_cache_selects_relevant_tables(tmp_path):
+    cache = SchemaCache(_engine(tmp_path), path=str(tmp_path / "schema.json"), check_interval=0)
+    cache.ensure_ready()
+
+    assert cache.relevant_tables("Total order amount last month?") == ["orders", "customers"]
+    context = cache.prompt_context("Which customers are in FR?")
+    assert "Tables in the database: customers, orders, products" in context
+    assert "CREATE TABLE customers" in context and "Acme" in context
+    assert "CREATE TABLE products" not in context
+
+
+def test_schema_cache_rebuilds_on_schema_change(tmp_path):
+    engine = _engine(tmp_path)
+    path = str(tmp_path / "schema.json")
+    cache = SchemaCache(engine, path=path, check_interval=0)
+    assert cache.refresh() is True
+    assert cache.refresh() is False
+
+    # A new process reuses the stored cache
+    reloaded = SchemaCache(engine, path=path, check_interval=0)
+    assert reloaded.version == cache.version and reloaded.refresh() is False
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE products ADD COLUMN category TEXT"))
+    assert reloaded.refresh() is True
+    assert "category" in reloaded.tables["products"]["columns"]
@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.cache.single_flight import SingleFlight
+
+
+def test_single_flight_threads_share_one_execution():
+    group = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"answer": "42"}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(group.do, "q", work) for _ in range(8)]
+        while group.stats()["coalesced"] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {"answer": "42"} for r in results)
+    assert group.stats()["executions"] == 1
+    assert group.stats()["coalesced"] == 7
+    assert group.stats()["in_flight"] == 0
+
+
+def test_single_flight_async_shares_result_and_errors():
+    group = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": "42"}
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(group.ado("q", work) for _ in range(5)))
+        errors = await asyncio.gather(*(group.ado("bad", failing) for _ in range(3)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r["answer"] == "42" for r in results)
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert group.stats()["coalesced"] == 6
+
+
+def test_single_flight_followers_never_see_the_leaders_changes():
+    group = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(timeout=5)
+        return {"answer": "42", "cache": {}}
+
+    def leader():
+        result = group.do("q", work)
+        result["cache"]["hit"] = False  # Callers annotate what they get back
+        return result
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(leader)
+        while group.stats()["in_flight"] < 1:
+            time.sleep(0.01)
+        followers = [pool.submit(group.do, "q", work) for _ in range(3)]
+        while group.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        release.set()
+        assert first.result()["cache"] == {"hit": False}
+        assert all(f.result() == {"answer": "42", "cache": {}} for f in followers)
+
+    async def alead():
+        result = await group.ado("a", awork)
+        result["cache"]["hit"] = False
+        return result
+
+    async def awork():
+        await asyncio.sleep(0.05)
+        return {"answer": "42", "cache": {}}
+
+    async def main():
+        return await asyncio.gather(alead(), *(group.ado("a", awork) for _ in range(3)))
+
+    leader_result, *follower_results = asyncio.run(main())
+    assert leader_result["cache"] == {"hit": False}
+    assert all(r == {"answer": "42", "cache": {}} for r in follower_results)
+    assert len({id(r) for r in follower_results}) == 3
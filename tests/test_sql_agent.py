@@ -10,3 +10,97 @@ def test_sql_agent_executor_returns_executor():
     assert result is not None
     assert "answer" in result
 
+
+
+def test_unreachable_database_is_an_error_response(tmp_path, monkeypatch):
+    import asyncio
+    from sqlalchemy import create_engine
+    from src.agents import sql_agent
+    from src.db.schema_cache import SchemaCache
+
+    # Cold start: no stored schema, and the database cannot be opened
+    engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'app.db'}")
+    schema_cache = SchemaCache(engine, path=str(tmp_path / "schema.json"), check_interval=0)
+    monkeypatch.setattr(sql_agent, "get_schema_cache", lambda: schema_cache)
+    log_file = str(tmp_path / "sql.jsonl")
+
+    result = execute_sql_query("How many customers?", log_file=log_file, direct=False)
+    assert result["error"] and result["answer"].startswith("Error:")
+    result = asyncio.run(sql_agent.aexecute_sql_query("How many customers?", log_file=log_file, direct=False))
+    assert result["error"] and result["answer"].startswith("Error:")
+
+
+class _StubAgent:
+    def __init__(self):
+        self.inputs = []
+
+    def invoke(self, agent_input, config=None):
+        self.inputs.append(agent_input["input"])
+        return {"output": "agent answer", "intermediate_steps": []}
+
+
+def _direct_mode(tmp_path, monkeypatch, replies):
+    from langchain_core.language_models import FakeListChatModel
+    from sqlalchemy import create_engine, text
+    from src.agents import sql_agent
+    from src.db.schema_cache import SchemaCache
+
+    tmp_path.mkdir(exist_ok=True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO customers VALUES (1, 'Acme'), (2, 'Globex')"))
+    schema_cache = SchemaCache(engine, path=str(tmp_path / "schema.json"), check_interval=0)
+    agent = _StubAgent()
+    monkeypatch.setattr(sql_agent, "get_schema_cache", lambda: schema_cache)
+    monkeypatch.setattr(sql_agent, "get_result_cache", lambda: None)
+    monkeypatch.setattr(sql_agent, "get_rollup_manager", lambda: None)
+    monkeypatch.setattr(sql_agent, "get_llm", lambda temperature=0: FakeListChatModel(responses=replies))
+    monkeypatch.setattr(sql_agent, "_get_agent_executor", lambda: agent)
+    return agent, str(tmp_path / "sql.jsonl")
+
+
+def test_direct_mode_answers_with_one_or_two_calls(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    from src.agents import sql_agent
+    from src.agents.sql_agent import aexecute_sql_query
+
+    # Single value: the answer template is filled in, no second call
+    agent, log_file = _direct_mode(tmp_path, monkeypatch, ["SQL: SELECT COUNT(*) FROM customers\nANSWER: We have {value} customers."])
+    schema_context, on_loop = sql_agent._schema_context, []
+
+    def recording_schema_context(question):
+        on_loop.append(threading.current_thread() is threading.main_thread())
+        return schema_context(question)
+
+    monkeypatch.setattr(sql_agent, "_schema_context", recording_schema_context)
+    for result in (execute_sql_query("How many customers?", log_file=log_file),
+                   asyncio.run(aexecute_sql_query("How many customers?", log_file=log_file))):
+        assert result["answer"] == "We have 2 customers."
+        assert result["mode"] == "direct" and result["llm_calls"] == 1
+        assert "fallback_reason" not in result
+    assert on_loop == [True, False]  # The async path reads the rollup watermarks in a worker thread
+
+    # A table: a second call answers from the rows
+    agent, log_file = _direct_mode(tmp_path / "table", monkeypatch, ["SQL: ```sql\nSELECT name FROM customers ORDER BY id\n```\nANSWER:", "Acme and Globex."])
+    result = execute_sql_query("List the customers", log_file=log_file)
+    assert result["answer"] == "Acme and Globex."
+    assert result["mode"] == "direct" and result["llm_calls"] == 2
+    assert result["steps"][0]["tool"] == "direct_sql" and "Globex" in result["steps"][0]["observation"]
+    assert not agent.inputs
+
+
+def test_direct_mode_falls_back_to_the_agent(tmp_path, monkeypatch):
+    # Rejected by validation: the agent still sees the query and why it failed
+    agent, log_file = _direct_mode(tmp_path, monkeypatch, ["SQL: DELETE FROM customers\nANSWER:"])
+    result = execute_sql_query("Remove the customers", log_file=log_file)
+    assert result["mode"] == "agent" and result["answer"] == "agent answer"
+    assert result["fallback_reason"]
+    assert "DELETE FROM customers" in agent.inputs[0] and result["fallback_reason"] in agent.inputs[0]
+
+    # Failed while running
+    agent, log_file = _direct_mode(tmp_path / "run", monkeypatch, ["SQL: SELECT missing_column FROM customers\nANSWER:"])
+    result = execute_sql_query("Which customers?", log_file=log_file)
+    assert result["mode"] == "agent" and "missing_column" in result["fallback_reason"]
+    assert "SELECT missing_column FROM customers" in agent.inputs[0]
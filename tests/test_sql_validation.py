@@ -0,0 +1,35 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+from src.db.sql_validation import SQLValidationError, validate_select
+
+TABLES = ["orders", "customers"]
+
+
+def test_validate_select_accepts_read_only_queries():
+    assert validate_select("SELECT SUM(amount) FROM orders;", TABLES) == "SELECT SUM(amount) FROM orders"
+    validate_select(
+        "WITH monthly AS (SELECT customer_id, SUM(amount) AS total FROM orders "
+        "WHERE EXTRACT(YEAR FROM created_at) = 2024 GROUP BY 1) "
+        "SELECT c.name, m.total FROM monthly m JOIN public.customers c ON c.id = m.customer_id",
+        TABLES,
+    )
+    validate_select("SELECT 'drop; delete' AS note FROM orders -- comment", TABLES)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM orders",
+    "SELECT 1; DROP TABLE orders",
+    "SELECT * INTO backup FROM orders",
+    "WITH gone AS (DELETE FROM orders RETURNING *) SELECT * FROM gone",
+    "SELECT * FROM orders FOR UPDATE",
+    "SELECT pg_sleep(10)",
+    "SELECT * FROM invoices",
+    "SELECT (1 FROM orders",
+    "SELECT 'unterminated FROM orders",
+])
+def test_validate_select_rejects(sql):
+    with pytest.raises(SQLValidationError):
+        validate_select(sql, TABLES)
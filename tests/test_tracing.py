@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+
+from langchain_core.language_models import FakeListChatModel
+
+from src.tracing import STAGE_SECONDS, get_tracing_handler, render_metrics, span, start_trace
+
+
+def test_spans_feed_the_trace_and_the_metrics():
+    with start_trace("abc") as trace:
+        with span("unit_stage"):
+            pass
+        try:
+            with span("unit_failing_stage"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+        async def nested():
+            with start_trace() as inner:  # Reuses the request's trace
+                with span("unit_async_stage"):
+                    await asyncio.sleep(0)
+                return inner
+
+        assert asyncio.run(nested()) is trace
+
+    assert [s["stage"] for s in trace.spans] == ["unit_stage", "unit_failing_stage", "unit_async_stage"]
+    assert trace.spans[1]["error"] is True
+    metrics = render_metrics()
+    assert 'copilot_stage_duration_seconds_count{stage="unit_stage"} 1' in metrics
+    assert 'copilot_stage_duration_seconds_bucket{stage="unit_stage",le="+Inf"} 1' in metrics
+    assert 'copilot_stage_errors_total{stage="unit_failing_stage"} 1' in metrics
+
+
+def test_llm_calls_are_recorded_once():
+    handler = get_tracing_handler()
+    llm = FakeListChatModel(responses=["sql"], callbacks=[handler])
+    before = STAGE_SECONDS._values.get(("llm",), [0] * 20)[-1]
+    with start_trace() as trace:
+        llm.invoke("route this", config={"callbacks": [handler]})
+    assert [s["stage"] for s in trace.spans] == ["llm"]
+    assert STAGE_SECONDS._values[("llm",)][-1] == before + 1